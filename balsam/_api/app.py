@@ -1,3 +1,4 @@
+import hashlib
 import inspect
 import logging
 import os
@@ -6,19 +7,29 @@ import shlex
 import sys
 from enum import Enum
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple, Type, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type, Union
 
 import jinja2
 import jinja2.meta
 
-from balsam.schemas import DeserializeError, JobState, SerializeError, deserialize, get_source, serialize
+from balsam.schemas import (
+    DeserializeError,
+    JobState,
+    SerializeError,
+    code_serializer,
+    deserialize,
+    get_source,
+    parse_spec,
+    serialize,
+)
 
 if TYPE_CHECKING:
-    from balsam.client import RESTClient
+    from balsam.client import AppCache, RESTClient
 
     from .models import App, Job, Site
 
 PARAM_PATTERN = re.compile(r"{{(.*?)}}")
+JOB_PAYLOAD_FILENAME = ".balsam-job.json"
 logger = logging.getLogger(__name__)
 
 
@@ -61,6 +72,14 @@ def check_extraneous_parameters(detected_params: Set[str], dict_params: Set[str]
         )
 
 
+def write_payload(path: Path, payload: str) -> None:
+    """Atomically write a python_runner payload, so concurrent readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(payload)
+    os.replace(tmp_path, path)
+
+
 def chunk_str(s: str, chunksize: int) -> List[str]:
     num_chunks = len(s) // chunksize
     chunks = [s[i * chunksize : (i + 1) * chunksize] for i in range(num_chunks + 1)]
@@ -174,6 +193,11 @@ class ApplicationDefinitionMeta(type):
                 f"ApplicationDefinition {name} must contain the `site` attribute, set to a site id, name, or Site object"
             )
 
+        try:
+            parse_spec(cls.serializer)
+        except SerializeError as exc:
+            raise AttributeError(f"ApplicationDefinition {name} has an invalid `serializer`: {exc}") from exc
+
         has_command_template = isinstance(getattr(cls, "command_template", None), str)
         has_run_function = callable(getattr(cls, "run", None))
 
@@ -208,6 +232,8 @@ class ApplicationDefinition(metaclass=ApplicationDefinitionMeta):
     run: Optional[Callable[..., Any]] = None
     site: Union[int, str, "Site"]
     python_exe: str = sys.executable
+    # Serializer for parameters and return values: dill, cloudpickle, or pickle5 (plus "+zstd" to compress)
+    serializer: str = "dill"
     _site_id: Optional[int] = None
     _client: Optional["RESTClient"] = None
     _app_type: AppType
@@ -215,11 +241,26 @@ class ApplicationDefinition(metaclass=ApplicationDefinitionMeta):
     _app_name_cache: Dict[Tuple[Optional[str], str], AppDefType] = {}
     _app_id_cache: Dict[int, AppDefType] = {}
     _serialized_class: Optional[str] = None
+    # Set by launchers: hand off python_runner payloads through files instead of argv
+    _payload_dir: Optional[Path] = None
+    _data_dir: Optional[Path] = None
+    _payload_paths: Dict[type, Path] = {}
 
     @staticmethod
     def _set_client(client: "RESTClient") -> None:
         ApplicationDefinition._client = client
 
+    @staticmethod
+    def _set_payload_dir(payload_dir: Path, data_dir: Path) -> None:
+        """
+        Write each serialized App once under `payload_dir` and each Job's JSON
+        to its working directory (under `data_dir`), so that the python_runner
+        command line carries only the paths.
+        """
+        ApplicationDefinition._payload_dir = payload_dir
+        ApplicationDefinition._data_dir = data_dir
+        ApplicationDefinition._payload_paths.clear()
+
     def __init__(self, job: "Job") -> None:
         self.job = job
 
@@ -233,7 +274,21 @@ class ApplicationDefinition(metaclass=ApplicationDefinitionMeta):
 
     def get_environ_vars(self) -> Dict[str, str]:
         envs = os.environ.copy()
-        envs.update(self.environment_variables)
+        envs.update(self._app_environ())
+        return envs
+
+    def get_environ_delta(self) -> Dict[str, str]:
+        """
+        The variables that `get_environ_vars` adds to (or changes in) the current
+        environment.  Launchers send only this delta with each run and merge it into
+        the environment of the process that calls Popen.
+        """
+        if type(self).get_environ_vars is not ApplicationDefinition.get_environ_vars:
+            return {key: val for key, val in self.get_environ_vars().items() if os.environ.get(key) != val}
+        return self._app_environ()
+
+    def _app_environ(self) -> Dict[str, str]:
+        envs = dict(self.environment_variables)
         envs["BALSAM_JOB_ID"] = str(self.job.id)
         if self.job.threads_per_rank > 1:
             envs["OMP_NUM_THREADS"] = str(self.job.threads_per_rank)
@@ -246,15 +301,33 @@ class ApplicationDefinition(metaclass=ApplicationDefinitionMeta):
         app_id = int(self.__app_id__)
 
         app_payload = self._serialized_class
+        job_payload = self.job._read_model.json()
+        if self._payload_dir is not None and self._data_dir is not None:
+            app_path = self._write_app_payload(app_payload)
+            job_path = self.job.resolve_workdir(self._data_dir).joinpath(JOB_PAYLOAD_FILENAME)
+            write_payload(job_path, job_payload)
+            args = f"--files {app_id} {shlex.quote(str(app_path))} {shlex.quote(str(job_path))}"
+            return f"{self.python_exe} -m balsam.site.launcher.python_runner {args}"
+
         app_chunks = chunk_str(app_payload, self.ARG_CHUNK_SIZE)
         num_app_chunks = len(app_chunks)
-
-        job_payload = self.job._read_model.json()
         job_chunks = chunk_str(job_payload, self.ARG_CHUNK_SIZE)
 
         args = f"{app_id} {num_app_chunks} {' '.join(app_chunks)} {' '.join(job_chunks)}"
         return f"{self.python_exe} -m balsam.site.launcher.python_runner {args}"
 
+    def _write_app_payload(self, app_payload: str) -> Path:
+        """Write the serialized App once per content hash; returns its path"""
+        cls = type(self)
+        if cls not in self._payload_paths:
+            assert self._payload_dir is not None
+            digest = hashlib.sha256(app_payload.encode("utf-8")).hexdigest()
+            path = self._payload_dir.joinpath(f"app-{self.__app_id__}-{digest}")
+            if not path.is_file():
+                write_payload(path, app_payload)
+            self._payload_paths[cls] = path
+        return self._payload_paths[cls]
+
     def _render_shell_command(self) -> str:
         """
         Args:
@@ -325,7 +398,12 @@ class ApplicationDefinition(metaclass=ApplicationDefinitionMeta):
         else:
             raise ValueError("site must be an int, str, or Site object.")
 
-        api_apps = AppModel.objects.filter(**lookup)  # type: ignore
+        client = ApplicationDefinition._client
+        api_apps: Iterable["App"]
+        if client is not None and client.app_cache is not None:
+            api_apps = ApplicationDefinition._fetch_cached_apps(lookup, client.app_cache)
+        else:
+            api_apps = AppModel.objects.filter(**lookup)  # type: ignore
         apps_by_name = {}
         for app in api_apps:
             apps_by_name[app.name] = ApplicationDefinition.from_serialized(app)
@@ -333,6 +411,30 @@ class ApplicationDefinition(metaclass=ApplicationDefinitionMeta):
             ApplicationDefinition._app_id_cache[app.id] = apps_by_name[app.name]
         return apps_by_name
 
+    @staticmethod
+    def _fetch_cached_apps(lookup: Dict[str, Union[str, int]], cache: "AppCache") -> List["App"]:
+        """Check App versions against the Site-local cache and download only new or changed Apps"""
+        AppModel: "Type[App]" = ApplicationDefinition._App
+        client = ApplicationDefinition._client
+        assert client is not None
+        apps: List["App"] = []
+        missing: Dict[int, str] = {}
+        for version in client.get("apps/versions", **lookup):
+            data = cache.get(version["id"], version["class_hash"])
+            if data is None:
+                missing[version["id"]] = version["class_hash"]
+            else:
+                apps.append(AppModel._from_api(data))
+        if missing:
+            logger.debug(f"App cache miss: fetching {len(missing)} Apps")
+            for app in AppModel.objects.filter(id=list(missing)):  # type: ignore
+                assert app.id is not None and app._read_model is not None
+                # Keyed by the hash of what was downloaded, in case the App changed in the meantime
+                class_hash = hashlib.md5(app.serialized_class.encode("utf-8")).hexdigest()
+                cache.put(app.id, class_hash, app._read_model.json())
+                apps.append(app)
+        return apps
+
     @classmethod
     def load_by_name(cls, app_name: str, site_name: Optional[str] = None) -> AppDefType:
         app_key = (site_name, app_name)
@@ -441,7 +543,7 @@ class ApplicationDefinition(metaclass=ApplicationDefinitionMeta):
     @classmethod
     def to_dict(cls) -> Dict[str, Any]:
         try:
-            serialized_class = serialize(cls)
+            serialized_class = serialize(cls, code_serializer(cls.serializer))
         except SerializeError as exc:
             logger.error(f"Please fix {cls.__name__}: can't serialize class due to: {exc}")
             raise
@@ -2,13 +2,13 @@ import concurrent.futures
 import logging
 import time
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional, Set, Type, Union
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Type, Union
 
 from balsam import schemas
-from balsam.schemas import JobState, deserialize, raise_from_serialized, serialize
+from balsam.schemas import JobState, deserialize, raise_from_serialized
 
 from .app import ApplicationDefinition
-from .manager import Manager
+from .manager import Manager, chunk_list, error_detail
 from .model import CreatableBalsamModel, Field, NonCreatableBalsamModel
 
 if TYPE_CHECKING:
@@ -31,6 +31,9 @@ DONE_STATES = schemas.DONE_STATES
 
 logger = logging.getLogger(__name__)
 
+JOB_CHANGES_LONG_POLL = 20.0
+MAX_POLL_BACKOFF = 8
+
 
 class SiteBase(CreatableBalsamModel):
     _create_model_cls = schemas.SiteCreate
@@ -40,6 +43,7 @@ class SiteBase(CreatableBalsamModel):
 
 class SiteManagerBase(Manager["Site"]):
     _api_path = "sites/"
+    _conditional_get_enabled = True
 
 
 class AppBase(CreatableBalsamModel):
@@ -50,6 +54,7 @@ class AppBase(CreatableBalsamModel):
 
 class AppManagerBase(Manager["App"]):
     _api_path = "apps/"
+    _conditional_get_enabled = True
 
 
 class BatchJobBase(CreatableBalsamModel):
@@ -135,6 +140,9 @@ class JobBase(CreatableBalsamModel):
 
     def __init__(self, app_id: InputAppType, site_name: Optional[str] = None, **kwargs: Any) -> None:
         app_id = self._resolve_app_id(app_id, site_name)
+        app_def = ApplicationDefinition._app_id_cache.get(app_id)
+        if app_def is not None:
+            kwargs.setdefault("serializer", app_def.serializer)
         super().__init__(**kwargs, app_id=app_id)
 
     @classmethod
@@ -173,9 +181,11 @@ class JobBase(CreatableBalsamModel):
         assert app_def._site_id is not None
         return app_def._site_id
 
-    def get_parameters(self) -> Dict[str, Any]:
+    def get_parameters(self, fetch_blobs: bool = True) -> Dict[str, Any]:
         """
-        Unpack and return the Job parameters dictionary
+        Unpack and return the Job parameters dictionary.  Large values stored as
+        blobs are read from the client's blob cache, and fetched from the API
+        unless `fetch_blobs` is False.
         """
         if self._state == "clean":
             assert self._read_model is not None
@@ -193,20 +203,44 @@ class JobBase(CreatableBalsamModel):
         params: Dict[str, Any] = deserialize(ser)
         if not isinstance(params, dict):
             raise ValueError(f"Deserialized Job parameters are of type {type(params)}; must be dict.")
+        refs = schemas.blob_refs(params)
+        if refs:
+            params = {**params, **self._load_blobs(refs, fetch_blobs)}
         return params
 
+    def _load_blobs(self, refs: Dict[str, str], fetch: bool = True) -> Dict[str, Any]:
+        """Deserialize the parameters stored as blobs, fetching them by digest as needed"""
+        if self._create_model is not None and self._state == "creating":
+            blobs = self._create_model.parameter_blobs
+        elif fetch:
+            blobs = self.objects._client.fetch_blobs(refs.values())
+        else:
+            blobs = self.objects._client.cached_blobs(refs.values())
+        missing = set(refs.values()) - blobs.keys()
+        if missing:
+            where = "found" if fetch else "in the blob cache"
+            raise ValueError(f"Job parameter blobs not {where}: {', '.join(sorted(missing))}")
+        return {key: deserialize(blobs[digest]) for key, digest in refs.items()}
+
     def set_parameters(self, value: Dict[str, Any]) -> None:
         """
         Set the Job parameters dictionary
         """
-        serialized = serialize(value)
         if self._state == "creating":
             assert self._create_model is not None
-            self._create_model.serialized_parameters = serialized
+            # Re-runs the serializing validator, which also splits out large values as blobs
+            self._create_model.parameters = value
         else:
+            app_def = ApplicationDefinition._app_id_cache.get(self.app_id)
+            serializer = app_def.serializer if app_def is not None else schemas.DEFAULT_SERIALIZER
+            serialized, blobs = schemas.serialize_parameters(value, serializer)
+            if blobs:
+                # Sent regardless of the local cache: the server may have reclaimed a cached blob
+                self.objects._client.upload_blobs(blobs, force=True)
             if self._update_model is None:
                 self._update_model = self._update_model_cls()
             self._update_model.serialized_parameters = serialized
+            self._update_model.blob_digests = sorted(blobs)
             self._dirty_fields.add("serialized_parameters")
             self._state = "dirty"
 
@@ -220,7 +254,7 @@ class JobBase(CreatableBalsamModel):
         s_ret = self._read_model.serialized_return_value
         s_exc = self._read_model.serialized_exception
         if s_ret:
-            return deserialize(s_ret)
+            return deserialize(s_ret, cache=False)
         elif s_exc:
             raise_from_serialized(s_exc)
         else:
@@ -260,11 +294,59 @@ class JobWaitResult(NamedTuple):
     not_done: List["Job"]
 
 
+class JobChanges(NamedTuple):
+    seq: int
+    has_more: bool
+    changes: List[Dict[str, Any]]
+    after_id: Optional[int] = None
+
+
 class JobManagerBase(Manager["Job"]):
     _api_path = "jobs/"
     _bulk_create_enabled = True
     _bulk_update_enabled = True
     _bulk_delete_enabled = True
+    _projection_enabled = True
+    _query_body_enabled = True
+
+    def bulk_create(self, instances: List["Job"]) -> List["Job"]:
+        """
+        Returns a list of newly created Jobs.  Each unique parameter blob (a large
+        parameter value, possibly shared by many of the Jobs) is uploaded once, first.
+        A cached blob that the server has since reclaimed is uploaded again.
+        """
+        blobs: Dict[str, str] = {}
+        for job in instances:
+            if job._create_model is not None:
+                blobs.update(job._create_model.parameter_blobs)
+        if not blobs:
+            return super().bulk_create(instances)
+        self._client.upload_blobs(blobs)
+        created: List["Job"] = []
+        for chunk in chunk_list(instances, chunk_size=schemas.MAX_ITEMS_PER_BULK_OP):
+            try:
+                created.extend(super().bulk_create(chunk))
+                continue
+            except Exception as exc:
+                detail = error_detail(exc)
+                if detail.get("code") != schemas.MISSING_BLOBS:
+                    raise
+            # Blobs known to the local cache were not uploaded, but have since been reclaimed on the server
+            missing = set(detail["digests"])
+            logger.debug(f"Re-uploading {len(missing)} reclaimed parameter blobs")
+            self._client.upload_blobs({digest: blobs[digest] for digest in missing if digest in blobs}, force=True)
+            created.extend(super().bulk_create(chunk))
+        return created
+
+    def prefetch_blobs(self, jobs: Iterable["Job"]) -> None:
+        """
+        Fetch the parameter blobs referenced by `jobs` into the client's blob cache,
+        in as few requests as possible.  Launchers call this when they acquire Jobs,
+        so that the runners on the Site read the blobs from the shared cache.
+        """
+        digests = {digest for job in jobs if job._read_model is not None for digest in job._read_model.blob_digests}
+        if digests:
+            self._client.fetch_blobs(digests)
 
     def bulk_refresh(self, jobs: List["Job"]) -> None:
         """
@@ -277,44 +359,129 @@ class JobManagerBase(Manager["Job"]):
             assert api_job.id is not None and api_job._read_model is not None
             jobs_by_id[api_job.id]._refresh_from_dict(api_job._read_model.dict())
 
+    def changes(
+        self,
+        after_seq: Optional[int] = None,
+        wait: float = 0.0,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        query: Optional["JobQuery"] = None,
+        after_id: Optional[int] = None,
+    ) -> JobChanges:
+        """
+        Fetch the Jobs created or updated after the `after_seq` cursor, in commit
+        order.  Each change is a dict with the Job `id`, `state`, `last_update`,
+        and any extra `fields`.  Pass the returned `seq` and `after_id` as the next
+        `after_seq` and `after_id`; omit `after_seq` to get the current cursor, or
+        pass 0 to start from the beginning.  Blocks up to `wait` seconds for a change.
+        Changes can be restricted to the Jobs matching a `query` (e.g.
+        `Job.objects.filter(tags=...)`).
+        """
+        params: Dict[str, Any] = {"wait": wait}
+        if after_seq is not None:
+            params["after_seq"] = after_seq
+        if after_id is not None:
+            params["after_id"] = after_id
+        if fields:
+            params["fields"] = fields
+        if limit is not None:
+            params["limit"] = limit
+        if query is not None:
+            params.update(query._filters)
+        response = self._client.get(self._api_path + "changes", **params)
+        return JobChanges(
+            seq=response["seq"],
+            has_more=response["has_more"],
+            changes=response["results"],
+            after_id=response.get("after_id"),
+        )
+
+    def _iter_completed(
+        self,
+        pending: List["Job"],
+        timeout: Optional[float],
+        poll_interval: float,
+        notify: bool,
+    ) -> Iterator[List["Job"]]:
+        """
+        Yield batches of newly-completed Jobs, removing them from `pending` in
+        place, until no Jobs are pending or `timeout` elapses.  With `notify`, the
+        Job change feed is long-polled and only changed Jobs are refreshed.
+        Otherwise (or if the feed fails), all pending Jobs are refreshed at an
+        interval which starts at `poll_interval` and backs off while nothing
+        completes.
+        """
+        start = time.time()
+        seq: Optional[int] = None
+        after_id: Optional[int] = None
+        resync = False
+        if notify and pending:
+            try:
+                seq = self.changes().seq
+            except Exception as exc:
+                logger.warning(f"Job change feed unavailable; falling back to polling: {exc}")
+            else:
+                resync = True  # Pick up changes made before the cursor
+        interval = poll_interval
+
+        while pending:
+            remaining = None if timeout is None else timeout - (time.time() - start)
+            if resync:
+                changed = pending
+                resync = False
+            elif remaining is not None and remaining <= 0:
+                return
+            elif seq is not None:
+                wait = JOB_CHANGES_LONG_POLL if remaining is None else min(JOB_CHANGES_LONG_POLL, remaining)
+                try:
+                    feed = self.changes(after_seq=seq, after_id=after_id, wait=wait)
+                except Exception as exc:
+                    logger.warning(f"Job change feed failed; falling back to polling: {exc}")
+                    seq = None
+                    continue
+                seq, after_id = feed.seq, feed.after_id
+                changed_ids = {change["id"] for change in feed.changes}
+                changed = [job for job in pending if job.id in changed_ids]
+            else:
+                time.sleep(interval if remaining is None else min(interval, remaining))
+                changed = pending
+
+            if changed:
+                self.bulk_refresh(changed)
+            finished = [job for job in pending if job.state in DONE_STATES]
+            if finished:
+                pending[:] = [job for job in pending if job.state not in DONE_STATES]
+                interval = poll_interval
+                yield finished
+            elif seq is None:
+                interval = min(interval * 2, poll_interval * MAX_POLL_BACKOFF)
+
     def wait(
         self,
         jobs: List["Job"],
         timeout: Optional[float] = None,
         poll_interval: float = 1.0,
         return_when: str = "ALL_COMPLETED",
+        notify: bool = True,
     ) -> JobWaitResult:
         """
-        Block and periodically refresh jobs, until either all have completed
-        (the default) or any have completed (return_when="FIRST_COMPLETED").
-        Also returns after `timeout` seconds.  Rather than raising a Timeout
-        error, returns a named tuple containing `done` and `not_done` Job lists.
+        Block until either all jobs have completed (the default) or any have
+        completed (return_when="FIRST_COMPLETED").  Also returns after `timeout`
+        seconds.  Rather than raising a Timeout error, returns a named tuple
+        containing `done` and `not_done` Job lists.  Long-polls the server's Job
+        change feed and refreshes only the Jobs that changed.  With
+        `notify=False`, or if the feed is unavailable, refreshes all jobs every
+        `poll_interval` seconds instead, backing off while none complete.
         """
+        done_jobs: List["Job"] = [job for job in jobs if job.state in DONE_STATES]
+        not_done_jobs: List["Job"] = [job for job in jobs if job.state not in DONE_STATES]
+        if return_when != "ALL_COMPLETED" and done_jobs:
+            return JobWaitResult(done=done_jobs, not_done=not_done_jobs)
 
-        start = time.time()
-        done_jobs: List["Job"] = []
-        not_done_jobs: List["Job"] = []
-
-        for job in jobs:
-            if job.state in DONE_STATES:
-                done_jobs.append(job)
-            else:
-                not_done_jobs.append(job)
-
-        def should_exit() -> bool:
-            timed_out = (time.time() - start > timeout) if timeout is not None else False
-            if return_when == "ALL_COMPLETED":
-                return timed_out or len(not_done_jobs) == 0
-            else:
-                return timed_out or len(done_jobs) > 0
-
-        while not should_exit():
-            time.sleep(poll_interval)
-            self.bulk_refresh(not_done_jobs)
-            finished = [job for job in not_done_jobs if job.state in DONE_STATES]
-            not_done_jobs[:] = [job for job in not_done_jobs if job.state not in DONE_STATES]
+        for finished in self._iter_completed(not_done_jobs, timeout, poll_interval, notify):
             done_jobs.extend(finished)
-
+            if return_when != "ALL_COMPLETED":
+                break
         return JobWaitResult(done=done_jobs, not_done=not_done_jobs)
 
     def as_completed(
@@ -322,34 +489,23 @@ class JobManagerBase(Manager["Job"]):
         jobs: List["Job"],
         timeout: Optional[float] = None,
         poll_interval: float = 1.0,
+        notify: bool = True,
     ) -> Iterator["Job"]:
         """
         Returns an iterator over the Job instances as they complete.  Raises a
         `concurrent.futures.TimeoutError` if __next__() is called and the result
         isn’t available after timeout seconds from the original call to
-        as_completed().
+        as_completed().  `poll_interval` and `notify` behave as in `wait()`.
         """
-
-        start = time.time()
         pending_jobs: List["Job"] = []
-
         for job in jobs:
             if job.state in DONE_STATES:
                 yield job
             else:
                 pending_jobs.append(job)
 
-        def should_exit() -> bool:
-            timed_out = (time.time() - start > timeout) if timeout is not None else False
-            return timed_out or not pending_jobs
-
-        while not should_exit():
-            time.sleep(poll_interval)
-            self.bulk_refresh(pending_jobs)
-            for job in pending_jobs:
-                if job.state in DONE_STATES:
-                    yield job
-            pending_jobs[:] = [job for job in pending_jobs if job.state not in DONE_STATES]
+        for finished in self._iter_completed(pending_jobs, timeout, poll_interval, notify):
+            yield from finished
 
         if pending_jobs:
             raise concurrent.futures.TimeoutError(
@@ -392,6 +548,10 @@ class SessionBase(CreatableBalsamModel):
             app_ids=app_ids,
         )
 
+    def release_jobs(self, job_ids: List[int]) -> int:
+        """Hand back acquired Jobs that have not started running"""
+        return self.__class__.objects._do_release(self, job_ids)
+
     def tick(self) -> None:
         return self.__class__.objects._do_tick(self)
 
@@ -409,6 +569,10 @@ class SessionManagerBase(Manager["Session"]):
         jobs = [Job._from_api(dat) for dat in acquired_raw]
         return jobs
 
+    def _do_release(self, instance: "SessionBase", job_ids: List[int]) -> int:
+        num_released: int = self._client.post(self._api_path + f"{instance.id}/release", job_ids=job_ids)
+        return num_released
+
     def _do_tick(self, instance: "SessionBase") -> None:
         self._client.put(self._api_path + f"{instance.id}")
 
@@ -1,8 +1,12 @@
 import logging
 from math import ceil
-from typing import TYPE_CHECKING, Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union
+from typing import TYPE_CHECKING, Any, Dict, Generic, List, NamedTuple, Optional, Tuple, Type, TypeVar, Union
+from urllib.parse import urlencode
+from weakref import WeakKeyDictionary
 
-from balsam.schemas import MAX_ITEMS_PER_BULK_OP, MAX_PAGE_SIZE
+from pydantic import BaseModel
+
+from balsam.schemas import BULK_OP_LIMIT_EXCEEDED, MAX_ITEMS_PER_BULK_OP, MAX_PAGE_SIZE, PayloadCache
 
 from .model import BalsamModel
 from .query import Query
@@ -11,25 +15,69 @@ if TYPE_CHECKING:
     from balsam.client import RESTClient
 
 FILTER_CHUNK_SIZE = 500
+# Filters that would encode to a longer URL query string are sent
+# in the request body instead (where the API supports `/query` endpoints)
+MAX_URL_QUERY_LENGTH = 4096
+# Estimated bytes of list responses kept for conditional GETs, per client
+CONDITIONAL_CACHE_BYTES = 32 * 1024 * 1024
 
 logger = logging.getLogger(__name__)
 T = TypeVar("T", bound=BalsamModel)
 U = TypeVar("U")
 
 
+class CachedList(NamedTuple):
+    etag: str
+    count: int
+    read_models: List[BaseModel]
+
+
+def _estimate_nbytes(results: List[Dict[str, Any]]) -> int:
+    """Rough size of list results: the string fields (e.g. serialized App classes) dominate"""
+    nbytes = 0
+    for dat in results:
+        nbytes += 64 * len(dat) + sum(len(val) for val in dat.values() if isinstance(val, str))
+    return nbytes
+
+
 def chunk_list(items: List[U], chunk_size: int) -> List[List[U]]:
     num_chunks = ceil(len(items) / chunk_size)
     return [items[n * chunk_size : (n + 1) * chunk_size] for n in range(num_chunks)]
 
 
+def error_detail(exc: Exception) -> Dict[str, Any]:
+    """The structured `detail` of an API 400 response (with an error `code`), or {}"""
+    response = getattr(exc, "response", None)
+    if response is None or getattr(response, "status_code", None) != 400:
+        return {}
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    detail = body.get("detail") if isinstance(body, dict) else None
+    return detail if isinstance(detail, dict) else {}
+
+
+def _exceeds_bulk_op_limit(exc: Exception) -> bool:
+    """True if the API rejected a bulk operation for selecting more than MAX_ITEMS_PER_BULK_OP items"""
+    return error_detail(exc).get("code") == BULK_OP_LIMIT_EXCEEDED
+
+
 class Manager(Generic[T]):
     _model_class: Type[T]
     _query_class: Type[Query[T]]
     _bulk_create_enabled: bool
     _bulk_update_enabled: bool
     _bulk_delete_enabled: bool
+    _projection_enabled: bool = False
+    _query_body_enabled: bool = False
+    _conditional_get_enabled: bool = False
     _api_path: str
 
+    # Validated list responses, keyed by client and then by request URL, in an LRU
+    # cache of CONDITIONAL_CACHE_BYTES. Revalidated on each query via `If-None-Match`.
+    _conditional_cache: "WeakKeyDictionary[RESTClient, PayloadCache]" = WeakKeyDictionary()
+
     def __init__(self, client: "RESTClient") -> None:
         self._client = client
         self._model_class.objects = self
@@ -103,11 +151,15 @@ class Manager(Generic[T]):
 
         for chunk in chunk_list(patch_list, chunk_size=MAX_ITEMS_PER_BULK_OP):
             res = self._client.bulk_patch(self._api_path, chunk)
+            if res is None:
+                continue  # Queued in a client pipeline
             if isinstance(res, int):
                 response_data.append(res)
             else:
                 response_data.extend(res)
 
+        if not response_data:
+            return
         if isinstance(response_data[0], int):
             logger.info(f"Updated {response_data} items: data was not updated in place.")
             return
@@ -126,6 +178,7 @@ class Manager(Generic[T]):
         ordering: Optional[str] = None,
         limit: Optional[int] = None,
         offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
     ) -> Dict[str, Any]:
         d = {}
         d.update(filters)
@@ -135,8 +188,19 @@ class Manager(Generic[T]):
             d.update(limit=limit)
         if offset is not None:
             d.update(offset=offset)
+        if fields and self._projection_enabled:
+            d.update(fields=fields)
         return d
 
+    def _use_query_body(self, filters: Dict[str, Any]) -> bool:
+        if not self._query_body_enabled:
+            return False
+        encodable = {
+            name: [str(v) for v in val] if isinstance(val, (list, tuple, set)) else str(val)
+            for name, val in filters.items()
+        }
+        return len(urlencode(encodable, doseq=True)) > MAX_URL_QUERY_LENGTH
+
     @staticmethod
     def _chunk_filters(filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         param_to_chunk = next(
@@ -158,30 +222,66 @@ class Manager(Generic[T]):
         results = response_data["results"]
         return count, results
 
+    def _fetch_page(
+        self,
+        filters: Dict[str, Any],
+        ordering: Optional[str],
+        limit: Optional[int],
+        offset: Optional[int],
+        fields: Optional[List[str]],
+    ) -> Dict[str, Any]:
+        if self._use_query_body(filters):
+            body_filters = filters if ordering is None else {**filters, "ordering": ordering}
+            query_params = self._build_query_params({}, limit=limit, offset=offset, fields=fields)
+            response_data: Dict[str, Any] = self._client.post_query(
+                self._api_path + "query", {"filters": body_filters}, **query_params
+            )
+        else:
+            query_params = self._build_query_params(filters, ordering, limit=limit, offset=offset, fields=fields)
+            response_data = self._client.get(self._api_path, **query_params)
+        return response_data
+
     def _fetch_pages(
-        self, filters: Dict[str, Any], ordering: Optional[str], limit: Optional[int], offset: Optional[int]
+        self,
+        filters: Dict[str, Any],
+        ordering: Optional[str],
+        limit: Optional[int],
+        offset: Optional[int],
+        fields: Optional[List[str]] = None,
     ) -> Tuple[int, List[Dict[str, Any]]]:
         base_offset = 0 if offset is None else offset
         page_size = MAX_PAGE_SIZE if limit is None else min(limit, MAX_PAGE_SIZE)
 
         # Fetch the first page of data and total item count
-        query_params = self._build_query_params(filters, ordering, limit=page_size, offset=base_offset)
-        response_data = self._client.get(self._api_path, **query_params)
+        response_data = self._fetch_page(filters, ordering, limit=page_size, offset=base_offset, fields=fields)
         count, results = self._unpack_list_response(response_data)
+        self._fetch_remaining_pages(results, count, filters, ordering, limit, offset, fields=fields)
+        return count, results
 
+    def _fetch_remaining_pages(
+        self,
+        results: List[Dict[str, Any]],
+        count: int,
+        filters: Dict[str, Any],
+        ordering: Optional[str],
+        limit: Optional[int],
+        offset: Optional[int],
+        fields: Optional[List[str]] = None,
+    ) -> None:
+        """Extend the first page of `results` with the rest of the query's pages"""
+        base_offset = 0 if offset is None else offset
+        page_size = MAX_PAGE_SIZE if limit is None else min(limit, MAX_PAGE_SIZE)
         num_to_fetch = count if limit is None else min(limit, count)
         num_pages = ceil(num_to_fetch / MAX_PAGE_SIZE)
 
         # If there is more than 1 page of data to fetch
         for page_no in range(1, num_pages):
             to_fetch = min(page_size, num_to_fetch - len(results))
-            query_params = self._build_query_params(
-                filters, ordering, limit=to_fetch, offset=base_offset + (page_no * page_size)
+            response_data = self._fetch_page(
+                filters, ordering, limit=to_fetch, offset=base_offset + (page_no * page_size), fields=fields
             )
-            response_data = self._client.get(self._api_path, **query_params)
             _, page = self._unpack_list_response(response_data)
             results.extend(page)
-        return count, results
 
     def _get_list(
         self,
@@ -190,23 +290,89 @@ class Manager(Generic[T]):
         limit: Optional[int],
         offset: Optional[int],
     ) -> Tuple[List[T], int]:
-        filter_chunks = self._chunk_filters(filters)
+        if self._conditional_get_enabled:
+            cached_result = self._get_list_conditional(filters, ordering, limit, offset)
+            if cached_result is not None:
+                return cached_result
+        full_results, full_count = self._get_raw_list(filters, ordering, limit, offset)
+        instances = [self._model_class._from_api(dat) for dat in full_results]
+        return instances, full_count
+
+    def _get_list_conditional(
+        self,
+        filters: Dict[str, Any],
+        ordering: Optional[str],
+        limit: Optional[int],
+        offset: Optional[int],
+    ) -> Optional[Tuple[List[T], int]]:
+        """
+        Fetch the first page with a conditional GET, re-using the previously
+        validated models if the server responds 304 Not Modified.  Results
+        spanning several pages are completed with plain GETs and not cached.
+        Returns None if the filters must be split across several queries.
+        """
+        if len(self._chunk_filters(filters)) > 1:
+            return None
+        page_size = MAX_PAGE_SIZE if limit is None else min(limit, MAX_PAGE_SIZE)
+        query_params = self._build_query_params(filters, ordering, limit=page_size, offset=offset or 0)
+        cache_key = self._api_path + "?" + urlencode(sorted(query_params.items()), doseq=True)
+        client_cache = self._conditional_cache.get(self._client)
+        if client_cache is None:
+            client_cache = self._conditional_cache.setdefault(self._client, PayloadCache(CONDITIONAL_CACHE_BYTES))
+        cached: Optional[CachedList] = client_cache.get(cache_key)[1]
+
+        etag, response_data = self._client.get_conditional(
+            self._api_path, etag=cached.etag if cached else None, **query_params
+        )
+        if response_data is None and cached is not None:
+            logger.debug(f"Not modified: re-using {len(cached.read_models)} cached items from {cache_key}")
+            count, read_models = cached.count, cached.read_models
+        else:
+            count, results = self._unpack_list_response(response_data)
+            if len(results) < (count if limit is None else min(limit, count)):
+                self._fetch_remaining_pages(results, count, filters, ordering, limit, offset)
+                return [self._model_class._from_api(dat) for dat in results], count
+            read_models = [self._model_class._read_model_cls(**dat) for dat in results]
+            if etag:
+                cached = CachedList(etag=etag, count=count, read_models=read_models)
+                client_cache.put(cache_key, cached, nbytes=_estimate_nbytes(results))
+        instances = [self._model_class._from_read_model(model.copy(deep=True)) for model in read_models]
+        return instances, count
+
+    def _get_raw_list(
+        self,
+        filters: Dict[str, Any],
+        ordering: Optional[str],
+        limit: Optional[int],
+        offset: Optional[int],
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Fetch the raw JSON dicts without constructing model instances.
+        If `fields` is given, the API only returns those columns (where supported).
+        """
+        if fields and ordering and ordering.lstrip("-") not in fields:
+            fields = [*fields, ordering.lstrip("-")]
         full_count: int = 0
         full_results: List[Dict[str, Any]] = []
 
         # Added complexity: we handle the case that one URL query
-        # parameter is too long: chunk query into multiple GETs passing subsets
-        # of the sequence (e.g. filter by list of 100k job ids will result in 196 requests
-        # being stitched together)
+        # parameter is too long. If the API offers a `/query` endpoint, the filters are
+        # POSTed in the request body and run as one query. Otherwise, chunk the query
+        # into multiple GETs passing subsets of the sequence (e.g. filter by list of
+        # 100k job ids will result in 196 requests being stitched together)
+        if self._use_query_body(filters):
+            filter_chunks = [filters]
+        else:
+            filter_chunks = self._chunk_filters(filters)
         for filter_chunk in filter_chunks:
-            count, results = self._fetch_pages(filter_chunk, ordering, limit, offset)
+            count, results = self._fetch_pages(filter_chunk, ordering, limit, offset, fields=fields)
             full_count += count
             full_results.extend(results)
         if ordering and len(filter_chunks) > 1:
             order_key, reverse = (ordering.lstrip("-"), True) if ordering.startswith("-") else (ordering, False)
             full_results = sorted(full_results, key=lambda r: r[order_key], reverse=reverse)  # type: ignore
-        instances = [self._model_class._from_api(dat) for dat in full_results]
-        return instances, full_count
+        return full_results, full_count
 
     def _do_update(self, instance: T) -> None:
         assert instance._update_model is not None
@@ -225,16 +391,34 @@ class Manager(Generic[T]):
         if not self._bulk_update_enabled:
             raise NotImplementedError(f"The {self._model_class.__name__} API does not offer bulk updates")
 
-        _, items = self._fetch_pages(filters, ordering=None, limit=None, offset=None)
+        if self._query_body_enabled:
+            # One round trip for the whole query, unless it selects more Jobs than the
+            # API updates in one call: then fall back to updating id chunks
+            try:
+                num_updated: int = self._client.bulk_put(
+                    self._api_path + "query", {"filters": filters, "update": patch}
+                )
+                return num_updated
+            except Exception as exc:
+                if not _exceeds_bulk_op_limit(exc):
+                    raise
+                logger.debug(f"Query update exceeds {MAX_ITEMS_PER_BULK_OP} items: updating in chunks")
+
+        _, items = self._fetch_pages(filters, ordering=None, limit=None, offset=None, fields=["id"])
         update_ids = [item["id"] for item in items]
 
         response_data = []
-        for ids_chunk in chunk_list(update_ids, chunk_size=FILTER_CHUNK_SIZE):
-            res = self._client.bulk_put(self._api_path, patch, id=ids_chunk)
-            if isinstance(res, int):
+        if self._query_body_enabled:
+            for ids_chunk in chunk_list(update_ids, chunk_size=MAX_ITEMS_PER_BULK_OP):
+                res = self._client.bulk_put(self._api_path + "query", {"filters": {"id": ids_chunk}, "update": patch})
                 response_data.append(res)
-            else:
-                response_data.extend(res)
+        else:
+            for ids_chunk in chunk_list(update_ids, chunk_size=FILTER_CHUNK_SIZE):
+                res = self._client.bulk_put(self._api_path, patch, id=ids_chunk)
+                if isinstance(res, int):
+                    response_data.append(res)
+                else:
+                    response_data.extend(res)
 
         if response_data and isinstance(response_data[0], int):
             return sum(response_data)
@@ -249,8 +433,11 @@ class Manager(Generic[T]):
     def _do_bulk_delete(self, filters: Dict[str, Any]) -> Union[int, None]:
         if not self._bulk_delete_enabled:
             raise NotImplementedError(f"The {self._model_class.__name__} API does not offer bulk deletes")
-        query_params = self._build_query_params(filters)
-        response = self._client.bulk_delete(self._api_path, **query_params)
+        if self._use_query_body(filters):
+            response = self._client.delete_query(self._api_path + "query", {"filters": filters})
+        else:
+            query_params = self._build_query_params(filters)
+            response = self._client.bulk_delete(self._api_path, **query_params)
         if isinstance(response, int):
             return response
         return None
@@ -130,6 +130,17 @@ class BalsamModel(metaclass=BalsamModelMeta):
     def _from_api(cls: Type[T], data: Any) -> T:
         return cls(_api_data=True, **data)
 
+    @classmethod
+    def _from_read_model(cls: Type[T], read_model: BaseModel) -> T:
+        """Wrap an already-validated read model (skips re-validation of the data)"""
+        instance = cls.__new__(cls)
+        instance._create_model = None
+        instance._update_model = None
+        instance._read_model = read_model
+        instance._state = "clean"
+        instance._dirty_fields = set()
+        return instance
+
     def _refresh_from_dict(self, data: Dict[Any, Any]) -> None:
         self._read_model = self._read_model_cls(**data)
         self._set_clean()
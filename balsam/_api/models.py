@@ -573,6 +573,7 @@ class JobQuery(Query[Job]):
         workdir: Optional[pathlib.Path] = None,
         tags: Optional[typing.Dict[str, str]] = None,
         serialized_parameters: Optional[str] = None,
+        blob_digests: Optional[typing.List[str]] = None,
         data: Optional[typing.Dict[str, typing.Any]] = None,
         return_code: Optional[int] = None,
         num_nodes: Optional[int] = None,
@@ -597,6 +598,7 @@ class JobQuery(Query[Job]):
         workdir:                 Job path relative to the site data/ folder
         tags:                    Custom key:value string tags.
         serialized_parameters:   Encoded parameters dict
+        blob_digests:            Digests of the parameter blobs referenced by serialized_parameters
         data:                    Arbitrary JSON-able data dictionary.
         return_code:             Return code from last execution of this Job.
         num_nodes:               Number of compute nodes needed.
@@ -1,4 +1,6 @@
-from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, TypeVar, Union, overload
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union, overload
+
+from pydantic.fields import ModelField
 
 from .model import BalsamModel
 
@@ -175,6 +177,93 @@ class Query(Iterable[T]):
             self._count = _count
         return self._count
 
+    def _read_fields(self, fields: Tuple[str, ...]) -> Dict[str, ModelField]:
+        read_fields = self._manager._model_class._read_model_cls.__fields__
+        if not fields:
+            return dict(read_fields)
+        unknown = [name for name in fields if name not in read_fields]
+        if unknown:
+            raise ValueError(f"{self._manager._model_class.__name__} has no fields: {unknown}")
+        return {name: read_fields[name] for name in fields}
+
+    def _fetch_values(self, fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        """
+        Fetch only the selected fields as plain dicts. Each value is validated
+        through its pydantic field, but no model instances are constructed.
+        """
+        model_fields = self._read_fields(fields)
+        if self._empty:
+            return []
+        if self._result_cache is not None:
+            return [{name: getattr(obj._read_model, name) for name in model_fields} for obj in self._result_cache]
+
+        raw_results, count = self._manager._get_raw_list(
+            filters=self._filters,
+            ordering=self._order_field,
+            limit=self._limit,
+            offset=self._offset,
+            fields=list(model_fields),
+        )
+        self._count = count
+        rows = []
+        for raw in raw_results:
+            row = {}
+            for name, field in model_fields.items():
+                value, errors = field.validate(raw.get(name), row, loc=name)
+                if errors:
+                    raise ValueError(f"Invalid value for {name}: {errors}")
+                row[name] = value
+            rows.append(row)
+        return rows
+
+    def values(self, *fields: str) -> List[Dict[str, Any]]:
+        """
+        Return a list of dicts containing only the requested fields (or all
+        fields, if none are given). Skips construction of model instances.
+        """
+        return self._fetch_values(fields)
+
+    def values_list(self, *fields: str, flat: bool = False) -> List[Any]:
+        """
+        Return a list of tuples containing the requested field values, in order.
+        With `flat=True` and a single field, return a flat list of values instead.
+        """
+        if flat and len(fields) != 1:
+            raise TypeError("values_list(flat=True) requires exactly one field")
+        rows = self._fetch_values(fields)
+        if flat:
+            return [row[fields[0]] for row in rows]
+        return [tuple(row.values()) for row in rows]
+
+    def to_columns(self, *fields: str, as_dataframe: bool = False) -> Any:
+        """
+        Return the requested fields column-wise, as a dict of NumPy arrays.
+        With `as_dataframe=True`, return a pandas DataFrame instead.
+        Requires NumPy (and pandas for DataFrame output).
+        """
+        rows = self._fetch_values(fields)
+        names = list(self._read_fields(fields))
+        columns = {name: [row[name] for row in rows] for name in names}
+        if as_dataframe:
+            import pandas  # type: ignore
+
+            return pandas.DataFrame(columns, columns=names)
+
+        import numpy  # type: ignore
+
+        arrays = {}
+        for name, col in columns.items():
+            try:
+                arr = numpy.asarray(col)
+            except ValueError:
+                arr = None
+            if arr is None or arr.ndim != 1:
+                # Container-valued fields (tags, parent_ids, ...) become 1D object arrays
+                arr = numpy.empty(len(col), dtype=object)
+                arr[:] = col
+            arrays[name] = arr
+        return arrays
+
     def _update(self, **kwargs: Any) -> Union[int, List[T]]:
         if self._empty:
             return []
@@ -2,6 +2,10 @@
 Clients: perform requests to Balsam server
 """
 
+from .app_cache import AppCache
+from .blobs import BlobCache
+from .instrumentation import RequestHook, RequestStats
+from .pipeline import Pipeline, PipelineError
 from .requests_client import NotAuthenticatedError, RequestsClient
 from .requests_oauth import OAuthRequestsClient
 from .requests_password import BasicAuthRequestsClient
@@ -13,4 +17,10 @@ __all__ = [
     "BasicAuthRequestsClient",
     "OAuthRequestsClient",
     "NotAuthenticatedError",
+    "Pipeline",
+    "BlobCache",
+    "AppCache",
+    "RequestHook",
+    "RequestStats",
+    "PipelineError",
 ]
@@ -0,0 +1,43 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class AppCache:
+    """
+    Site-local cache of App definitions, one JSON file per App version named
+    `{app_id}-{class_hash}.json`.  `ApplicationDefinition.load_by_site` checks
+    the hashes from `GET /apps/versions` against this cache, so processes
+    starting on the Site download only the Apps that changed.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path]) -> None:
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, app_id: int, class_hash: str) -> Path:
+        return self.cache_dir.joinpath(f"{app_id}-{class_hash}.json")
+
+    def get(self, app_id: int, class_hash: str) -> Optional[Dict[str, Any]]:
+        try:
+            data: Dict[str, Any] = json.loads(self._path(app_id, class_hash).read_text())
+        except (OSError, ValueError):
+            return None
+        return data
+
+    def put(self, app_id: int, class_hash: str, data: str) -> None:
+        """Store the App's JSON and remove older versions of the same App"""
+        path = self._path(app_id, class_hash)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(data)
+            os.replace(tmp_path, path)
+            for stale in self.cache_dir.glob(f"{app_id}-*.json"):
+                if stale != path:
+                    stale.unlink()
+        except OSError as exc:
+            logger.warning(f"Failed to write App {app_id} to cache: {exc}")
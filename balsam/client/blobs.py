@@ -0,0 +1,86 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class BlobCache:
+    """
+    Client-side cache of content-addressed blobs (large Job parameter values).
+    Blobs are kept in memory, up to `max_memory_bytes` in LRU order, and in
+    `cache_dir` if given: one file per digest, shared by every process on the
+    Site (e.g. each python_runner spawned by a launcher).  A cached blob is
+    known to exist on the server, so it is never uploaded again.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path, None] = None, max_memory_bytes: int = 256_000_000) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir.joinpath(digest[:2], digest)
+
+    def __contains__(self, digest: str) -> bool:
+        if digest in self._memory:
+            return True
+        path = self._path(digest)
+        return path is not None and path.is_file()
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return self._memory[digest]
+        path = self._path(digest)
+        if path is None:
+            return None
+        try:
+            data = path.read_text()
+        except OSError:
+            return None
+        self._remember(digest, data)
+        return data
+
+    def put(self, digest: str, data: str) -> None:
+        self._remember(digest, data)
+        path = self._path(digest)
+        if path is None or path.is_file():
+            return
+        tmp_path = path.with_name(f"{digest}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning(f"Failed to write blob {digest} to cache: {exc}")
+
+    def _remember(self, digest: str, data: str) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return
+            self._memory[digest] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
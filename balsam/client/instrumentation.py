@@ -0,0 +1,246 @@
+import json
+import logging
+import multiprocessing.util
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    float("inf"),
+)
+
+_ID_SEGMENT = re.compile(r"(?<=/)\d+(?=/|$)")
+
+
+def endpoint_key(http_method: str, url: str) -> str:
+    """Group requests by method and path, with numeric ids replaced (e.g. `PUT sessions/{id}`)"""
+    path = _ID_SEGMENT.sub("{id}", "/" + url.strip("/")).lstrip("/")
+    return f"{http_method} {path}"
+
+
+class RequestHook:
+    """
+    Instrumentation interface for RESTClient.  Assign an instance to
+    `client.instrumentation` to observe every HTTP attempt and retry.
+    """
+
+    def record_request(
+        self,
+        http_method: str,
+        url: str,
+        elapsed: float,
+        status_code: Optional[int],
+        bytes_out: int,
+        bytes_in: int,
+    ) -> None:
+        """
+        Called after each HTTP attempt.  `status_code` is None if no response
+        was received (e.g. a timeout or connection error).
+        """
+
+    def record_retry(self, http_method: str, url: str, backoff_sec: float) -> None:
+        """Called after sleeping `backoff_sec` before retrying a failed attempt."""
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        self.min = min(self.min, elapsed)
+        self.max = max(self.max, elapsed)
+
+    def percentile(self, pct: float) -> float:
+        """Estimate a percentile as the upper bound of its bucket (capped at the max)"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for bound, num in zip(LATENCY_BUCKETS, self.counts):
+            seen += num
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                ("+Inf" if bound == float("inf") else str(bound)): num
+                for bound, num in zip(LATENCY_BUCKETS, self.counts)
+            },
+        }
+
+
+class EndpointStats:
+    def __init__(self) -> None:
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.retries = 0
+        self.backoff_sec = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.to_dict(),
+            "errors": self.errors,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "retries": self.retries,
+            "backoff_sec": self.backoff_sec,
+        }
+
+
+class RequestStats(RequestHook):
+    """
+    Aggregates per-endpoint latency histograms, payload sizes, and retries.
+    Every `dump_period` seconds (from a background thread), and once more when
+    the process exits, a summary is written to the log and the full stats to
+    `{stats_path}.{pid}.json` (one file per process sharing the client).
+    """
+
+    def __init__(self, stats_path: Union[str, Path, None] = None, dump_period: float = 300.0) -> None:
+        self.stats_path = Path(stats_path) if stats_path is not None else None
+        self.dump_period = dump_period
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._dump_lock = threading.Lock()
+        self._endpoints: Dict[str, EndpointStats] = {}
+        self._started = time.time()
+        self._schedule_dumps()
+
+    def _schedule_dumps(self) -> None:
+        """Start the periodic dump thread and register the exit dump for this process"""
+        if self.dump_period:
+            thread = threading.Thread(target=self._dump_periodically, daemon=True, name="api-stats")
+            thread.start()
+        # Unlike atexit, multiprocessing finalizers also run when a Process child exits
+        multiprocessing.util.Finalize(self, self._dump_at_exit, args=(self._pid,), exitpriority=10)
+
+    def _dump_periodically(self) -> None:
+        pid = self._pid
+        while True:
+            time.sleep(self.dump_period)
+            if self._pid != pid:
+                return
+            self.dump()
+
+    def _dump_at_exit(self, pid: int) -> None:
+        if self._pid == pid and self._endpoints:
+            self.dump()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        del state["_dump_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._dump_lock = threading.Lock()
+
+    def _endpoint(self, http_method: str, url: str) -> EndpointStats:
+        if os.getpid() != self._pid:
+            # Do not report the parent process' requests from a forked child
+            self._reset()
+        key = endpoint_key(http_method, url)
+        if key not in self._endpoints:
+            self._endpoints[key] = EndpointStats()
+        return self._endpoints[key]
+
+    def record_request(
+        self,
+        http_method: str,
+        url: str,
+        elapsed: float,
+        status_code: Optional[int],
+        bytes_out: int,
+        bytes_in: int,
+    ) -> None:
+        with self._lock:
+            stats = self._endpoint(http_method, url)
+            stats.latency.add(elapsed)
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            if status_code is None or status_code >= 400:
+                stats.errors += 1
+
+    def record_retry(self, http_method: str, url: str, backoff_sec: float) -> None:
+        with self._lock:
+            stats = self._endpoint(http_method, url)
+            stats.retries += 1
+            stats.backoff_sec += backoff_sec
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {key: stats.to_dict() for key, stats in sorted(self._endpoints.items())}
+        return {"pid": self._pid, "start_time": self._started, "end_time": time.time(), "endpoints": endpoints}
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = [f"API request stats over {summary['end_time'] - summary['start_time']:.1f} sec:"]
+        for key, stats in summary["endpoints"].items():
+            lat = stats["latency"]
+            lines.append(
+                f"  {key}: n={lat['count']} errors={stats['errors']} "
+                f"mean={lat['mean']:.3f}s p50<={lat['p50']:.3f}s p95<={lat['p95']:.3f}s max={lat['max']:.3f}s "
+                f"retries={stats['retries']} backoff={stats['backoff_sec']:.1f}s "
+                f"out={stats['bytes_out']}B in={stats['bytes_in']}B"
+            )
+        return "\n".join(lines)
+
+    def dump(self) -> Optional[Path]:
+        """Log a summary and write the stats JSON file. Returns the file path, if any."""
+        with self._dump_lock:
+            logger.info(self.format_summary())
+            if self.stats_path is None:
+                return None
+            path = self.stats_path.with_name(f"{self.stats_path.name}.{os.getpid()}.json")
+            tmp_path = path.with_name(path.name + ".tmp")
+            try:
+                with open(tmp_path, "w") as fp:
+                    json.dump(self.summary(), fp, indent=2)
+                os.replace(tmp_path, path)
+            except OSError as exc:
+                logger.warning(f"Failed to write API request stats to {path}: {exc}")
+                return None
+            return path
@@ -0,0 +1,84 @@
+import logging
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Pattern, Tuple
+
+from balsam.schemas import MAX_BATCH_OPERATIONS
+
+if TYPE_CHECKING:
+    from .rest_base_client import RESTClient
+
+logger = logging.getLogger(__name__)
+
+# (method, path, whether the caller needs the response immediately)
+BATCHABLE_REQUESTS: List[Tuple[str, Pattern[str], bool]] = [
+    ("PUT", re.compile(r"^sessions/\d+$"), False),
+    ("POST", re.compile(r"^sessions/\d+$"), True),
+    ("PATCH", re.compile(r"^jobs$"), False),
+    ("PATCH", re.compile(r"^transfers$"), False),
+]
+
+
+class PipelineError(Exception):
+    def __init__(self, failures: List[Tuple[int, Dict[str, Any], Dict[str, Any]]]) -> None:
+        self.failures = failures
+        lines = [
+            f"[{idx}] {op['method']} {op['path']}: {result['status_code']} {result['detail']}"
+            for idx, op, result in failures
+        ]
+        super().__init__("Pipelined operations failed:\n" + "\n".join(lines))
+
+
+class Pipeline:
+    """
+    Queues write requests from a RESTClient and sends them together in a single
+    `POST /batch` request.  Calls whose response is needed right away (like
+    acquiring Jobs) flush the queue and return their own result; queued calls
+    return None.  Any other request flushes the queue first, preserving order.
+    """
+
+    def __init__(self, client: "RESTClient", atomic: bool = False) -> None:
+        self.client = client
+        self.atomic = atomic
+        self.results: List[Any] = []
+        self._queue: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def submit(
+        self, url: str, http_method: str, params: Optional[Dict[str, Any]], json: Any, data: Any
+    ) -> Tuple[bool, Any]:
+        """
+        Queue the request if it can be batched.  Returns (queued, result).
+        """
+        if params or data is not None:
+            return False, None
+        path = url.strip("/")
+        for method, pattern, needs_result in BATCHABLE_REQUESTS:
+            if method == http_method and pattern.match(path):
+                self._queue.append({"method": method, "path": path, "body": json})
+                if needs_result or len(self._queue) >= MAX_BATCH_OPERATIONS:
+                    result = self.flush()[-1]
+                    return True, (result if needs_result else None)
+                return True, None
+        return False, None
+
+    def flush(self) -> List[Any]:
+        """
+        Send the queued operations and return their response data, in order.
+        Raises PipelineError if any operation failed.
+        """
+        if not self._queue:
+            return []
+        operations, self._queue = self._queue, []
+        logger.debug(f"Flushing pipeline of {len(operations)} operations")
+        response = self.client.request("batch/", "POST", json={"operations": operations, "atomic": self.atomic})
+        results = response["results"]
+        failures = [
+            (idx, op, res) for idx, (op, res) in enumerate(zip(operations, results)) if res["status_code"] >= 400
+        ]
+        if failures:
+            raise PipelineError(failures)
+        data = [res["data"] for res in results]
+        self.results.extend(data)
+        return data
@@ -4,7 +4,7 @@ import random
 import time
 from json import JSONDecodeError
 from pprint import pformat
-from typing import Any, Dict, List, Optional, Type, Union
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
 import requests
 
@@ -20,6 +20,18 @@ class NotAuthenticatedError(Exception):
     pass
 
 
+def _is_coded_rejection(response: Optional[requests.Response]) -> bool:
+    """A 400 response with a structured error `code` is a deliberate API rejection, which no retry can fix"""
+    if response is None or response.status_code != 400:
+        return False
+    try:
+        body = response.json()
+    except (ValueError, JSONDecodeError):
+        return False
+    detail = body.get("detail") if isinstance(body, dict) else None
+    return isinstance(detail, dict) and "code" in detail
+
+
 class RequestsClient(RESTClient):
     _client_classes: "Dict[str, Type[RequestsClient]]" = {}
 
@@ -87,31 +99,100 @@ class RequestsClient(RESTClient):
         data: OptionalAnyJSON = None,
         authenticating: bool = False,
     ) -> OptionalAnyJSON:
+        pipeline = self._active_pipeline()
+        if pipeline is not None and not authenticating:
+            queued, result = pipeline.submit(url, http_method, params, json, data)
+            if queued:
+                return result  # type: ignore
+        response = self._request_with_retry(url, http_method, params, json, data, authenticating=authenticating)
+        try:
+            return response.json()  # type: ignore
+        except (ValueError, JSONDecodeError):
+            if http_method != "DELETE":
+                raise
+            return None
+
+    def get_conditional(self, url: str, etag: Optional[str], **kwargs: Any) -> Tuple[Optional[str], Any]:
+        headers = {"If-None-Match": etag} if etag else None
+        response = self._request_with_retry(url, "GET", params=kwargs, headers=headers)
+        new_etag = response.headers.get("ETag")
+        if response.status_code == 304:
+            return (new_etag or etag), None
+        return new_etag, response.json()
+
+    def _request_with_retry(
+        self,
+        url: str,
+        http_method: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: OptionalAnyJSON = None,
+        data: OptionalAnyJSON = None,
+        headers: Optional[Dict[str, str]] = None,
+        authenticating: bool = False,
+    ) -> requests.Response:
         if not self._authenticated and not authenticating:
             raise NotAuthenticatedError("Cannot perform unauthenticated request. Please login with `balsam login`")
+        pipeline = self._active_pipeline()
+        if pipeline is not None:
+            pipeline.flush()  # Send queued operations first to preserve ordering
         absolute_url = self.api_root.rstrip("/") + "/" + url.lstrip("/")
         self._attempt = 0
         while True:
             try:
                 logger.debug(f"{http_method}: {absolute_url} {params if params else ''}")
-                response = self._do_request(absolute_url, http_method, params, json, data)
+                return self._timed_request(url, absolute_url, http_method, params, json, data, headers)
             except requests.Timeout as exc:
                 logger.warning(f"Attempt Retry of Timed-out request {http_method} {absolute_url}")
-                self.backoff(exc)
+                self._backoff_retry(http_method, url, exc)
             except requests.ConnectionError as exc:
                 logger.warning(f"Attempt retry ({self._attempt} of {self.retry_count}) of connection: {exc}")
-                self.backoff(exc)
+                self._backoff_retry(http_method, url, exc)
             except requests.HTTPError as exc:
+                if _is_coded_rejection(exc.response):
+                    raise
                 if authenticating is False:
                     logger.warning(f"Attempt retry ({self._attempt} of {self.retry_count}) of connection: {exc}")
-                    self.backoff(exc)
+                    self._backoff_retry(http_method, url, exc)
+
+    def _backoff_retry(self, http_method: str, url: str, reason: Exception) -> None:
+        if self._retries_disabled():
+            raise reason
+        start = time.perf_counter()
+        self.backoff(reason)
+        if self.instrumentation is not None:
+            self.instrumentation.record_retry(http_method, url, time.perf_counter() - start)
+
+    def _timed_request(
+        self,
+        url: str,
+        absolute_url: str,
+        http_method: str,
+        params: Optional[Dict[str, Any]],
+        json: OptionalAnyJSON,
+        data: OptionalAnyJSON,
+        headers: Optional[Dict[str, str]],
+    ) -> requests.Response:
+        """Perform one attempt of the request, reporting it to the instrumentation hook"""
+        hook = self.instrumentation
+        if hook is None:
+            return self._do_request(absolute_url, http_method, params, json, data, headers)
+        response: Optional[requests.Response] = None
+        start = time.perf_counter()
+        try:
+            response = self._do_request(absolute_url, http_method, params, json, data, headers)
+            return response
+        except requests.RequestException as exc:
+            response = exc.response
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if response is not None:
+                body = response.request.body
+                hook.record_request(
+                    http_method, url, elapsed, response.status_code, len(body or b""), len(response.content)
+                )
             else:
-                try:
-                    return response.json()  # type: ignore
-                except (ValueError, JSONDecodeError):
-                    if http_method != "DELETE":
-                        raise
-                    return None
+                hook.record_request(http_method, url, elapsed, None, 0, 0)
 
     def _do_request(
         self,
@@ -120,6 +201,7 @@ class RequestsClient(RESTClient):
         params: Optional[Dict[str, Any]],
         json: OptionalAnyJSON,
         data: OptionalAnyJSON,
+        headers: Optional[Dict[str, str]] = None,
     ) -> requests.Response:
         response = self.session.request(
             http_method,
@@ -127,6 +209,7 @@ class RequestsClient(RESTClient):
             params=params,
             json=json,
             data=data,
+            headers=headers,
             timeout=(self.connect_timeout, self.read_timeout),
         )
         if response.status_code >= 400:
@@ -1,5 +1,7 @@
+import threading
+from contextlib import contextmanager
 from datetime import timedelta
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
 
 from balsam._api.models import (
     App,
@@ -17,8 +19,16 @@ from balsam._api.models import (
     TransferItem,
     TransferItemManager,
 )
+from balsam.schemas import MAX_BLOBS_PER_FETCH
 
+from .app_cache import AppCache
+from .blobs import BlobCache
 from .encoders import jsonable_encoder
+from .instrumentation import RequestHook
+from .pipeline import Pipeline
+
+# Upper bound on the total size of blobs sent in one upload request
+MAX_BLOB_UPLOAD_BYTES = 32_000_000
 
 
 class AuthError(Exception):
@@ -27,6 +37,9 @@ class AuthError(Exception):
 
 class RESTClient:
     expires_in: timedelta
+    instrumentation: Optional[RequestHook] = None
+    blob_cache: Optional[BlobCache] = None
+    app_cache: Optional[AppCache] = None
 
     def __init__(*args: Any, **kwargs: Any) -> None:
         raise NotImplementedError
@@ -60,10 +73,121 @@ class RESTClient:
         """
         raise NotImplementedError
 
+    @contextmanager
+    def pipeline(self, atomic: bool = False) -> Iterator[Pipeline]:
+        """
+        Queue supported write calls made in this thread (Session tick and acquire, Job
+        and TransferItem bulk updates) and send them in one batch request.  The queue
+        is flushed on exiting the block, when a queued call needs its result, and
+        before any other request.  With `atomic`, each flush runs in one transaction.
+
+        If the block raises, writes still in the queue are discarded, not sent.
+        Only calls made from the same thread share a batch.
+        """
+        pipelines: Dict[int, Pipeline] = self.__dict__.setdefault("_pipelines", {})
+        thread_id = threading.get_ident()
+        if thread_id in pipelines:
+            yield pipelines[thread_id]
+            return
+        pipe = Pipeline(self, atomic=atomic)
+        pipelines[thread_id] = pipe
+        try:
+            yield pipe
+        except BaseException:
+            del pipelines[thread_id]
+            raise
+        del pipelines[thread_id]
+        pipe.flush()
+
+    def _active_pipeline(self) -> Optional[Pipeline]:
+        pipelines: Optional[Dict[int, Pipeline]] = self.__dict__.get("_pipelines")
+        return pipelines.get(threading.get_ident()) if pipelines else None
+
+    @contextmanager
+    def no_retries(self) -> Iterator[None]:
+        """
+        Raise the first failure of each request made in this thread, instead of
+        retrying it, for callers that retry with their own backoff.
+        """
+        threads: Set[int] = self.__dict__.setdefault("_no_retry_threads", set())
+        thread_id = threading.get_ident()
+        if thread_id in threads:
+            yield
+            return
+        threads.add(thread_id)
+        try:
+            yield
+        finally:
+            threads.discard(thread_id)
+
+    def _retries_disabled(self) -> bool:
+        threads: Optional[Set[int]] = self.__dict__.get("_no_retry_threads")
+        return threads is not None and threading.get_ident() in threads
+
+    def _blob_cache(self) -> BlobCache:
+        if self.blob_cache is None:
+            self.blob_cache = BlobCache()
+        return self.blob_cache
+
+    def upload_blobs(self, blobs: Dict[str, str], force: bool = False) -> None:
+        """
+        Upload content-addressed blobs ({digest: data}), skipping any that are
+        already in the local blob cache unless `force` is True.
+        """
+        cache = self._blob_cache()
+        pending = [(digest, data) for digest, data in blobs.items() if force or digest not in cache]
+        while pending:
+            chunk, size = [], 0
+            while pending and (not chunk or size + len(pending[-1][1]) <= MAX_BLOB_UPLOAD_BYTES):
+                digest, data = pending.pop()
+                chunk.append({"digest": digest, "data": data})
+                size += len(data)
+            self.request("blobs/", "POST", json=chunk)
+            for blob in chunk:
+                cache.put(blob["digest"], blob["data"])
+
+    def cached_blobs(self, digests: Iterable[str]) -> Dict[str, str]:
+        """Look up blobs by digest in the local blob cache only"""
+        cache = self._blob_cache()
+        blobs = {digest: cache.get(digest) for digest in set(digests)}
+        return {digest: data for digest, data in blobs.items() if data is not None}
+
+    def fetch_blobs(self, digests: Iterable[str]) -> Dict[str, str]:
+        """
+        Look up blobs by digest in the local blob cache, fetching the missing ones
+        from the server.  Digests unknown to the server are omitted from the result.
+        """
+        cache = self._blob_cache()
+        blobs: Dict[str, str] = {}
+        missing = []
+        for digest in set(digests):
+            data = cache.get(digest)
+            if data is None:
+                missing.append(digest)
+            else:
+                blobs[digest] = data
+        for i in range(0, len(missing), MAX_BLOBS_PER_FETCH):
+            for blob in self.get("blobs/", digest=missing[i : i + MAX_BLOBS_PER_FETCH]):
+                cache.put(blob["digest"], blob["data"])
+                blobs[blob["digest"]] = blob["data"]
+        return blobs
+
     def get(self, url: str, **kwargs: Any) -> Any:
         """GET kwargs become URL query parameters (e.g. /?site=3)"""
         return self.request(url, "GET", params=kwargs)
 
+    def get_conditional(self, url: str, etag: Optional[str], **kwargs: Any) -> Tuple[Optional[str], Any]:
+        """
+        Conditional GET with an `If-None-Match: etag` header.
+        Returns (etag, data), where data is None if the resource is unchanged.
+        Clients without support for conditional requests always return the data.
+        """
+        return None, self.get(url, **kwargs)
+
+    def post_query(self, url: str, payload: Any, **kwargs: Any) -> Any:
+        """POST a JSON query body (e.g. filters too long for the URL); kwargs become URL query parameters"""
+        return self.request(url, "POST", json=jsonable_encoder(payload), params=kwargs)
+
     def post_form(self, url: str, **kwargs: Any) -> Any:
         return self.request(url, "POST", data=kwargs)
 
@@ -91,6 +215,9 @@ class RESTClient:
     def bulk_delete(self, url: str, **kwargs: Any) -> Any:
         return self.request(url, "DELETE", params=kwargs)
 
+    def delete_query(self, url: str, payload: Any) -> Any:
+        return self.request(url, "DELETE", json=jsonable_encoder(payload))
+
     @property
     def Site(self) -> Type[Site]:
         return SiteManager(client=self)._model_class
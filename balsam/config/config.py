@@ -11,7 +11,7 @@ from uuid import UUID
 import yaml
 from pydantic import AnyUrl, BaseSettings, Field, ValidationError, validator
 
-from balsam.client import NotAuthenticatedError, RequestsClient
+from balsam.client import AppCache, BlobCache, NotAuthenticatedError, RequestsClient, RequestStats
 from balsam.platform.app_run import AppRun
 from balsam.platform.compute_node import ComputeNode
 from balsam.platform.scheduler import SchedulerInterface
@@ -117,6 +117,7 @@ class LoggingConfig(BaseSettings):
     datefmt: str = "%Y-%m-%d %H:%M:%S"
     buffer_num_records: int = 1024
     flush_period: int = 30
+    api_stats_period: int = 300
 
 
 class SchedulerSettings(BaseSettings):
@@ -192,7 +193,13 @@ class LauncherSettings(BaseSettings):
     mpi_app_launcher: Type[AppRun] = Field("balsam.platform.app_run.AppRun")
     local_app_launcher: Type[AppRun] = Field("balsam.platform.app_run.LocalAppRun")
     mpirun_allows_node_packing: bool = False
+    mpirun_easy_backfill: bool = False
+    mpirun_spawn_threads: int = 8
+    mpirun_async_job_source: bool = False
     serial_mode_prefetch_per_rank: int = 64
+    serial_mode_pyfunc_pool: bool = False
+    serial_mode_adaptive_prefetch: bool = False
+    status_update_wal: bool = False
     sort_by: Optional[str] = None
     serial_mode_startup_params: Dict[str, str] = {"cpu_affinity": "none"}
 
@@ -269,6 +276,8 @@ class SiteConfig:
         self.site_path: Path = site_path
         self.site_id: int = site_id
         self.client = ClientSettings.load_from_file().build_client()
+        self.client.blob_cache = BlobCache(self.blob_cache_path)
+        self.client.app_cache = AppCache(self.app_cache_path)
 
         if settings is not None:
             if not isinstance(settings, Settings):
@@ -416,6 +425,18 @@ class SiteConfig:
     def data_path(self) -> Path:
         return self.site_path.joinpath("data")
 
+    @property
+    def blob_cache_path(self) -> Path:
+        return self.site_path.joinpath(".blob-cache")
+
+    @property
+    def app_cache_path(self) -> Path:
+        return self.site_path.joinpath(".app-cache")
+
+    @property
+    def app_payload_path(self) -> Path:
+        return self.site_path.joinpath(".app-payloads")
+
     def enable_logging(self, basename: str, filename: Optional[str] = None) -> Dict[str, Any]:
         if filename is None:
             ts = datetime.now().strftime("%Y-%m-%d_%H%M%S")
@@ -423,8 +444,13 @@ class SiteConfig:
         log_path = self.log_path.joinpath(filename)
         config_file_logging(
             filename=log_path,
-            **self.settings.logging.dict(),
+            **self.settings.logging.dict(exclude={"api_stats_period"}),
         )
+        if self.settings.logging.api_stats_period > 0:
+            self.client.instrumentation = RequestStats(
+                stats_path=log_path.with_name(f"{log_path.stem}.api-stats"),
+                dump_period=self.settings.logging.api_stats_period,
+            )
         return {"filename": log_path, **self.settings.logging.dict()}
 
     def update_site_from_config(self) -> None:
@@ -38,6 +38,9 @@ class AppRun(ABC):
     its lifecycle: start/poll/kill/tail_output, etc...
     """
 
+    # Whether several runs may be started concurrently from a thread pool
+    concurrent_start = True
+
     def __init__(
         self,
         cmdline: str,
@@ -148,15 +151,21 @@ class SubprocessAppRun(AppRun):
                 self._preamble_cache[self._preamble] = Path(fp.name).resolve()
         return f"source {self._preamble_cache[self._preamble]} && "
 
-    def _set_envs(self) -> None:
-        envs = os.environ.copy()
-        envs.update(self._envs)
+    def _env_delta(self) -> Dict[str, str]:
+        """The run's variables on top of the launcher's environment"""
+        envs = dict(self._envs)
         # Check the assigned GPU ID list from the first compute node:
         gpu_ids = self._node_spec.gpu_ids[0]
         if gpu_ids:
             envs["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"
             envs["CUDA_VISIBLE_DEVICES"] = ",".join(map(str, gpu_ids))
         envs["OMP_NUM_THREADS"] = str(self._threads_per_rank)
+        return envs
+
+    def _set_envs(self) -> None:
+        # Runs carry only their delta until the full environment is needed for Popen
+        envs = os.environ.copy()
+        envs.update(self._env_delta())
         self._envs = envs
 
     def _open_outfile(self) -> IO[bytes]:
@@ -228,6 +237,9 @@ class SubprocessAppRun(AppRun):
 
 
 class LocalAppRun(SubprocessAppRun):
+    # Popen inherits the CPU affinity that _pre_popen sets on the launcher process
+    concurrent_start = False
+
     def _build_cmdline(self) -> str:
         return self._cmdline
 
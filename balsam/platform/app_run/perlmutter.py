@@ -8,6 +8,9 @@ class PerlmutterRun(SubprocessAppRun):
     https://slurm.schedmd.com/srun.html
     """
 
+    # _pre_popen throttles back-to-back launches, so they must not start concurrently
+    concurrent_start = False
+
     def _build_cmdline(self) -> str:
         node_ids = [h for h in self._node_spec.hostnames]
         num_nodes = str(len(node_ids))
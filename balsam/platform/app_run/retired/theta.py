@@ -8,6 +8,9 @@ class ThetaAprun(SubprocessAppRun):
     https://www.alcf.anl.gov/support-center/theta/running-jobs-and-submission-scripts
     """
 
+    # _pre_popen throttles back-to-back launches, so they must not start concurrently
+    concurrent_start = False
+
     def _pre_popen(self) -> None:
         time.sleep(0.01)
 
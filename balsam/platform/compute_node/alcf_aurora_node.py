@@ -1,6 +1,6 @@
 import logging
 import os
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 from .compute_node import ComputeNode
 
@@ -16,6 +16,13 @@ class AuroraNode(ComputeNode):
     for gid in range(6):
         for tid in range(2):
             gpu_ids.append(str(gid) + "." + str(tid))
+    # Two sockets of 52 cores, each with three GPUs (six tiles)
+    numa_domains: List[Tuple[List[IntStr], List[IntStr]]] = [
+        (list(range(0, 52)), gpu_ids[:6]),
+        (list(range(52, 104)), gpu_ids[6:]),
+    ]
+    # HPE Cray hostnames (e.g. x3006c0s13b0n0) start with the cabinet
+    locality_pattern = r"(x\d+)c\d+s\d+"
 
     @classmethod
     def get_job_nodelist(cls) -> List["AuroraNode"]:
@@ -15,6 +15,10 @@ class PolarisNode(ComputeNode):
 
     # cms21: optimal gpu/cpu binding on Polaris nodes goes in reverse order
     gpu_ids.reverse()
+    # Four NUMA domains of 8 cores; GPU 3 is closest to cores 0-7
+    numa_domains = [(list(range(8 * d, 8 * d + 8)), [3 - d]) for d in range(4)]
+    # HPE Cray hostnames (e.g. x3006c0s13b0n0) start with the cabinet
+    locality_pattern = r"(x\d+)c\d+s\d+"
 
     @classmethod
     def get_job_nodelist(cls) -> List["PolarisNode"]:
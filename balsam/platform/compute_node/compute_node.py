@@ -1,36 +1,136 @@
-from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 
 IntStr = Union[int, str]
 
 U = TypeVar("U")
 
 
+def _bits(mask: int) -> Iterator[int]:
+    """Yield the positions of the set bits in `mask`, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _take(mask: int, count: int) -> int:
+    """The lowest `count` set bits of `mask`"""
+    taken = 0
+    for _ in range(count):
+        low = mask & -mask
+        taken |= low
+        mask ^= low
+    return taken
+
+
+class SlotSet:
+    """
+    Tracks which of a fixed, ordered list of CPU or GPU IDs are idle, as an
+    integer bitmask over their positions in the list.
+    """
+
+    __slots__ = ("ids", "positions", "idle_mask", "num_idle")
+
+    def __init__(self, ids: Sequence[IntStr]) -> None:
+        self.ids: List[IntStr] = list(ids)
+        self.positions: Dict[IntStr, int] = {id: pos for pos, id in enumerate(self.ids)}
+        self.idle_mask = (1 << len(self.ids)) - 1
+        self.num_idle = len(self.ids)
+
+    def mask_of(self, ids: Sequence[IntStr]) -> int:
+        """Bitmask of the given IDs; IDs not on this node are ignored"""
+        mask = 0
+        for id in ids:
+            pos = self.positions.get(id)
+            if pos is not None:
+                mask |= 1 << pos
+        return mask
+
+    def ids_of(self, mask: int) -> List[IntStr]:
+        return [self.ids[pos] for pos in _bits(mask)]
+
+    def take(self, mask: int) -> None:
+        self.idle_mask &= ~mask
+        self.num_idle -= bin(mask).count("1")
+
+    def give(self, mask: int) -> None:
+        self.idle_mask |= mask
+        self.num_idle += bin(mask).count("1")
+
+
 class ComputeNode:
     cpu_ids: List[IntStr] = []
     gpu_ids: List[IntStr] = []
+    # Optional topology: the (cpu_ids, gpu_ids) of each NUMA domain or socket.
+    # Jobs are placed within a single domain whenever one has room for them.
+    numa_domains: List[Tuple[List[IntStr], List[IntStr]]] = []
+    # Optional network locality: a regex whose first group extracts the
+    # node's rack/switch group from its hostname
+    locality_pattern: Optional[str] = None
 
     def __init__(self, node_id: IntStr, hostname: str, gpu_ids: Optional[List[IntStr]] = None) -> None:
         self.node_id = node_id
         self.hostname = hostname
+        self.group = self.get_locality(hostname)
         self.occupancy = 0.0
         self.jobs: Dict[int, Dict[str, Any]] = {}
-        self.idle_cpus: List[IntStr] = [i for i in self.cpu_ids]
-        self.busy_cpus: List[IntStr] = []
         if gpu_ids is None:
             gpu_ids = self.gpu_ids
-        self.idle_gpus: List[IntStr] = [i for i in gpu_ids]
-        self.busy_gpus: List[IntStr] = []
+        self._cpus = SlotSet(self.cpu_ids)
+        self._gpus = SlotSet(gpu_ids)
+        self._domains = [(self._cpus.mask_of(cpus), self._gpus.mask_of(gpus)) for cpus, gpus in self.numa_domains]
+        self._job_masks: Dict[int, Tuple[int, int]] = {}
+
+    @property
+    def num_idle_cpus(self) -> int:
+        return self._cpus.num_idle
+
+    @property
+    def num_idle_gpus(self) -> int:
+        return self._gpus.num_idle
+
+    @property
+    def idle_cpus(self) -> List[IntStr]:
+        return self._cpus.ids_of(self._cpus.idle_mask)
+
+    @property
+    def busy_cpus(self) -> List[IntStr]:
+        return self._cpus.ids_of(~self._cpus.idle_mask & ((1 << len(self._cpus.ids)) - 1))
+
+    @property
+    def idle_gpus(self) -> List[IntStr]:
+        return self._gpus.ids_of(self._gpus.idle_mask)
+
+    @property
+    def busy_gpus(self) -> List[IntStr]:
+        return self._gpus.ids_of(~self._gpus.idle_mask & ((1 << len(self._gpus.ids)) - 1))
 
     def check_fit(self, num_cpus: int, num_gpus: int, occupancy: float) -> bool:
         if self.occupancy + occupancy > 1.001:
             return False
-        elif num_cpus > len(self.idle_cpus):
+        elif num_cpus > self._cpus.num_idle:
             return False
-        elif num_gpus > len(self.idle_gpus):
+        elif num_gpus > self._gpus.num_idle:
             return False
         else:
             return True
 
+    def _select(self, num_cpus: int, num_gpus: int) -> Tuple[int, int]:
+        """
+        Pick the idle CPU and GPU slots for a job: from the first NUMA domain
+        with room for the whole job, otherwise the lowest idle slots on the node.
+        A domain declaring no GPUs on this node (e.g. MIG instances) only
+        constrains the CPUs.
+        """
+        idle_cpus, idle_gpus = self._cpus.idle_mask, self._gpus.idle_mask
+        for domain_cpus, domain_gpus in self._domains:
+            cpus = idle_cpus & domain_cpus
+            gpus = idle_gpus & domain_gpus if domain_gpus else idle_gpus
+            if bin(cpus).count("1") >= num_cpus and bin(gpus).count("1") >= num_gpus:
+                return _take(cpus, num_cpus), _take(gpus, num_gpus)
+        return _take(idle_cpus, num_cpus), _take(idle_gpus, num_gpus)
+
     def assign(self, job_id: int, num_cpus: int = 0, num_gpus: int = 0, occupancy: float = 1.0) -> Dict[str, Any]:
         if job_id in self.jobs:
             raise ValueError(f"Already have job {job_id}")
@@ -39,17 +139,13 @@ class ComputeNode:
         if self.occupancy > 0.999:
             self.occupancy = 1.0
 
-        assigned_cpus = self.idle_cpus[:num_cpus]
-        assigned_gpus = self.idle_gpus[:num_gpus]
-        if assigned_cpus:
-            self.busy_cpus.extend(assigned_cpus)
-            self.idle_cpus = [i for i in self.idle_cpus if i not in assigned_cpus]
-        if assigned_gpus:
-            self.busy_gpus.extend(assigned_gpus)
-            self.idle_gpus = [i for i in self.idle_gpus if i not in assigned_gpus]
+        cpu_mask, gpu_mask = self._select(num_cpus, num_gpus)
+        self._cpus.take(cpu_mask)
+        self._gpus.take(gpu_mask)
+        self._job_masks[job_id] = (cpu_mask, gpu_mask)
         resource_spec = {
-            "cpu_ids": assigned_cpus,
-            "gpu_ids": assigned_gpus,
+            "cpu_ids": self._cpus.ids_of(cpu_mask),
+            "gpu_ids": self._gpus.ids_of(gpu_mask),
             "occupancy": occupancy,
         }
         self.jobs[job_id] = resource_spec
@@ -60,14 +156,21 @@ class ComputeNode:
         self.occupancy -= resource_spec["occupancy"]
         if self.occupancy < 0.001:
             self.occupancy = 0.0
-        cpu_ids = resource_spec["cpu_ids"]
-        gpu_ids = resource_spec["gpu_ids"]
-        if cpu_ids:
-            self.idle_cpus.extend(cpu_ids)
-            self.busy_cpus = [i for i in self.busy_cpus if i not in cpu_ids]
-        if gpu_ids:
-            self.idle_gpus.extend(gpu_ids)
-            self.busy_gpus = [i for i in self.busy_gpus if i not in gpu_ids]
+        cpu_mask, gpu_mask = self._job_masks.pop(job_id)
+        self._cpus.give(cpu_mask)
+        self._gpus.give(gpu_mask)
+
+    @classmethod
+    def get_locality(cls, hostname: str) -> Optional[str]:
+        """
+        The network group (e.g. rack or dragonfly group) of a node; multi-node
+        Jobs are placed on as few groups as possible.  Override to read a
+        topology file instead of parsing the hostname.
+        """
+        if cls.locality_pattern is None:
+            return None
+        match = re.match(cls.locality_pattern, hostname)
+        return match.group(1) if match else None
 
     @classmethod
     def get_job_nodelist(cls: Type[U]) -> "List[U]":
@@ -81,10 +184,10 @@ class ComputeNode:
         return None
 
     def __repr__(self) -> str:
-        busy_cpus = len(self.busy_cpus)
-        total_cpus = len(self.cpu_ids)
-        busy_gpus = len(self.busy_gpus)
-        total_gpus = len(self.gpu_ids)
+        total_cpus = len(self._cpus.ids)
+        busy_cpus = total_cpus - self._cpus.num_idle
+        total_gpus = len(self._gpus.ids)
+        busy_gpus = total_gpus - self._gpus.num_idle
         cpu_str = f"{busy_cpus}/{total_cpus} CPUs busy"
         gpu_str = f", {busy_gpus}/{total_gpus} GPUs busy" if total_gpus else ""
         d = dict(
@@ -1,4 +1,5 @@
-from .apps import AppCreate, AppOut, AppParameter, AppUpdate, PaginatedAppsOut, TransferSlot
+from .apps import AppCreate, AppOut, AppParameter, AppUpdate, AppVersionOut, PaginatedAppsOut, TransferSlot
+from .batch import MAX_BATCH_OPERATIONS, BatchOperation, BatchOperationResult, BatchRequest, BatchResponse
 from .batchjob import (
     BatchJobBulkUpdate,
     BatchJobCreate,
@@ -13,14 +14,20 @@ from .batchjob import (
     SchedulerJobLog,
     SchedulerJobStatus,
 )
+from .blob import MAX_BLOBS_PER_FETCH, MISSING_BLOBS, BlobCreate, BlobOut, BlobRef, blob_refs, serialize_parameters
 from .job import (
     DONE_STATES,
+    MAX_CHANGES_PER_PAGE,
+    MAX_CHANGES_WAIT_SEC,
     RUNNABLE_STATES,
     JobBulkUpdate,
+    JobChange,
+    JobChangesOut,
     JobCreate,
     JobOrdering,
     JobOut,
     JobState,
+    JobStateTransition,
     JobTransferItem,
     JobUpdate,
     PaginatedJobsOut,
@@ -28,16 +35,31 @@ from .job import (
 )
 from .logevent import EventOrdering, LogEventOut, PaginatedLogEventOut
 from .serializer import (
+    DEFAULT_SERIALIZER,
+    SERIALIZERS,
     DeserializeError,
     EmptyPayload,
+    PayloadCache,
     SerializeError,
+    Serializer,
+    cache_stats,
+    code_serializer,
     deserialize,
     get_source,
+    parse_spec,
     raise_from_serialized,
+    register_serializer,
     serialize,
     serialize_exception,
 )
-from .session import MAX_JOBS_PER_SESSION_ACQUIRE, PaginatedSessionsOut, SessionAcquire, SessionCreate, SessionOut
+from .session import (
+    MAX_JOBS_PER_SESSION_ACQUIRE,
+    PaginatedSessionsOut,
+    SessionAcquire,
+    SessionCreate,
+    SessionOut,
+    SessionRelease,
+)
 from .site import AllowedQueue, PaginatedSitesOut, SiteCreate, SiteOut, SiteUpdate
 from .transfer import (
     PaginatedTransferItemOut,
@@ -51,6 +73,8 @@ from .user import UserCreate, UserOut
 
 MAX_PAGE_SIZE = 100_000
 MAX_ITEMS_PER_BULK_OP = 5000
+# Error `code` reported when a bulk operation selects more than MAX_ITEMS_PER_BULK_OP items
+BULK_OP_LIMIT_EXCEEDED = "bulk_op_limit_exceeded"
 
 __all__ = [
     "UserCreate",
@@ -63,9 +87,22 @@ __all__ = [
     "AppCreate",
     "AppUpdate",
     "AppOut",
+    "AppVersionOut",
     "PaginatedAppsOut",
     "AppParameter",
     "TransferSlot",
+    "BatchOperation",
+    "BatchOperationResult",
+    "BatchRequest",
+    "BatchResponse",
+    "MAX_BATCH_OPERATIONS",
+    "BlobCreate",
+    "BlobOut",
+    "BlobRef",
+    "MISSING_BLOBS",
+    "blob_refs",
+    "serialize_parameters",
+    "MAX_BLOBS_PER_FETCH",
     "BatchJobCreate",
     "BatchJobUpdate",
     "BatchJobBulkUpdate",
@@ -79,14 +116,20 @@ __all__ = [
     "SessionOut",
     "PaginatedSessionsOut",
     "SessionAcquire",
+    "SessionRelease",
     "MAX_JOBS_PER_SESSION_ACQUIRE",
     "JobCreate",
     "ServerJobCreate",
     "JobUpdate",
     "JobBulkUpdate",
+    "JobChange",
+    "JobChangesOut",
+    "MAX_CHANGES_PER_PAGE",
+    "MAX_CHANGES_WAIT_SEC",
     "PaginatedJobsOut",
     "JobOut",
     "JobState",
+    "JobStateTransition",
     "JobOrdering",
     "JobTransferItem",
     "RUNNABLE_STATES",
@@ -105,6 +148,14 @@ __all__ = [
     "SchedulerJobStatus",
     "serialize",
     "deserialize",
+    "Serializer",
+    "SERIALIZERS",
+    "DEFAULT_SERIALIZER",
+    "register_serializer",
+    "PayloadCache",
+    "cache_stats",
+    "parse_spec",
+    "code_serializer",
     "serialize_exception",
     "raise_from_serialized",
     "get_source",
@@ -112,4 +163,5 @@ __all__ = [
     "DeserializeError",
     "EmptyPayload",
     "MAX_ITEMS_PER_BULK_OP",
+    "BULK_OP_LIMIT_EXCEEDED",
 ]
@@ -104,6 +104,16 @@ class AppOut(AppBase):
     id: int = Field(..., example=234)
 
 
+class AppVersionOut(BaseModel):
+    id: int = Field(..., example=234)
+    site_id: int = Field(..., example=3, description="Site id at which this App is registered")
+    name: str = Field(..., example="NWChemGeomOpt", description="Python AppDef class name")
+    class_hash: str = Field(..., description="MD5 hex digest of `serialized_class`, to detect changed Apps")
+
+    class Config:
+        orm_mode = True
+
+
 class PaginatedAppsOut(BaseModel):
     count: int
     results: List[AppOut]
@@ -0,0 +1,42 @@
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, Field, validator
+
+MAX_BATCH_OPERATIONS = 64
+
+
+class BatchOperation(BaseModel):
+    method: str = Field(..., description="HTTP method of the sub-operation", example="PATCH")
+    path: str = Field(..., description="API path of the sub-operation, relative to the API root", example="jobs/")
+    body: Any = Field(None, description="JSON body of the sub-operation")
+
+    @validator("method")
+    def validate_method(cls, v: str) -> str:
+        return v.upper()
+
+    @validator("path")
+    def validate_path(cls, v: str) -> str:
+        return v.strip("/")
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., description="Sub-operations, executed in order")
+    atomic: bool = Field(
+        False, description="Execute all sub-operations in one transaction; any failure rolls back the batch"
+    )
+
+    @validator("operations")
+    def validate_num_operations(cls, v: List[BatchOperation]) -> List[BatchOperation]:
+        if 1 <= len(v) <= MAX_BATCH_OPERATIONS:
+            return v
+        raise ValueError(f"A batch must contain between 1 and {MAX_BATCH_OPERATIONS} operations")
+
+
+class BatchOperationResult(BaseModel):
+    status_code: int = Field(..., description="HTTP status code the sub-operation would have returned")
+    data: Any = Field(None, description="Response data of a successful sub-operation")
+    detail: Optional[Any] = Field(None, description="Error detail of a failed sub-operation")
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
@@ -0,0 +1,75 @@
+import hashlib
+from typing import Any, Dict, NamedTuple, Tuple
+
+from pydantic import BaseModel, Field, validator
+
+from .serializer import DEFAULT_SERIALIZER, serialize
+
+# Parameter values that serialize to at least MIN_BLOB_SIZE characters are stored
+# once in the content-addressed blob store and referenced from each Job by digest
+MIN_BLOB_SIZE = 16_384
+MAX_BLOB_SIZE = 64_000_000
+MAX_BLOBS_PER_FETCH = 50
+# Error `code` reported when Jobs reference blobs that are not (or no longer) stored
+MISSING_BLOBS = "missing_blobs"
+
+
+def blob_digest(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class BlobRef(NamedTuple):
+    """Placeholder for a large parameter value inside `serialized_parameters`"""
+
+    digest: str
+
+
+def serialize_parameters(params: Dict[str, Any], serializer: str = DEFAULT_SERIALIZER) -> Tuple[str, Dict[str, str]]:
+    """
+    Serialize a Job parameters dict, moving each large value out to a blob.
+    Returns the serialized dict (with BlobRef placeholders) and the blobs by digest.
+    A dict that serializes under MIN_BLOB_SIZE (the common case) costs a single
+    serialization.  A larger dict is then split value by value: each value is
+    serialized once, and only the small values again as part of the final dict.
+    """
+    serialized = serialize(params, serializer)
+    if not isinstance(params, dict) or len(serialized) < MIN_BLOB_SIZE:
+        return serialized, {}
+
+    blobs: Dict[str, str] = {}
+    refs: Dict[str, BlobRef] = {}
+    for key, value in params.items():
+        blob = serialize(value, serializer)
+        if len(blob) >= MIN_BLOB_SIZE:
+            digest = blob_digest(blob)
+            blobs[digest] = blob
+            refs[key] = BlobRef(digest)
+    if not refs:
+        return serialized, {}
+    return serialize({**params, **refs}, serializer), blobs
+
+
+def blob_refs(params: Dict[str, Any]) -> Dict[str, str]:
+    """Map each parameter stored as a blob to its digest"""
+    return {key: value.digest for key, value in params.items() if isinstance(value, BlobRef)}
+
+
+class BlobCreate(BaseModel):
+    digest: str = Field(..., description="SHA-256 hex digest of `data`")
+    data: str = Field(..., description="Serialized payload")
+
+    @validator("data")
+    def check_digest(cls, v: str, values: Dict[str, Any]) -> str:
+        if len(v) > MAX_BLOB_SIZE:
+            raise ValueError(f"Blob cannot be larger than {MAX_BLOB_SIZE}")
+        if "digest" in values and blob_digest(v) != values["digest"]:
+            raise ValueError("Blob digest does not match the SHA-256 of its data")
+        return v
+
+
+class BlobOut(BaseModel):
+    digest: str = Field(..., description="SHA-256 hex digest of `data`")
+    data: str = Field(..., description="Serialized payload")
+
+    class Config:
+        orm_mode = True
@@ -5,12 +5,15 @@ from typing import Any, Dict, List, Optional, Set, Union
 
 from pydantic import BaseModel, Field, root_validator, validator
 
-from .serializer import serialize
+from .blob import serialize_parameters
+from .serializer import DEFAULT_SERIALIZER
 
 # Set limits to keep queries performant *and* respect the constraints
 # of maximum `argv` size that can be passed into a subprocess
 # (We can get away with ~1.5MB payload delivered via 128K chunksize args)
 MAX_SERIALIZED_PARAMS_SIZE = 512_000
+MAX_CHANGES_WAIT_SEC = 60.0
+MAX_CHANGES_PER_PAGE = 10_000
 
 
 class JobTransferItem(BaseModel):
@@ -66,6 +69,12 @@ class JobBase(BaseModel):
     serialized_parameters: str = Field(
         "", description="Encoded parameters dict", no_constructor=True, no_descriptor=True
     )
+    blob_digests: List[str] = Field(
+        [],
+        description="Digests of the parameter blobs referenced by serialized_parameters",
+        no_constructor=True,
+        no_descriptor=True,
+    )
     data: Dict[str, Any] = Field({}, example={"energy": -0.5}, description="Arbitrary JSON-able data dictionary.")
     return_code: Optional[int] = Field(None, example=0, description="Return code from last execution of this Job.")
 
@@ -123,6 +132,21 @@ class JobCreate(JobBase):
         no_descriptor=True,
         no_export=True,
     )
+    # Large parameter values, stored separately and uploaded once per unique digest
+    parameter_blobs: Dict[str, str] = Field(
+        {},
+        description="Serialized parameter values referenced from serialized_parameters, by digest.",
+        no_constructor=True,
+        no_descriptor=True,
+        no_export=True,
+    )
+    serializer: str = Field(
+        DEFAULT_SERIALIZER,
+        description="Serializer for the parameters (set from the App definition).",
+        no_constructor=True,
+        no_descriptor=True,
+        no_export=True,
+    )
     parent_ids: Set[int] = Field(set(), example={2, 3}, description="Set of parent Job IDs (dependencies).")
     transfers: Dict[str, JobTransferItem] = Field(
         {},
@@ -138,7 +162,9 @@ class JobCreate(JobBase):
     @root_validator(pre=True)
     def serialize_parameters(cls, values: Dict[str, Any]) -> Dict[str, Any]:
         params = values.get("parameters", {})
-        values["serialized_parameters"] = serialize(params)
+        serializer = values.get("serializer", DEFAULT_SERIALIZER)
+        values["serialized_parameters"], values["parameter_blobs"] = serialize_parameters(params, serializer)
+        values["blob_digests"] = sorted(values["parameter_blobs"])
         return values
 
     @validator("transfers", pre=True)
@@ -192,6 +218,9 @@ class JobUpdate(JobBase):
     state_data: Dict[str, Any] = Field({}, description="Arbitrary associated state change data for logging")
     pending_file_cleanup: bool = Field(None, description="Whether job remains to have workdir cleaned.")
     serialized_parameters: str = Field(None, description="Encoded parameters dict", no_descriptor=True)
+    blob_digests: List[str] = Field(
+        None, description="Digests of the parameter blobs referenced by serialized_parameters", no_descriptor=True
+    )
     serialized_return_value: str = Field(None, description="Encoded return value", no_descriptor=True)
     serialized_exception: str = Field(None, description="Encoded wrapped Exception", no_descriptor=True)
 
@@ -208,8 +237,18 @@ class JobUpdate(JobBase):
         return v
 
 
+class JobStateTransition(BaseModel):
+    state: JobState = Field(..., example="RUNNING", description="Job state")
+    state_timestamp: datetime = Field(None, description="Time (UTC) at which Job state change occured")
+    state_data: Dict[str, Any] = Field({}, description="Arbitrary associated state change data for logging")
+
+
 class JobBulkUpdate(JobUpdate):
     id: int = Field(..., example=123, description="Job id")
+    state_history: List[JobStateTransition] = Field(
+        None,
+        description="Earlier state transitions (oldest first), each logged as an event before the transition to `state`",
+    )
 
 
 class JobOut(JobBase):
@@ -231,3 +270,21 @@ class JobOut(JobBase):
 class PaginatedJobsOut(BaseModel):
     count: int
     results: List[JobOut]
+
+
+class JobChange(BaseModel):
+    id: int = Field(..., example=22)
+    state: JobState = Field(..., example="JOB_FINISHED")
+    last_update: datetime = Field(...)
+
+    class Config:
+        extra = "allow"
+
+
+class JobChangesOut(BaseModel):
+    seq: int = Field(..., description="Pass as `after_seq` to receive the next changes")
+    after_id: Optional[int] = Field(
+        None, description="Pass as `after_id` (with `seq`) to resume within a transaction's changes"
+    )
+    has_more: bool = Field(..., description="Whether more changes are immediately available")
+    results: List[JobChange]
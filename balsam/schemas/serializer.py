@@ -1,7 +1,10 @@
 import base64
 import logging
-from functools import lru_cache
-from typing import Any, Optional
+import pickle
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
 
 import dill  # type: ignore
 import dill.source  # type: ignore
@@ -9,6 +12,21 @@ from tblib import Traceback  # type: ignore
 
 logger = logging.getLogger(__name__)
 
+# Payloads are base64 text, optionally prefixed by a header naming the
+# serializer and compression: "@pickle5+zstd:<base64>".  Payloads without a
+# header are plain dill (the only format written by older Balsam versions).
+# "@" is not in the base64 alphabet, so the two can never be confused.
+HEADER_PREFIX = "@"
+HEADER_END = ":"
+DEFAULT_SERIALIZER = "dill"
+ZSTD_LEVEL = 3
+
+# Total bytes held by the serialize and deserialize caches (see PayloadCache)
+SERIALIZE_CACHE_BYTES = 64_000_000
+DESERIALIZE_CACHE_BYTES = 256_000_000
+# Characters sampled from each end of a payload, and evenly across it, by payload_digest
+DIGEST_SAMPLE_SIZE = 256
+
 
 class EmptyPayload(ValueError):
     pass
@@ -22,37 +40,268 @@ class DeserializeError(ValueError):
     pass
 
 
+class Serializer:
+    """
+    A named pickling backend.  `by_value` backends can serialize functions and
+    classes defined in __main__ or a notebook, which is required for App classes.
+    """
+
+    name: str
+    by_value: bool = False
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class DillSerializer(Serializer):
+    name = "dill"
+    by_value = True
+
+    def dumps(self, obj: Any) -> bytes:
+        dump: bytes = dill.dumps(obj, recurse=True)
+        return dump
+
+    def loads(self, data: bytes) -> Any:
+        return dill.loads(data)
+
+
+class CloudpickleSerializer(Serializer):
+    name = "cloudpickle"
+    by_value = True
+
+    def dumps(self, obj: Any) -> bytes:
+        import cloudpickle  # type: ignore
+
+        dump: bytes = cloudpickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        return dump
+
+    def loads(self, data: bytes) -> Any:
+        # cloudpickle output is loaded by the standard pickle module
+        return pickle.loads(data)
+
+
+class Pickle5Serializer(Serializer):
+    """
+    Pickle protocol 5, with large buffers (e.g. NumPy arrays) kept out-of-band
+    instead of being copied into the pickle stream.  Data is framed as:
+    number of frames, the length of each frame, then the pickle stream and buffers.
+    """
+
+    name = "pickle5"
+
+    def dumps(self, obj: Any) -> bytes:
+        if pickle.HIGHEST_PROTOCOL < 5:
+            raise SerializeError("The pickle5 serializer requires Python 3.8 or newer")
+        buffers: List[pickle.PickleBuffer] = []
+        stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        frames = [memoryview(stream), *(buf.raw() for buf in buffers)]
+        header = struct.pack(f"<I{len(frames)}Q", len(frames), *(frame.nbytes for frame in frames))
+        return b"".join([header, *frames])
+
+    def loads(self, data: bytes) -> Any:
+        # Copy once into a writable buffer, so that arrays loaded from it are writable too
+        view = memoryview(bytearray(data))
+        (num_frames,) = struct.unpack_from("<I", view)
+        lengths = struct.unpack_from(f"<{num_frames}Q", view, 4)
+        offset = 4 + 8 * num_frames
+        frames = []
+        for length in lengths:
+            frames.append(view[offset : offset + length])
+            offset += length
+        return pickle.loads(frames[0], buffers=frames[1:])
+
+
+SERIALIZERS: Dict[str, Serializer] = {}
+
+
+def register_serializer(serializer: Serializer) -> None:
+    """Make a Serializer available by name to `serialize()` and App definitions"""
+    SERIALIZERS[serializer.name] = serializer
+
+
+for _serializer in (DillSerializer(), CloudpickleSerializer(), Pickle5Serializer()):
+    register_serializer(_serializer)
+
+
+def parse_spec(spec: str) -> Tuple[Serializer, bool]:
+    """Parse a serializer spec like `pickle5` or `pickle5+zstd` into (Serializer, compressed)"""
+    name, _, codec = spec.partition("+")
+    if name not in SERIALIZERS:
+        raise SerializeError(f"Unknown serializer {name!r}; choose from: {', '.join(SERIALIZERS)}")
+    if codec not in ("", "zstd"):
+        raise SerializeError(f"Unknown compression {codec!r}; only zstd is supported")
+    return SERIALIZERS[name], codec == "zstd"
+
+
+def code_serializer(spec: str) -> str:
+    """The spec to use for classes and exceptions: falls back to dill if `spec` can't serialize code"""
+    serializer, compressed = parse_spec(spec)
+    if serializer.by_value:
+        return spec
+    return DEFAULT_SERIALIZER + ("+zstd" if compressed else "")
+
+
+def _zstd() -> Any:
+    try:
+        import zstandard  # type: ignore
+    except ImportError as exc:
+        raise SerializeError("zstd compression requires the zstandard package (pip install zstandard)") from exc
+    return zstandard
+
+
 def get_source(obj: Any) -> str:
     source: str = dill.source.getsource(obj, lstrip=True)
     return source
 
 
-def _serialize(obj: Any) -> str:
-    dump: bytes = dill.dumps(obj, recurse=True)
-    return base64.b64encode(dump).decode("utf-8")
+def _serialize(obj: Any, spec: str = DEFAULT_SERIALIZER) -> str:
+    serializer, compressed = parse_spec(spec)
+    dump = serializer.dumps(obj)
+    if compressed:
+        dump = _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(dump)
+    encoded = base64.b64encode(dump).decode("utf-8")
+    if spec == DEFAULT_SERIALIZER:
+        return encoded
+    return f"{HEADER_PREFIX}{spec}{HEADER_END}{encoded}"
 
 
-_cached_serialize = lru_cache(256)(_serialize)
+def payload_digest(payload: str) -> Tuple[int, int]:
+    """
+    Cheap fingerprint of a payload: its length and the hash of a fixed-size
+    sample of its characters, so that large payloads are never hashed in full.
+    """
+    size = len(payload)
+    if size <= 3 * DIGEST_SAMPLE_SIZE:
+        return size, hash(payload)
+    stride = payload[:: size // DIGEST_SAMPLE_SIZE]
+    return size, hash(payload[:DIGEST_SAMPLE_SIZE] + stride + payload[-DIGEST_SAMPLE_SIZE:])
 
 
-def serialize(obj: Any) -> str:
-    try:
+class PayloadCache:
+    """
+    LRU cache bounded by the total (estimated) bytes of its entries, with hit
+    and miss statistics.  Each entry stores a `check` value that must be equal
+    to the one passed to `get()` for a hit; this confirms digest-keyed lookups.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, check: Any = None) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != check:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key: Hashable, value: Any, nbytes: int, check: Any = None) -> None:
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (check, value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+serialize_cache = PayloadCache(SERIALIZE_CACHE_BYTES)
+deserialize_cache = PayloadCache(DESERIALIZE_CACHE_BYTES)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {"serialize": serialize_cache.stats(), "deserialize": deserialize_cache.stats()}
+
+
+def serialize(obj: Any, serializer: str = DEFAULT_SERIALIZER, cache: bool = True) -> str:
+    """
+    Serialize `obj` to a text payload with the named serializer (e.g. `dill`,
+    `cloudpickle`, `pickle5`), optionally zstd-compressed (e.g. `pickle5+zstd`).
+    Results for hashable objects (like App classes) are cached unless `cache=False`.
+    """
+    key: Optional[Hashable] = None
+    if cache:
+        key = (type(obj), obj, serializer)
         try:
-            return _cached_serialize(obj)
+            found, cached = serialize_cache.get(key)
         except TypeError:
-            return _serialize(obj)
+            key = None
+        else:
+            if found:
+                payload: str = cached
+                return payload
+    try:
+        payload = _serialize(obj, serializer)
     except Exception as exc:
         logger.exception(f"Failed to serialize {obj}")
         raise SerializeError(str(exc)) from exc
+    if key is not None:
+        serialize_cache.put(key, payload, len(payload))
+    return payload
+
+
+def deserialize(payload: str, cache: bool = True) -> Any:
+    """
+    Deserialize a payload from `serialize()`.  Results are cached by payload
+    digest unless `cache=False`, which suits payloads that are read only once
+    (like Job return values).  The cached object is shared: do not modify it.
+    """
+    if not cache:
+        return _deserialize(payload)
+    key = payload_digest(payload)
+    found, obj = deserialize_cache.get(key, check=payload)
+    if found:
+        return obj
+    obj = _deserialize(payload)
+    # Counts the payload kept to confirm hits, and roughly as much again for the object
+    deserialize_cache.put(key, obj, 2 * len(payload), check=payload)
+    return obj
 
 
-@lru_cache(256)
-def deserialize(payload: str) -> Any:
+def _deserialize(payload: str) -> Any:
     if not payload:
         raise EmptyPayload
     try:
+        spec = DEFAULT_SERIALIZER
+        if payload.startswith(HEADER_PREFIX):
+            spec, _, payload = payload[len(HEADER_PREFIX) :].partition(HEADER_END)
+        serializer, compressed = parse_spec(spec)
         decoded = base64.b64decode(payload)
-        return dill.loads(decoded)
+        if compressed:
+            decoded = _zstd().ZstdDecompressor().decompress(decoded)
+        return serializer.loads(decoded)
     except Exception as exc:
         logger.exception("Failed to deserialize")
         raise DeserializeError(str(exc)) from exc
@@ -60,12 +309,12 @@ def deserialize(payload: str) -> Any:
 
 # See RemoteExceptionWrapper in parsl.apps.errors
 # https://github.com/Parsl/parsl/blob/master/parsl/app/errors.py
-def serialize_exception(exc: Exception) -> str:
+def serialize_exception(exc: Exception, serializer: str = DEFAULT_SERIALIZER) -> str:
     if exc.__traceback__ is not None:
         tb = Traceback(exc.__traceback__)
     else:
         tb = None
-    return serialize((exc, tb))
+    return serialize((exc, tb), code_serializer(serializer), cache=False)
 
 
 def raise_from_serialized(payload: str) -> None:
@@ -73,7 +322,7 @@ def raise_from_serialized(payload: str) -> None:
     tb: Optional[Traceback]
 
     try:
-        exc, tb = deserialize(payload)
+        exc, tb = deserialize(payload, cache=False)
     except DeserializeError as deser_exc:
         logger.error(f"An exception was transmitted, but it could not be unpacked here due to: {deser_exc}")
         logger.error("You may find the original error in the job.out file of the Job's working directory")
@@ -41,6 +41,10 @@ class SessionAcquire(BaseModel):
         raise ValueError(f"max_num_jobs must be between 1 and {MAX_JOBS_PER_SESSION_ACQUIRE}")
 
 
+class SessionRelease(BaseModel):
+    job_ids: List[int] = Field(..., description="Ids of acquired Jobs to hand back")
+
+
 class PaginatedSessionsOut(BaseModel):
     count: int
     results: List[SessionOut]
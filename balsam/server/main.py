@@ -9,7 +9,7 @@ from balsam.server.utils import TimingMiddleware, setup_logging
 
 from .auth import build_auth_router, user_from_token
 from .pubsub import pubsub
-from .routers import apps, batch_jobs, events, jobs, sessions, sites, transfers
+from .routers import apps, batch, batch_jobs, blobs, events, jobs, sessions, sites, transfers
 
 logger = logging.getLogger("balsam.server.main")
 
@@ -93,6 +93,24 @@ app.include_router(
 )
 
 
+app.include_router(
+    batch.router,
+    prefix="/batch",
+    tags=["batch"],
+    dependencies=[],
+    responses={404: {"description": "Not found"}},
+)
+
+
+app.include_router(
+    blobs.router,
+    prefix="/blobs",
+    tags=["blobs"],
+    dependencies=[],
+    responses={404: {"description": "Not found"}},
+)
+
+
 @app.websocket("/subscribe-user")
 async def subscribe_user(websocket: WebSocket) -> None:
     """
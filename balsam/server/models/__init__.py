@@ -1,5 +1,5 @@
 from .base import Base, create_tables, get_engine, get_session
-from .tables import App, BatchJob, Job, LogEvent, Session, Site, TransferItem, User
+from .tables import App, BatchJob, Blob, Job, LogEvent, Session, Site, TransferItem, User
 
 __all__ = [
     "Base",
@@ -8,6 +8,7 @@ __all__ = [
     "get_session",
     "App",
     "BatchJob",
+    "Blob",
     "Job",
     "LogEvent",
     "Session",
@@ -0,0 +1,31 @@
+"""content-addressed blobs
+
+Revision ID: 5d2e8c1f7a43
+Revises: c31d5a8e9b02
+Create Date: 2026-10-19 11:02:17.484310
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d2e8c1f7a43"
+down_revision = "c31d5a8e9b02"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "blobs",
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("digest", sa.String(length=64), nullable=False),
+        sa.Column("data", sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("owner_id", "digest"),
+    )
+
+
+def downgrade():
+    op.drop_table("blobs")
@@ -0,0 +1,41 @@
+"""job change notify
+
+Revision ID: b7e4a91c2d60
+Revises: 5d2e8c1f7a43
+Create Date: 2026-10-19 10:41:07.518230
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7e4a91c2d60"
+down_revision = "5d2e8c1f7a43"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Wake /jobs/changes long-polls: one notification per writing statement,
+    # delivered when its transaction commits
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION jobs_notify_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('job_changes', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER jobs_notify_change AFTER INSERT OR UPDATE ON jobs
+        FOR EACH STATEMENT EXECUTE PROCEDURE jobs_notify_change();
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER jobs_notify_change ON jobs")
+    op.execute("DROP FUNCTION jobs_notify_change()")
@@ -0,0 +1,46 @@
+"""job change sequence
+
+Revision ID: c31d5a8e9b02
+Revises: f0ef7fd915a1
+Create Date: 2026-10-19 09:12:44.201736
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c31d5a8e9b02"
+down_revision = "f0ef7fd915a1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("change_seq", sa.BigInteger(), nullable=True))
+    op.execute("UPDATE jobs SET change_seq = txid_current()")
+    op.create_index("ix_jobs_change_seq", "jobs", ["change_seq"])
+    # Stamp every inserted or updated Job with the id of the writing transaction
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION jobs_set_change_seq() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_seq := txid_current();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER jobs_change_seq BEFORE INSERT OR UPDATE ON jobs
+        FOR EACH ROW EXECUTE PROCEDURE jobs_set_change_seq();
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER jobs_change_seq ON jobs")
+    op.execute("DROP FUNCTION jobs_set_change_seq()")
+    op.drop_index("ix_jobs_change_seq")
+    op.drop_column("jobs", "change_seq")
@@ -0,0 +1,25 @@
+"""app last modified
+
+Revision ID: e2a6c9d4f813
+Revises: b7e4a91c2d60
+Create Date: 2026-10-19 12:03:26.774109
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e2a6c9d4f813"
+down_revision = "b7e4a91c2d60"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Cheap validator for conditional GETs of Apps (see routers/apps.py)
+    op.add_column("apps", sa.Column("last_modified", sa.DateTime(), server_default=sa.func.now(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("apps", "last_modified")
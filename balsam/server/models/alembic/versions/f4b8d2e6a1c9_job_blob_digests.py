@@ -0,0 +1,39 @@
+"""job blob digests
+
+Revision ID: f4b8d2e6a1c9
+Revises: e2a6c9d4f813
+Create Date: 2026-10-19 14:21:08.315742
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "f4b8d2e6a1c9"
+down_revision = "e2a6c9d4f813"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing Jobs get no references: the blobs stored so far are never reclaimed
+    op.add_column("blobs", sa.Column("reclaimable", sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.alter_column("blobs", "reclaimable", server_default=sa.true())
+    op.add_column(
+        "jobs",
+        sa.Column(
+            "blob_digests",
+            postgresql.ARRAY(sa.String(length=64), dimensions=1),
+            server_default="{}",
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_jobs_blob_digests", "jobs", ["blob_digests"], unique=False, postgresql_using="GIN")
+
+
+def downgrade():
+    op.drop_index("ix_jobs_blob_digests", table_name="jobs")
+    op.drop_column("jobs", "blob_digests")
+    op.drop_column("blobs", "reclaimable")
@@ -1,4 +1,4 @@
-from . import apps, batch_jobs, events, jobs, sessions, sites, transfers, users
+from . import apps, batch_jobs, blobs, events, jobs, sessions, sites, transfers, users
 
 __all__ = [
     "users",
@@ -9,4 +9,5 @@ __all__ = [
     "sessions",
     "batch_jobs",
     "transfers",
+    "blobs",
 ]
@@ -1,8 +1,10 @@
-from typing import Any, Dict, Optional, Tuple, cast
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm.exc import NoResultFound
 
 from balsam import schemas
 from balsam.server import ValidationError, models
@@ -29,6 +31,43 @@ def fetch(
         return count, paginator.paginate(qs.order_by(models.App.id))
 
 
+def fetch_validator(
+    db: Session, owner: schemas.UserOut, app_id: Optional[int] = None, filterset: Optional[AppQuery] = None
+) -> Tuple[Any, ...]:
+    """
+    Cheap state that changes whenever the Apps selected by `fetch` do: their
+    count, latest modification time and largest id.  Used to answer
+    conditional GETs without loading any rows.
+    """
+    qs = db.query(models.App).join(models.Site).filter(models.Site.owner_id == owner.id)  # type: ignore
+    if filterset is not None:
+        qs = filterset.apply_filters(qs)
+    if app_id is not None:
+        qs = qs.filter(models.App.id == app_id)
+    count, last_modified, max_id = qs.with_entities(
+        func.count(models.App.id), func.max(models.App.last_modified), func.max(models.App.id)
+    ).one()
+    if app_id is not None and not count:
+        raise NoResultFound(f"No App with id {app_id}")
+    return count, last_modified, max_id
+
+
+def fetch_versions(db: Session, owner: schemas.UserOut, filterset: AppQuery) -> List[schemas.AppVersionOut]:
+    """Each App's id and name with a hash of its serialized class (computed in the database)"""
+    qs = (
+        db.query(
+            models.App.id,
+            models.App.site_id,
+            models.App.name,
+            func.md5(models.App.serialized_class).label("class_hash"),
+        )
+        .join(models.Site)  # type: ignore
+        .filter(models.Site.owner_id == owner.id)
+    )
+    qs = filterset.apply_filters(qs)
+    return [schemas.AppVersionOut.from_orm(row) for row in qs.order_by(models.App.id)]
+
+
 def flush_or_400(db: Session) -> None:
     try:
         db.flush()
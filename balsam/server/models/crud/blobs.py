@@ -0,0 +1,80 @@
+from typing import Iterable, List, Set
+
+from sqlalchemy import delete, exists, orm, select
+from sqlalchemy.dialects.postgresql import array, insert
+
+from balsam import schemas
+from balsam.server import models
+
+Session = orm.Session
+
+
+def bulk_create(db: Session, owner: schemas.UserOut, blobs: List[schemas.BlobCreate]) -> List[str]:
+    """Store the blobs that do not already exist; returns the newly stored digests"""
+    unique = {blob.digest: blob.data for blob in blobs}
+    if not unique:
+        return []
+    stmt = (
+        insert(models.Blob.__table__)
+        .values([{"owner_id": owner.id, "digest": digest, "data": data} for digest, data in unique.items()])
+        .on_conflict_do_nothing()
+        .returning(models.Blob.digest)
+    )
+    return [row.digest for row in db.execute(stmt)]
+
+
+def fetch(db: Session, owner: schemas.UserOut, digests: List[str]) -> "List[models.Blob]":
+    qs = db.query(models.Blob).filter(models.Blob.owner_id == owner.id, models.Blob.digest.in_(digests))  # type: ignore
+    return qs.all()
+
+
+def lock_referenced(db: Session, owner: schemas.UserOut, digests: Iterable[str]) -> Set[str]:
+    """
+    Lock the blobs about to be referenced by Jobs (FOR KEY SHARE), so that `reclaim`
+    waits for the Jobs to commit.  Returns the digests that are missing.
+    """
+    digests = set(digests)
+    if not digests:
+        return set()
+    stmt = (
+        select(models.Blob.digest)
+        .where(models.Blob.owner_id == owner.id, models.Blob.digest.in_(digests))  # type: ignore
+        .order_by(models.Blob.digest)
+        .with_for_update(key_share=True)
+    )
+    return digests - set(db.execute(stmt).scalars())
+
+
+def reclaim(db: Session, owner: schemas.UserOut, digests: Iterable[str]) -> int:
+    """Delete the blobs among `digests` that no Job of the owner references any longer"""
+    digests = set(digests)
+    if not digests:
+        return 0
+    # Wait for concurrent writers holding these blobs (see lock_referenced) before the
+    # reference check, which then runs with a fresh snapshot that includes their Jobs
+    locked = (
+        db.execute(
+            select(models.Blob.digest)
+            .where(models.Blob.owner_id == owner.id, models.Blob.digest.in_(digests))  # type: ignore
+            .where(models.Blob.reclaimable)
+            .order_by(models.Blob.digest)
+            .with_for_update()
+        )
+        .scalars()
+        .all()
+    )
+    if not locked:
+        return 0
+    referenced = (
+        select(models.Job.id)
+        .join(models.App.__table__, models.Job.app_id == models.App.id)  # type: ignore
+        .join(models.Site.__table__, models.App.site_id == models.Site.id)
+        .where(models.Site.owner_id == owner.id)
+        .where(models.Job.blob_digests.contains(array([models.Blob.digest])))  # type: ignore
+    )
+    stmt = (
+        delete(models.Blob.__table__)
+        .where(models.Blob.owner_id == owner.id, models.Blob.digest.in_(locked))  # type: ignore
+        .where(~exists(referenced))
+    )
+    return int(db.execute(stmt).rowcount)
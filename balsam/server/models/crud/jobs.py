@@ -2,10 +2,10 @@ from collections import defaultdict
 from datetime import datetime
 from itertools import chain
 from logging import getLogger
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from fastapi import HTTPException, status
-from sqlalchemy import Column, bindparam, func, insert, orm, select, update
+from sqlalchemy import Column, bindparam, delete, func, insert, or_, orm, select, update
 from sqlalchemy.orm import Query, Session
 from sqlalchemy.sql import Select
 
@@ -15,14 +15,21 @@ from balsam.server import ValidationError, models
 from balsam.server.routers.filters import JobQuery
 from balsam.server.utils import Paginator
 
+from .blobs import lock_referenced, reclaim
+
 logger = getLogger(__name__)
 
 
+# Bookkeeping columns that are never part of a JobOut representation
+INTERNAL_JOB_COLUMNS = ("change_seq",)
+
+
+def job_out_columns() -> "List[Column[Any]]":
+    return [col for col in models.Job.__table__.c if col.name not in INTERNAL_JOB_COLUMNS]
+
+
 def owned_job_selector(owner: schemas.UserOut, columns: Optional[List[Column[Any]]] = None) -> Select:
-    if columns is None:
-        stmt = select(models.Job.__table__)  # type: ignore[arg-type]
-    else:
-        stmt = select(columns)
+    stmt = select(job_out_columns() if columns is None else columns)
     return (  # type: ignore
         stmt.join(models.App.__table__, models.Job.app_id == models.App.id)  # type: ignore
         .join(models.Site.__table__, models.App.site_id == models.Site.id)
@@ -67,14 +74,25 @@ def populate_transfers(app: models.App, transfers: Dict[str, JobTransferItem]) -
     return transfer_items
 
 
+def _job_columns(fields: List[str]) -> "List[Column[Any]]":
+    unknown = set(fields) - set(schemas.JobOut.__fields__)
+    if unknown:
+        raise ValidationError(f"Cannot select unknown Job fields: {sorted(unknown)}")
+    return [models.Job.__table__.c[name] for name in fields]
+
+
 def fetch(
     db: Session,
     owner: schemas.UserOut,
     paginator: Optional[Paginator[models.Job]] = None,
     job_id: Optional[int] = None,
     filterset: Optional[JobQuery] = None,
+    fields: Optional[List[str]] = None,
 ) -> "Tuple[int, List[Dict[str, Any]]]":
-    stmt = owned_job_selector(owner)
+    if fields:
+        stmt = owned_job_selector(owner, columns=_job_columns(fields))
+    else:
+        stmt = owned_job_selector(owner)
     if job_id is not None:
         stmt = stmt.where(models.Job.id == job_id)
     if filterset:
@@ -89,6 +107,81 @@ def fetch(
     return count, job_rows
 
 
+def change_horizon(db: Session) -> int:
+    """
+    The oldest transaction id that may still stamp a Job: changes with a lower
+    `change_seq` are committed (or rolled back) and will not be reordered.
+
+    This is the xmin of the current snapshot.  Any long-running transaction on
+    the Postgres server holds the horizon back, delaying (but never dropping)
+    the changes committed after it began.
+    """
+    return int(db.execute(select(func.txid_snapshot_xmin(func.txid_current_snapshot()))).scalar())
+
+
+def fetch_changes(
+    db: Session,
+    owner: schemas.UserOut,
+    after_seq: Optional[int],
+    after_id: Optional[int] = None,
+    filterset: Optional[JobQuery] = None,
+    fields: Optional[List[str]] = None,
+    limit: int = schemas.MAX_CHANGES_PER_PAGE,
+) -> Tuple[int, Optional[int], bool, List[Dict[str, Any]]]:
+    """
+    Return (seq, after_id, has_more, changes) for Jobs changed after the cursor,
+    in change order.  Each change has the Job id, state, last_update, and any extra
+    `fields`.  Without `after_seq`, returns no changes and the current sequence as
+    the starting cursor.  Changes are paged on (change_seq, id), so a transaction
+    that changed many Jobs can span pages: after a full page, `after_id` is the last
+    Job id on it, and the next page resumes after (seq, after_id).
+    """
+    horizon = change_horizon(db)
+    if after_seq is None:
+        return horizon - 1, None, False, []
+
+    names = ["id", "state", "last_update"]
+    names += [name for name in fields or [] if name not in names]
+    columns = _job_columns(names) + [models.Job.change_seq]
+    stmt = owned_job_selector(owner, columns=columns).where(models.Job.change_seq < horizon)  # type: ignore
+    if after_id is None:
+        stmt = stmt.where(models.Job.change_seq > after_seq)
+    else:
+        stmt = stmt.where(models.Job.change_seq >= after_seq).where(
+            or_(models.Job.change_seq > after_seq, models.Job.id > after_id)
+        )
+    if filterset:
+        stmt = filterset.apply_filters(stmt)
+    stmt = stmt.order_by(None).order_by(models.Job.change_seq, models.Job.id)
+    changes = [dict(row) for row in db.execute(stmt.limit(limit + 1)).mappings()]
+
+    has_more = len(changes) > limit
+    if has_more:
+        changes = changes[:limit]
+        seq: int = changes[-1]["change_seq"]
+        last_id: Optional[int] = changes[-1]["id"]
+    elif horizon - 1 >= after_seq:
+        seq, last_id = horizon - 1, None
+    else:
+        seq, last_id = after_seq, after_id
+    for change in changes:
+        del change["change_seq"]
+    return seq, last_id, has_more, changes
+
+
+def _check_blobs(db: Session, owner: schemas.UserOut, digests: Iterable[str]) -> None:
+    missing = lock_referenced(db, owner, digests)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": schemas.MISSING_BLOBS,
+                "digests": sorted(missing),
+                "message": "Jobs reference parameter blobs that are not stored. Upload them first.",
+            },
+        )
+
+
 def bulk_create(
     db: Session, owner: schemas.UserOut, job_specs: List[schemas.ServerJobCreate]
 ) -> List[Dict[str, Any]]:
@@ -129,6 +222,7 @@ def bulk_create(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Workdirs must be unique for each call to bulk-create Jobs.",
         )
+    _check_blobs(db, owner, (digest for job in job_specs for digest in job.blob_digests))
 
     JobDict = Dict[str, Any]
     TransferList = List[Dict[str, Any]]
@@ -198,14 +292,21 @@ def bulk_create(
 
 
 def _update_state(
-    job: models.Job, state: str, state_timestamp: datetime, state_data: Dict[str, Any], transfer_items: List[Any]
+    job: models.Job,
+    state: str,
+    state_timestamp: datetime,
+    state_data: Dict[str, Any],
+    transfer_items: List[Any],
+    from_state: Optional[str] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, Any], List[int]]:
-    if state == job.state or state is None:
+    if from_state is None:
+        from_state = job.state
+    if state == from_state or state is None:
         return {}, {}, []
 
     event = dict(
         job_id=job.id,
-        from_state=job.state,
+        from_state=from_state,
         to_state=state,
         timestamp=state_timestamp,
         data=state_data,
@@ -339,17 +440,30 @@ def do_update_jobs(
         if "workdir" in update_data:
             update_data["workdir"] = str(update_data["workdir"])
 
-        state_update, event, update_transfer_ids = _update_state(
-            job=job,
-            state=update_data.pop("state", None),
-            state_timestamp=update_data.pop("state_timestamp", datetime.utcnow()),
-            state_data=update_data.pop("state_data", {}),
-            transfer_items=transfer_items_by_jobid[job.id],
+        # Transitions folded into one update by the client are applied (and logged) in order
+        transitions = update_data.pop("state_history", None) or []
+        transitions.append(
+            dict(
+                state=update_data.pop("state", None),
+                state_timestamp=update_data.pop("state_timestamp", None),
+                state_data=update_data.pop("state_data", {}),
+            )
         )
-        if state_update:
-            update_data.update(state_update)
-            events.append(event)
-            ready_transfers.extend(update_transfer_ids)
+        from_state = job.state
+        for transition in transitions:
+            state_update, event, update_transfer_ids = _update_state(
+                job=job,
+                state=transition["state"],
+                state_timestamp=transition.get("state_timestamp") or datetime.utcnow(),
+                state_data=transition.get("state_data") or {},
+                transfer_items=transfer_items_by_jobid[job.id],
+                from_state=from_state,
+            )
+            if state_update:
+                update_data.update(state_update)
+                events.append(event)
+                ready_transfers.extend(update_transfer_ids)
+                from_state = state_update["state"]
 
     updates_list = list(patch_dicts.values())
     if updates_list:
@@ -371,27 +485,51 @@ def do_update_jobs(
     update_waiting_children(db, finished_ids)
 
 
+def _replaced_blobs(update_jobs: List[Any], patch_dicts: Dict[int, Dict[str, Any]]) -> Set[str]:
+    """The blobs referenced by Jobs whose parameters (and blob_digests) are being replaced"""
+    return {digest for job in update_jobs if "blob_digests" in patch_dicts[job.id] for digest in job.blob_digests}
+
+
 def bulk_update(db: Session, owner: schemas.UserOut, patch_dicts: Dict[int, Dict[str, Any]]) -> int:
     job_ids = set(patch_dicts.keys())
     qs = owned_job_selector(owner).where(models.Job.id.in_(job_ids))
-    update_jobs, transfer_items_by_jobid = select_jobs_for_update(db, qs)
+    update_jobs, transfer_items_by_jobid = select_jobs_for_update(db, qs, extra_cols=[models.Job.blob_digests])
     if len(update_jobs) < len(patch_dicts):
         raise ValidationError("Could not find some Job IDs")
+    _check_blobs(db, owner, (digest for patch in patch_dicts.values() for digest in patch.get("blob_digests") or []))
+    replaced_blobs = _replaced_blobs(update_jobs, patch_dicts)
     do_update_jobs(db, update_jobs, transfer_items_by_jobid, patch_dicts)
+    reclaim(db, owner, replaced_blobs)
     return len(update_jobs)
 
 
+def _bulk_op_limit_exceeded(count: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail={
+            "code": schemas.BULK_OP_LIMIT_EXCEEDED,
+            "limit": schemas.MAX_ITEMS_PER_BULK_OP,
+            "count": count,
+            "message": f"Cannot bulk-update more than {schemas.MAX_ITEMS_PER_BULK_OP} in a single API call.",
+        },
+    )
+
+
 def update_query(db: Session, owner: schemas.UserOut, update_data: Dict[str, Any], filterset: JobQuery) -> int:
     qs = owned_job_selector(owner)
     qs = filterset.apply_filters(qs)
-    update_jobs, transfer_items_by_jobid = select_jobs_for_update(db, qs)
+    # Reject oversized updates with a cheap count, before locking and loading any rows
+    count: int = db.execute(qs.with_only_columns([func.count(models.Job.id)]).order_by(None)).scalar()
+    if count > schemas.MAX_ITEMS_PER_BULK_OP:
+        raise _bulk_op_limit_exceeded(count)
+    update_jobs, transfer_items_by_jobid = select_jobs_for_update(db, qs, extra_cols=[models.Job.blob_digests])
     if len(update_jobs) > schemas.MAX_ITEMS_PER_BULK_OP:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot bulk-update more than {schemas.MAX_ITEMS_PER_BULK_OP} in a single API call.",
-        )
+        raise _bulk_op_limit_exceeded(len(update_jobs))
+    _check_blobs(db, owner, update_data.get("blob_digests") or [])
     patch_dicts = {job.id: update_data.copy() for job in update_jobs}
+    replaced_blobs = _replaced_blobs(update_jobs, patch_dicts)
     do_update_jobs(db, update_jobs, transfer_items_by_jobid, patch_dicts)
+    reclaim(db, owner, replaced_blobs)
     return len(update_jobs)
 
 
@@ -409,7 +547,10 @@ def delete_query(
         assert filterset is not None
         qs = filterset.apply_filters(qs)
     qs = qs.filter(models.Job.session_id.is_(None)).with_for_update(of=models.Job, skip_locked=True)  # type: ignore
-    num_deleted = db.query(models.Job).filter(models.Job.id.in_(qs)).delete(synchronize_session=False)
+    stmt = delete(models.Job.__table__).where(models.Job.id.in_(qs)).returning(models.Job.blob_digests)
+    deleted = db.execute(stmt).scalars().all()
+    num_deleted = len(deleted)
+    num_reclaimed = reclaim(db, owner, set(chain.from_iterable(deleted)))
     db.flush()
-    logger.debug(f"Deleted {num_deleted} jobs")
+    logger.debug(f"Deleted {num_deleted} jobs and reclaimed {num_reclaimed} blobs")
     return num_deleted
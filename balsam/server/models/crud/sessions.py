@@ -9,7 +9,7 @@ from balsam import schemas
 from balsam.server import ValidationError, models
 from balsam.server.routers.filters import SessionQuery
 
-from .jobs import do_update_jobs, owned_job_selector, select_jobs_for_update
+from .jobs import INTERNAL_JOB_COLUMNS, do_update_jobs, owned_job_selector, select_jobs_for_update
 
 logger = logging.getLogger(__name__)
 
@@ -231,12 +231,30 @@ def acquire(
         subq = select(models.Job.__table__, _footprint_func_nodes()).where(models.Job.id.in_(locked_ids)).subquery()  # type: ignore
 
     # logger.info(f"*** max_aggregate_nodes: {spec.max_aggregate_nodes}")
-    cols = [c for c in subq.c if c.name not in ["aggregate_footprint", "session_id"]]
+    cols = [c for c in subq.c if c.name not in ["aggregate_footprint", "session_id", *INTERNAL_JOB_COLUMNS]]
     job_q = select(cols).where(subq.c.aggregate_footprint <= spec.max_aggregate_nodes)
 
     return _acquire_jobs(db, job_q, session)
 
 
+def release(db: Session, owner: schemas.UserOut, session_id: int, spec: schemas.SessionRelease) -> int:
+    """Unlock acquired Jobs that have not started running, so other Sessions may acquire them"""
+    session = owned_session_query(db, owner).filter(models.Session.id == session_id).one()
+    session.heartbeat = datetime.utcnow()
+    stmt = (
+        update(models.Job.__table__)
+        .where(models.Job.session_id == session.id)
+        .where(models.Job.id.in_(spec.job_ids))
+        .where(models.Job.state != "RUNNING")
+        .values(session_id=None)
+    )
+    result = db.execute(stmt)
+    db.flush()
+    num_released: int = result.rowcount
+    logger.debug(f"Session {session.id} released {num_released} jobs")
+    return num_released
+
+
 def tick(db: Session, owner: schemas.UserOut, session_id: int) -> datetime:
     in_db = owned_session_query(db, owner).filter(models.Session.id == session_id).one()
     ts = datetime.utcnow()
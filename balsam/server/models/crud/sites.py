@@ -2,7 +2,9 @@ from datetime import datetime
 from typing import Any, Dict, Optional, Tuple, Union
 
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
 from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm.exc import NoResultFound
 
 from balsam import schemas
 from balsam.server import ValidationError, models
@@ -30,6 +32,26 @@ def fetch(
         return count, paginator.paginate(qs.order_by(models.Site.id))
 
 
+def fetch_validator(
+    db: Session, owner: schemas.UserOut, site_id: Optional[int] = None, filterset: Optional[SiteQuery] = None
+) -> Tuple[Any, ...]:
+    """
+    Cheap state that changes whenever the Sites selected by `fetch` do: their
+    count, latest `last_refresh` (set by every update) and largest id.
+    """
+    qs = db.query(models.Site).filter(models.Site.owner_id == owner.id)
+    if filterset is not None:
+        qs = filterset.apply_filters(qs)
+    if site_id is not None:
+        qs = qs.filter(models.Site.id == site_id)
+    count, last_refresh, max_id = qs.with_entities(
+        func.count(models.Site.id), func.max(models.Site.last_refresh), func.max(models.Site.id)
+    ).one()
+    if site_id is not None and not count:
+        raise NoResultFound(f"No Site with id {site_id}")
+    return count, last_refresh, max_id
+
+
 def create(db: Session, owner: schemas.UserOut, site: schemas.SiteCreate) -> models.Site:
     site_id = db.query(models.Site.id).filter_by(name=site.name, owner_id=owner.id).scalar()  # type: ignore
     if site_id is not None:
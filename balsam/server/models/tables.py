@@ -3,6 +3,7 @@ from typing import Any, Dict, List, Optional
 
 from sqlalchemy import (
     JSON,
+    BigInteger,
     Boolean,
     Column,
     DateTime,
@@ -36,6 +37,17 @@ class User(Base):
     hashed_password = Column(String(128), nullable=True, default=None)
 
 
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    # Content-addressed payloads (e.g. large Job parameter values shared by many Jobs)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    digest = Column(String(64), primary_key=True)
+    data = Column(Text, nullable=False)
+    # False for blobs stored before Jobs recorded their blob_digests: these may still be in use
+    reclaimable = Column(Boolean, default=True, nullable=False)
+
+
 class DeviceCodeAttempt(Base):
     __tablename__ = "device_code_attempts"
 
@@ -110,6 +122,7 @@ class App(Base):
     transfers: Dict[str, Any] = Column(JSON, default=dict)  # type: ignore
     serialized_class = Column(Text, default="")
     source_code = Column(Text, default="")
+    last_modified = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     site = orm.relationship(Site, back_populates="apps")
     jobs = orm.relationship("Job", back_populates="app", cascade="all, delete-orphan", passive_deletes=True)
@@ -127,7 +140,10 @@ class Job(Base):
     # Ensure that GIN index is created:
     #     CREATE INDEX idxgin ON jobs USING gin (tags);
     tags = Column(pg.JSONB, default=dict, index=True)
-    __table_args__ = (Index("ix_jobs_tags", text("(tags jsonb_path_ops)"), postgresql_using="GIN"),)
+    __table_args__ = (
+        Index("ix_jobs_tags", text("(tags jsonb_path_ops)"), postgresql_using="GIN"),
+        Index("ix_jobs_blob_digests", "blob_digests", postgresql_using="GIN"),
+    )
 
     app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"))
     session_id = Column(
@@ -137,11 +153,15 @@ class Job(Base):
         default=None,
     )
     serialized_parameters = Column(Text, default="")
+    # Blobs referenced by serialized_parameters: a Blob is reclaimed once no Job references it
+    blob_digests = Column(pg.ARRAY(String(64), dimensions=1), default=[], nullable=False)
     serialized_return_value = Column(Text, default="")
     serialized_exception = Column(Text, default="")
     batch_job_id = Column(Integer, ForeignKey("batch_jobs.id", ondelete="SET NULL"), nullable=True)
     state = Column(String(32), index=True)
     last_update = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    # Id of the last transaction to write this row; set by the jobs_change_seq trigger
+    change_seq = Column(BigInteger, index=True)
     data = Column(JSON)
     return_code = Column(Integer)
     pending_file_cleanup = Column(Boolean, default=True)
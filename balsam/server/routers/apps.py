@@ -1,7 +1,7 @@
 import json
-from typing import Any, Dict
+from typing import List
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 from sqlalchemy import orm
 
 from balsam import schemas
@@ -9,7 +9,7 @@ from balsam.server import models
 from balsam.server.auth import get_auth_method, get_webuser_session
 from balsam.server.models import crud
 from balsam.server.pubsub import pubsub
-from balsam.server.utils import Paginator
+from balsam.server.utils import Paginator, make_etag, not_modified_response, tagged_json_response
 
 from .filters import AppQuery
 
@@ -19,28 +19,58 @@ auth = get_auth_method()
 
 @router.get("/", response_model=schemas.PaginatedAppsOut)
 def list(
+    request: Request,
     db: orm.Session = Depends(get_webuser_session),
     user: schemas.UserOut = Depends(auth),
     paginator: Paginator[models.App] = Depends(Paginator),
     q: AppQuery = Depends(AppQuery),
-) -> Dict[str, Any]:
-    """List Apps registered by the user's Balsam Sites."""
+) -> Response:
+    """
+    List Apps registered by the user's Balsam Sites.
+    Supports conditional GET with `If-None-Match`.
+    """
+    etag = make_etag(str(request.url), crud.apps.fetch_validator(db, owner=user, filterset=q))
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
     count, apps = crud.apps.fetch(
         db,
         owner=user,
         paginator=paginator,
         filterset=q,
     )
-    return {"count": count, "results": apps}
+    result = schemas.PaginatedAppsOut(count=count, results=apps)
+    return tagged_json_response(result.json().encode(), etag)
+
+
+@router.get("/versions", response_model=List[schemas.AppVersionOut])
+def versions(
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+    q: AppQuery = Depends(AppQuery),
+) -> List[schemas.AppVersionOut]:
+    """
+    List the id, name, and a hash of the serialized class of each App.
+    Clients with a local App cache use this to fetch only changed Apps.
+    """
+    return crud.apps.fetch_versions(db, owner=user, filterset=q)
 
 
 @router.get("/{app_id}", response_model=schemas.AppOut)
 def read(
-    app_id: int, db: orm.Session = Depends(get_webuser_session), user: schemas.UserOut = Depends(auth)
-) -> "orm.Query[models.App]":
+    request: Request,
+    app_id: int,
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> Response:
+    """Get the specified App. Supports conditional GET with `If-None-Match`."""
+    etag = make_etag(str(request.url), crud.apps.fetch_validator(db, owner=user, app_id=app_id))
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
     _, app = crud.apps.fetch(db, owner=user, app_id=app_id)
-    """Get the specified App."""
-    return app
+    result = schemas.AppOut.from_orm(app)
+    return tagged_json_response(result.json().encode(), etag)
 
 
 @router.post("/", response_model=schemas.AppOut, status_code=status.HTTP_201_CREATED)
@@ -0,0 +1,118 @@
+import logging
+import re
+from typing import Any, Callable, Dict, List, Pattern, Tuple
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import ValidationError as PydanticValidationError, parse_obj_as
+from pydantic.json import pydantic_encoder
+from sqlalchemy import orm
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm.exc import NoResultFound
+from starlette.responses import Response
+
+from balsam import schemas
+from balsam.server import ValidationError
+from balsam.server.auth import get_auth_method, get_webuser_session
+from balsam.server.models import crud
+
+from .jobs import bulk_patch_dicts
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+auth = get_auth_method()
+
+BatchHandler = Callable[[orm.Session, schemas.UserOut, Dict[str, str], Any], Any]
+
+
+def _session_tick(db: orm.Session, user: schemas.UserOut, path_params: Dict[str, str], body: Any) -> None:
+    crud.sessions.tick(db, owner=user, session_id=int(path_params["session_id"]))
+
+
+def _session_acquire(
+    db: orm.Session, user: schemas.UserOut, path_params: Dict[str, str], body: Any
+) -> List[Dict[str, Any]]:
+    spec = schemas.SessionAcquire.parse_obj(body)
+    return crud.sessions.acquire(db, owner=user, session_id=int(path_params["session_id"]), spec=spec)
+
+
+def _jobs_bulk_update(db: orm.Session, user: schemas.UserOut, path_params: Dict[str, str], body: Any) -> int:
+    jobs = parse_obj_as(List[schemas.JobBulkUpdate], body)
+    return crud.jobs.bulk_update(db, owner=user, patch_dicts=bulk_patch_dicts(jobs))
+
+
+def _transfers_bulk_update(
+    db: orm.Session, user: schemas.UserOut, path_params: Dict[str, str], body: Any
+) -> List[schemas.TransferItemOut]:
+    transfers = parse_obj_as(List[schemas.TransferItemBulkUpdate], body)
+    updated_transfers = crud.transfers.bulk_update(db, owner=user, update_list=transfers)
+    return [schemas.TransferItemOut.from_orm(t) for t in updated_transfers]
+
+
+# Sub-operations mirror the standalone routes of the same method and path
+BATCH_HANDLERS: List[Tuple[str, Pattern[str], BatchHandler]] = [
+    ("PUT", re.compile(r"^sessions/(?P<session_id>\d+)$"), _session_tick),
+    ("POST", re.compile(r"^sessions/(?P<session_id>\d+)$"), _session_acquire),
+    ("PATCH", re.compile(r"^jobs$"), _jobs_bulk_update),
+    ("PATCH", re.compile(r"^transfers$"), _transfers_bulk_update),
+]
+
+
+def _resolve(op: schemas.BatchOperation) -> Tuple[BatchHandler, Dict[str, str]]:
+    for method, pattern, handler in BATCH_HANDLERS:
+        match = pattern.match(op.path)
+        if method == op.method and match:
+            return handler, match.groupdict()
+    raise ValidationError(f"Operation {op.method} {op.path} is not supported in a batch")
+
+
+def _execute(
+    db: orm.Session, user: schemas.UserOut, handler: BatchHandler, path_params: Dict[str, str], body: Any
+) -> Dict[str, Any]:
+    try:
+        data = handler(db, user, path_params, body)
+    except HTTPException as exc:
+        return {"status_code": exc.status_code, "data": None, "detail": exc.detail}
+    except NoResultFound:
+        return {"status_code": 404, "data": None, "detail": "Not found"}
+    except PydanticValidationError as exc:
+        return {"status_code": 422, "data": None, "detail": exc.errors()}
+    except IntegrityError as exc:
+        return {"status_code": 409, "data": None, "detail": str(exc.orig)}
+    except SQLAlchemyError as exc:
+        logger.exception(f"Database error in batch operation: {exc}")
+        return {"status_code": 500, "data": None, "detail": "Database error"}
+    return {"status_code": 200, "data": data, "detail": None}
+
+
+@router.post("/", response_model=schemas.BatchResponse, response_class=Response)
+def batch(
+    batch_request: schemas.BatchRequest,
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> Response:
+    """
+    Execute an ordered list of sub-operations in a single request.
+    Each sub-operation is committed as it succeeds; a failed sub-operation is rolled
+    back and reported in its result. With `atomic`, the batch runs in one
+    transaction and the first failure rolls back and rejects the entire batch.
+    """
+    resolved = [_resolve(op) for op in batch_request.operations]
+    results = []
+    for idx, ((handler, path_params), op) in enumerate(zip(resolved, batch_request.operations)):
+        result = _execute(db, user, handler, path_params, op.body)
+        results.append(result)
+        if result["status_code"] >= 400:
+            db.rollback()
+            if batch_request.atomic:
+                raise HTTPException(
+                    status_code=result["status_code"],
+                    detail={"operation": idx, "detail": result["detail"]},
+                )
+        elif not batch_request.atomic:
+            db.commit()
+    db.commit()
+    return Response(
+        content=orjson.dumps({"results": results}, default=pydantic_encoder),
+        media_type="application/json",
+    )
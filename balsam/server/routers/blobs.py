@@ -0,0 +1,45 @@
+from typing import List
+
+import orjson
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy import orm
+from starlette.responses import Response
+
+from balsam import schemas
+from balsam.server import ValidationError
+from balsam.server.auth import get_auth_method, get_webuser_session
+from balsam.server.models import crud
+
+router = APIRouter()
+auth = get_auth_method()
+
+
+@router.get("/", response_model=List[schemas.BlobOut], response_class=Response)
+def list(
+    digest: List[str] = Query(..., description="Digests of the blobs to fetch"),
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> Response:
+    """Fetch blobs by digest. Unknown digests are omitted from the result."""
+    if len(digest) > schemas.MAX_BLOBS_PER_FETCH:
+        raise ValidationError(f"Cannot fetch more than {schemas.MAX_BLOBS_PER_FETCH} blobs per request")
+    blobs = crud.blobs.fetch(db, owner=user, digests=digest)
+    return Response(
+        content=orjson.dumps([{"digest": blob.digest, "data": blob.data} for blob in blobs]),
+        media_type="application/json",
+    )
+
+
+@router.post("/", response_model=List[str], status_code=status.HTTP_201_CREATED)
+def bulk_create(
+    blobs: List[schemas.BlobCreate],
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> List[str]:
+    """
+    Store content-addressed blobs. Blobs that already exist are skipped, so
+    uploading is idempotent. Returns the digests that were newly stored.
+    """
+    created = crud.blobs.bulk_create(db, owner=user, blobs=blobs)
+    db.commit()
+    return created
@@ -1,14 +1,41 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
-from typing import Any, Dict, List, Set, Tuple, cast, overload
+from typing import Any, Dict, List, Optional, Set, Tuple, Type, cast, overload
 
 from fastapi import Query
-from sqlalchemy import orm
+from pydantic import BaseModel, create_model, validator
+from sqlalchemy import Integer, bindparam, func, orm
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.sql import Select
 
 from balsam import schemas
 from balsam.server.models import App, BatchJob, Job, LogEvent, Session, Site, TransferItem
 
+# Id lists longer than this are joined against a single unnested array parameter,
+# rather than being rendered as one bound parameter per id in an IN clause
+ID_ARRAY_JOIN_THRESHOLD = 500
+
+
+def _listify(v: Any) -> Any:
+    if v is None or isinstance(v, (list, tuple, set)):
+        return v
+    return [v]
+
+
+def filterset_body_model(filterset: type) -> Type[BaseModel]:
+    """
+    Build a pydantic model accepting the same parameters as `filterset`
+    in a JSON request body.  Used by the POST/PUT/DELETE `/query` endpoints
+    when the filters are too large to fit in the URL.
+    """
+    model_fields: Dict[str, Any] = {}
+    validators: Dict[str, Any] = {}
+    for field in fields(filterset):
+        model_fields[field.name] = (Optional[field.type], None)
+        if getattr(field.type, "_name", None) in ["List", "Set"]:
+            validators[f"listify_{field.name}"] = validator(field.name, pre=True, allow_reuse=True)(_listify)
+    return create_model(f"{filterset.__name__}Body", __validators__=validators, **model_fields)  # type: ignore
+
 
 @dataclass
 class SiteQuery:
@@ -149,7 +176,11 @@ class JobQuery:
             def _filter(expr: Any):  # type: ignore[no-untyped-def]
                 return qs.filter(expr)
 
-        if self.id:
+        if self.id and len(self.id) > ID_ARRAY_JOIN_THRESHOLD:
+            id_array = bindparam("filter_job_ids", value=sorted(set(self.id)), type_=ARRAY(Integer))
+            filter_ids = func.unnest(id_array).table_valued("id").render_derived(name="filter_job_ids")
+            qs = qs.join(filter_ids, Job.id == filter_ids.c.id)
+        elif self.id:
             qs = _filter(Job.id.in_(self.id))
         if self.parent_id:
             qs = _filter(Job.parent_ids.overlap(self.parent_id))  # type: ignore[attr-defined]
@@ -182,6 +213,9 @@ class JobQuery:
         return qs
 
 
+JobQueryBody = filterset_body_model(JobQuery)
+
+
 @dataclass
 class TransferItemQuery:
     id: List[int] = Query(None, description="Only return transfer items with IDs in this list.")
@@ -1,10 +1,13 @@
+import asyncio
+import time
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
 import orjson
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
 from fastapi.responses import ORJSONResponse
 from sqlalchemy import orm
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import Response
 
 from balsam import schemas
@@ -14,12 +17,15 @@ from balsam.server.auth import get_auth_method, get_webuser_session
 from balsam.server.models import Job, crud
 from balsam.server.pubsub import pubsub
 from balsam.server.utils import Paginator
+from balsam.server.utils.change_listener import job_change_listener
 
-from .filters import JobQuery
+from .filters import JobQuery, JobQueryBody
 
 router = APIRouter()
 auth = get_auth_method()
 
+CHANGES_POLL_PERIOD = 1.0
+
 
 @router.get("/", response_class=Response)
 def list(
@@ -27,12 +33,109 @@ def list(
     user: schemas.UserOut = Depends(auth),
     paginator: Paginator[Job] = Depends(Paginator),
     q: JobQuery = Depends(JobQuery),
+    fields: List[str] = Query(None, description="Only return these Job fields (defaults to all fields)."),
 ) -> Response:
     """List the user's Jobs."""
-    count, jobs = crud.jobs.fetch(db, owner=user, paginator=paginator, filterset=q)
+    count, jobs = crud.jobs.fetch(db, owner=user, paginator=paginator, filterset=q, fields=fields)
     return Response(content=orjson.dumps({"count": count, "results": jobs}), media_type="application/json")
 
 
+@router.post("/query", response_class=Response)
+def query_list(
+    filters: JobQueryBody = Body(..., embed=True),  # type: ignore[valid-type]
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+    paginator: Paginator[Job] = Depends(Paginator),
+    fields: List[str] = Query(None, description="Only return these Job fields (defaults to all fields)."),
+) -> Response:
+    """List the user's Jobs, with the filters passed in the request body (e.g. very large id lists)."""
+    q = JobQuery(**filters.dict())  # type: ignore[attr-defined]
+    count, jobs = crud.jobs.fetch(db, owner=user, paginator=paginator, filterset=q, fields=fields)
+    return Response(content=orjson.dumps({"count": count, "results": jobs}), media_type="application/json")
+
+
+@router.put("/query")
+def query_body_update(
+    filters: JobQueryBody = Body(..., embed=True),  # type: ignore[valid-type]
+    update: schemas.JobUpdate = Body(..., embed=True),
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> int:
+    """Apply the same update to all Jobs selected by the filters in the request body."""
+    data = update.dict(exclude_unset=True)
+    data["last_update"] = datetime.utcnow()
+    q = JobQuery(**filters.dict())  # type: ignore[attr-defined]
+    num_updated = crud.jobs.update_query(db, owner=user, update_data=data, filterset=q)
+    db.commit()
+    return num_updated
+
+
+@router.delete("/query")
+def query_body_delete(
+    filters: JobQueryBody = Body(..., embed=True),  # type: ignore[valid-type]
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> int:
+    """Delete all jobs selected by the filters in the request body."""
+    q = JobQuery(**filters.dict())  # type: ignore[attr-defined]
+    num_deleted = crud.jobs.delete_query(db, owner=user, filterset=q)
+    db.commit()
+    return num_deleted
+
+
+def _fetch_changes(db: orm.Session, **kwargs: Any) -> Tuple[int, Optional[int], bool, List[Dict[str, Any]]]:
+    try:
+        return crud.jobs.fetch_changes(db, **kwargs)
+    finally:
+        db.rollback()  # Do not hold a transaction open between polls
+
+
+@router.get("/changes", response_model=schemas.JobChangesOut, response_class=Response)
+async def changes(
+    after_seq: int = Query(None, description="`seq` from the previous response; omit to start a new feed."),
+    after_id: int = Query(None, description="`after_id` from the previous response, if it was set."),
+    wait: float = Query(
+        0.0, ge=0.0, le=schemas.MAX_CHANGES_WAIT_SEC, description="Seconds to wait for a change (long-poll)."
+    ),
+    limit: int = Query(schemas.MAX_CHANGES_PER_PAGE, ge=1, le=schemas.MAX_CHANGES_PER_PAGE),
+    fields: List[str] = Query(None, description="Extra Job fields to include in each change."),
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+    q: JobQuery = Depends(JobQuery),
+) -> Response:
+    """
+    Feed of Jobs created or updated after the `after_seq` cursor, in the order the
+    changes were committed.  Blocks for up to `wait` seconds until a change is available.
+    Waiting requests hold no worker thread: they are woken by Postgres notifications
+    on Job writes, and re-check every CHANGES_POLL_PERIOD in case one is missed.
+    """
+    deadline = time.monotonic() + wait
+    with job_change_listener.subscribe() as changed:
+        while True:
+            changed.clear()
+            seq, next_id, has_more, job_changes = await run_in_threadpool(
+                _fetch_changes,
+                db,
+                owner=user,
+                after_seq=after_seq,
+                after_id=after_id,
+                filterset=q,
+                fields=fields,
+                limit=limit,
+            )
+            remaining = deadline - time.monotonic()
+            if job_changes or after_seq is None or remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=min(remaining, CHANGES_POLL_PERIOD))
+            except asyncio.TimeoutError:
+                pass
+    return Response(
+        content=orjson.dumps({"seq": seq, "after_id": next_id, "has_more": has_more, "results": job_changes}),
+        media_type="application/json",
+    )
+
+
 @router.get("/{job_id}", response_class=ORJSONResponse)
 def read(
     job_id: int, db: orm.Session = Depends(get_webuser_session), user: schemas.UserOut = Depends(auth)
@@ -60,13 +163,8 @@ def bulk_create(
     return ORJSONResponse(content=new_jobs, status_code=status.HTTP_201_CREATED)
 
 
-@router.patch("/")
-def bulk_update(
-    jobs: List[schemas.JobBulkUpdate],
-    db: orm.Session = Depends(get_webuser_session),
-    user: schemas.UserOut = Depends(auth),
-) -> int:
-    """Update a list of Jobs"""
+def bulk_patch_dicts(jobs: List[schemas.JobBulkUpdate]) -> Dict[int, Dict[str, Any]]:
+    """Map Job id to its patch for `crud.jobs.bulk_update`, rejecting oversized or duplicate updates"""
     if len(jobs) > MAX_ITEMS_PER_BULK_OP:
         raise HTTPException(
             status_code=400, detail=f"Cannot bulk-update more than {MAX_ITEMS_PER_BULK_OP} in a single API call."
@@ -75,7 +173,17 @@ def bulk_update(
     patch_dicts = {job.id: {**job.dict(exclude_unset=True, exclude={"id"}), "last_update": now} for job in jobs}
     if len(jobs) > len(patch_dicts):
         raise ValidationError("Duplicate Job ID keys provided")
-    num_updated = crud.jobs.bulk_update(db, owner=user, patch_dicts=patch_dicts)
+    return patch_dicts
+
+
+@router.patch("/")
+def bulk_update(
+    jobs: List[schemas.JobBulkUpdate],
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> int:
+    """Update a list of Jobs"""
+    num_updated = crud.jobs.bulk_update(db, owner=user, patch_dicts=bulk_patch_dicts(jobs))
     db.commit()
     return num_updated
 
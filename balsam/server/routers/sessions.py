@@ -52,6 +52,19 @@ def acquire(
     return ORJSONResponse(content=acquired_jobs)
 
 
+@router.post("/{session_id}/release")
+def release(
+    session_id: int,
+    spec: schemas.SessionRelease,
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> int:
+    """Hand back acquired Jobs that have not started, so that other Sessions can run them."""
+    num_released = crud.sessions.release(db, owner=user, session_id=session_id, spec=spec)
+    db.commit()
+    return num_released
+
+
 @router.put("/{session_id}")
 def tick(
     session_id: int, db: orm.Session = Depends(get_webuser_session), user: schemas.UserOut = Depends(auth)
@@ -1,14 +1,13 @@
 from datetime import datetime
-from typing import Any, Dict
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 from sqlalchemy import orm
 
 from balsam import schemas
 from balsam.server.auth import get_auth_method, get_webuser_session
 from balsam.server.models import Site, crud
 from balsam.server.pubsub import pubsub
-from balsam.server.utils import Paginator
+from balsam.server.utils import Paginator, make_etag, not_modified_response, tagged_json_response
 
 from .filters import SiteQuery
 
@@ -19,27 +18,45 @@ print("auth is", auth)
 
 @router.get("/", response_model=schemas.PaginatedSitesOut)
 def list(
+    request: Request,
     q: SiteQuery = Depends(SiteQuery),
     db: orm.Session = Depends(get_webuser_session),
     user: schemas.UserOut = Depends(auth),
     paginator: Paginator[Site] = Depends(Paginator),
-) -> Dict[str, Any]:
-    """List Sites belonging to the user."""
+) -> Response:
+    """List Sites belonging to the user. Supports conditional GET with `If-None-Match`."""
+    etag = make_etag(str(request.url), crud.sites.fetch_validator(db, owner=user, filterset=q))
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
     count, sites = crud.sites.fetch(
         db,
         owner=user,
         paginator=paginator,
         filterset=q,
     )
-    return {"count": count, "results": sites}
+    assert not isinstance(sites, Site)
+    result = schemas.PaginatedSitesOut(count=count, results=sites)
+    return tagged_json_response(result.json().encode(), etag)
 
 
 @router.get("/{site_id}", response_model=schemas.SiteOut)
-def read(site_id: int, db: orm.Session = Depends(get_webuser_session), user: schemas.UserOut = Depends(auth)) -> Site:
-    """Fetch a Sites by id."""
+def read(
+    request: Request,
+    site_id: int,
+    db: orm.Session = Depends(get_webuser_session),
+    user: schemas.UserOut = Depends(auth),
+) -> Response:
+    """Fetch a Sites by id. Supports conditional GET with `If-None-Match` or `If-Modified-Since`."""
+    validator = crud.sites.fetch_validator(db, owner=user, site_id=site_id)
+    etag, last_refresh = make_etag(str(request.url), validator), validator[1]
+    not_modified = not_modified_response(request, etag, last_modified=last_refresh)
+    if not_modified is not None:
+        return not_modified
     _, site = crud.sites.fetch(db, owner=user, site_id=site_id)
     assert isinstance(site, Site)
-    return site
+    result = schemas.SiteOut.from_orm(site)
+    return tagged_json_response(result.json().encode(), etag, last_modified=last_refresh)
 
 
 @router.post("/", response_model=schemas.SiteOut, status_code=status.HTTP_201_CREATED)
@@ -1,5 +1,13 @@
+from .conditional import make_etag, not_modified_response, tagged_json_response
 from .log import setup_logging
 from .paginator import Paginator
 from .timer import TimingMiddleware
 
-__all__ = ["Paginator", "setup_logging", "TimingMiddleware"]
+__all__ = [
+    "Paginator",
+    "setup_logging",
+    "TimingMiddleware",
+    "make_etag",
+    "not_modified_response",
+    "tagged_json_response",
+]
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import select
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Set, Tuple
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from balsam.server.models import get_engine
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeListener:
+    """
+    Wakes long-polling requests when a Postgres NOTIFY arrives on `channel`.
+
+    Each server process holds one LISTEN connection, read by a daemon thread
+    that sets the asyncio Event of every subscribed request.  Notifications are
+    only a hint: waiters should still re-check on a timeout, since a change may
+    not be visible yet, and the connection may drop (it is re-established after
+    RECONNECT_DELAY).
+    """
+
+    RECONNECT_DELAY = 5.0
+
+    def __init__(self, channel: str) -> None:
+        self.channel = channel
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Event]:
+        """Yields an Event that is set on each notification; clear it before re-checking"""
+        self._ensure_started()
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"listen-{self.channel}", daemon=True)
+                self._thread.start()
+
+    def _notify_waiters(self) -> None:
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._listen()
+            except Exception as exc:
+                logger.warning(f"LISTEN {self.channel} failed: {exc}; retrying in {self.RECONNECT_DELAY} sec")
+            time.sleep(self.RECONNECT_DELAY)
+
+    def _listen(self) -> None:
+        conn = get_engine().raw_connection()
+        try:
+            dbapi_conn = conn.connection
+            dbapi_conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            dbapi_conn.cursor().execute(f"LISTEN {self.channel}")
+            logger.debug(f"Listening for {self.channel} notifications")
+            while True:
+                select.select([dbapi_conn], [], [], 60.0)
+                dbapi_conn.poll()
+                if dbapi_conn.notifies:
+                    dbapi_conn.notifies.clear()
+                    self._notify_waiters()
+        finally:
+            conn.invalidate()
+
+
+job_change_listener = ChangeListener("job_changes")
@@ -0,0 +1,84 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*state: Any) -> str:
+    """
+    A weak ETag derived from cheap database state (e.g. a row count and the
+    latest modification time), so it can be checked before loading any rows.
+    """
+    return 'W/"' + hashlib.blake2b(repr(state).encode(), digest_size=16).hexdigest() + '"'
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    candidates = [_opaque_tag(tag) for tag in if_none_match.split(",")]
+    # Weak comparison: a W/ prefix does not matter for GET revalidation
+    return "*" in candidates or _opaque_tag(etag) in candidates
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+
+def _is_settled(last_modified: datetime) -> bool:
+    """
+    Whether `last_modified` falls before the current second. HTTP dates have 1
+    second resolution, so a date in the current second could also cover a
+    change that has not happened yet.
+    """
+    return _as_utc(last_modified) < datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _not_modified_since(last_modified: datetime, if_modified_since: str) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    last_modified = _as_utc(last_modified)
+    return _is_settled(last_modified) and last_modified.replace(microsecond=0) <= since
+
+
+def _validator_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    # Only a settled Last-Modified is a safe validator; the ETag covers the rest
+    if last_modified is not None and _is_settled(last_modified):
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def not_modified_response(
+    request: Request, etag: str, last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """
+    Respond 304 Not Modified if the client's `If-None-Match` (or, failing that,
+    `If-Modified-Since`) header shows it already has the current content.
+    Returns None if the content must be sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(etag, if_none_match)
+    elif if_modified_since is not None and last_modified is not None:
+        not_modified = _not_modified_since(last_modified, if_modified_since)
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_validator_headers(etag, last_modified))
+    return None
+
+
+def tagged_json_response(content: bytes, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Respond with `content` tagged by an ETag (and optional Last-Modified) header"""
+    return Response(content=content, media_type="application/json", headers=_validator_headers(etag, last_modified))
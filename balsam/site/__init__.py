@@ -1,8 +1,9 @@
-from .job_source import FixedDepthJobSource, SynchronousJobSource
+from .job_source import AsyncJobSource, FixedDepthJobSource, SynchronousJobSource
 from .script_template import ScriptTemplate
 from .status_updater import BulkStatusUpdater
 
 __all__ = [
+    "AsyncJobSource",
     "FixedDepthJobSource",
     "SynchronousJobSource",
     "BulkStatusUpdater",
@@ -1,9 +1,11 @@
 import logging
+import math
+import os
 import queue
 import threading
 import time
 from datetime import timedelta
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
 
 from balsam.schemas import MAX_JOBS_PER_SESSION_ACQUIRE, JobState
 from balsam.util import Process, SigHandler
@@ -51,6 +53,63 @@ class SessionThread(threading.Thread):
             time.sleep(self.TICK_PERIOD.total_seconds())
 
 
+class PrefetchController:
+    """
+    Chooses a prefetch depth from Little's law.  To keep the queue from
+    draining, it must hold the Jobs consumed while a refill is in flight:
+    depth = consumption rate * (acquire latency + poll period), times a headroom
+    factor.  The depth is bounded by `max_depth` (the aggregate capacity) and
+    by the number of Jobs that could start in the remaining walltime.
+    """
+
+    SMOOTHING = 0.3  # Weight of the newest sample in the moving averages
+    HEADROOM = 2.0
+    FAST_POLL_PERIOD = 0.1
+
+    def __init__(self, min_depth: int, max_depth: int, poll_period: float = 1.0) -> None:
+        self.min_depth = max(1, min(min_depth, max_depth))
+        self.max_depth = max_depth
+        self.base_poll_period = poll_period
+        self.poll_period = poll_period
+        self.rate = 0.0
+        self.latency = 0.0
+        self.depth = self.min_depth
+        self._filled_size: Optional[int] = None
+        self._filled_time = 0.0
+
+    def _smooth(self, average: float, sample: float) -> float:
+        return sample if not average else (1 - self.SMOOTHING) * average + self.SMOOTHING * sample
+
+    def observe_queue(self, qsize: int, now: float) -> None:
+        """Measure the consumption rate since the queue was last filled"""
+        if self._filled_size is not None and now > self._filled_time:
+            consumed = max(0, self._filled_size - qsize)
+            self.rate = self._smooth(self.rate, consumed / (now - self._filled_time))
+        # Poll faster while the queue runs dry between polls
+        drained = qsize == 0 and self.rate > 0
+        self.poll_period = self.FAST_POLL_PERIOD if drained else self.base_poll_period
+
+    def observe_acquire(self, latency: float) -> None:
+        self.latency = self._smooth(self.latency, latency)
+
+    def queue_filled(self, qsize: int, now: float) -> None:
+        self._filled_size = qsize
+        self._filled_time = now
+
+    def target_depth(self, remaining_sec: Optional[float] = None) -> int:
+        depth = math.ceil(self.HEADROOM * self.rate * (self.latency + self.poll_period))
+        if remaining_sec is not None:
+            depth = min(depth, math.ceil(self.rate * max(0.0, remaining_sec)))
+        depth = max(self.min_depth, min(self.max_depth, depth))
+        if depth != self.depth:
+            logger.info(
+                f"JobSource prefetch depth {self.depth} -> {depth} "
+                f"(consuming {self.rate:.2f} jobs/sec; acquire latency {self.latency:.3f} sec)"
+            )
+            self.depth = depth
+        return depth
+
+
 class FixedDepthJobSource(Process):
     """
     A background process maintains a queue of `prefetch_depth` jobs meeting
@@ -62,6 +121,10 @@ class FixedDepthJobSource(Process):
     resources, launchers using this JobSource may prefetch too much and
     prevent effective work-sharing (i.e. one launcher hogs all the jobs in
     its queue, leaving the other launchers empty-handed).
+
+    With `adaptive_min_depth` set, a PrefetchController instead sizes the
+    queue between `adaptive_min_depth` and `prefetch_depth` to match the
+    measured consumption rate, which mitigates the problem above.
     """
 
     def __init__(
@@ -78,10 +141,14 @@ class FixedDepthJobSource(Process):
         max_aggregate_nodes: Optional[float] = None,
         scheduler_id: Optional[int] = None,
         app_ids: Optional[Set[int]] = None,
+        adaptive_min_depth: Optional[int] = None,
     ) -> None:
         super().__init__()
         self.queue: "Queue[Job]" = Queue()
         self.prefetch_depth = prefetch_depth
+        self.controller: Optional[PrefetchController] = None
+        if adaptive_min_depth is not None:
+            self.controller = PrefetchController(min_depth=adaptive_min_depth, max_depth=prefetch_depth)
 
         self.client = client
         self.site_id = site_id
@@ -127,14 +194,19 @@ class FixedDepthJobSource(Process):
 
         assert self.session is not None
 
-        while not sig_handler.wait_until_exit(timeout=1):
+        while not sig_handler.wait_until_exit(timeout=self._poll_period()):
             qsize = self.queue.qsize()
-            fetch_count = max(0, self.prefetch_depth - qsize)
+            depth = self._target_depth(qsize)
+            fetch_count = max(0, depth - qsize)
             fetch_count = min(fetch_count, MAX_JOBS_PER_SESSION_ACQUIRE)
             logger.debug(f"JobSource queue depth is currently {qsize}. Fetching {fetch_count} more")
+            jobs = []
             if fetch_count:
                 params = self._get_acquire_parameters(fetch_count)
+                acquire_start = time.time()
                 jobs = self.session.acquire_jobs(**params)
+                if self.controller is not None:
+                    self.controller.observe_acquire(time.time() - acquire_start)
                 if jobs:
                     logger.debug(
                         f"Acquired from session {self.session.id} (batch_job_id {self.session.batch_job_id})"
@@ -142,18 +214,31 @@ class FixedDepthJobSource(Process):
                     logger.info(f"JobSource acquired {len(jobs)} jobs:")
                 for job in jobs:
                     self.queue.put_nowait(job)
+            if self.controller is not None:
+                self.controller.queue_filled(qsize + len(jobs), time.time())
         logger.info("Signal: JobSource cancelling tick thread and deleting API Session")
         self.queue.cancel_join_thread()
         self.session.delete()
         logger.info("JobSource exit graceful")
 
+    def _poll_period(self) -> float:
+        return 1.0 if self.controller is None else self.controller.poll_period
+
+    def _remaining_wall_time_min(self) -> Optional[float]:
+        if not self.max_wall_time_min:
+            return None
+        elapsed_min = (time.time() - self.start_time) / 60.0
+        return self.max_wall_time_min - elapsed_min
+
+    def _target_depth(self, qsize: int) -> int:
+        if self.controller is None:
+            return self.prefetch_depth
+        self.controller.observe_queue(qsize, time.time())
+        remaining_min = self._remaining_wall_time_min()
+        return self.controller.target_depth(None if remaining_min is None else 60.0 * remaining_min)
+
     def _get_acquire_parameters(self, num_jobs: int) -> Dict[str, Any]:
-        request_time: Optional[float]
-        if self.max_wall_time_min:
-            elapsed_min = (time.time() - self.start_time) / 60.0
-            request_time = self.max_wall_time_min - elapsed_min
-        else:
-            request_time = None
+        request_time = self._remaining_wall_time_min()
         return dict(
             max_num_jobs=num_jobs,
             max_nodes_per_job=self.max_nodes_per_job,
@@ -220,6 +305,8 @@ class SynchronousJobSource(object):
         self, max_num_jobs: int, max_nodes_per_job: Optional[int] = None, max_aggregate_nodes: Optional[float] = None
     ) -> List["Job"]:
         max_num_jobs = min(max_num_jobs, MAX_JOBS_PER_SESSION_ACQUIRE)
+        if max_num_jobs < 1 or (max_aggregate_nodes is not None and max_aggregate_nodes < 0.01):
+            return []
 
         request_time: Optional[int]
         if self.max_wall_time_min:
@@ -244,3 +331,124 @@ class SynchronousJobSource(object):
             for job in jobs:
                 logger.debug(f"Acquired id {job.id}: batch_job_id {job.batch_job_id}")
         return jobs
+
+
+class AsyncJobSource(SynchronousJobSource):
+    """
+    Acquires Jobs in a background thread, so that the launcher loop never
+    blocks on the API.  Each `get_jobs` call hands out acquired Jobs that fit
+    the launcher's free capacity, and records that capacity as a snapshot;
+    the thread then tops up a look-ahead pool to fill the snapshot.
+
+    Like the SynchronousJobSource, the pool never holds more than the
+    launcher could start right away: Jobs that no longer fit the latest
+    snapshot are released back to the server, so that other launchers at
+    the Site can run them.
+
+    If `wakeup_fd` is set, a byte is written to it whenever new Jobs enter
+    the pool, so an event-driven launcher loop need not poll for them.
+    """
+
+    def __init__(self, *args: Any, poll_period: float = 1.0, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.poll_period = poll_period
+        self.wakeup_fd: Optional[int] = None
+        self._pool: List["Job"] = []
+        self._to_release: List["Job"] = []
+        self._capacity: Tuple[int, Optional[int], Optional[float]] = (0, None, 0.0)
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="job-source")
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def terminate(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout=self.poll_period + 10)
+        super().terminate()
+
+    @staticmethod
+    def _footprint(job: "Job") -> float:
+        return job.num_nodes / job.node_packing_count
+
+    def _split(
+        self,
+        jobs: List["Job"],
+        max_num_jobs: int,
+        max_nodes_per_job: Optional[int],
+        max_aggregate_nodes: Optional[float],
+    ) -> Tuple[List["Job"], List["Job"]]:
+        """Split `jobs` into those that fit together in the given capacity, and the rest"""
+        fits, rest = [], []
+        aggregate = 0.0
+        for job in jobs:
+            if (
+                len(fits) < max_num_jobs
+                and (max_nodes_per_job is None or job.num_nodes <= max_nodes_per_job)
+                and (max_aggregate_nodes is None or aggregate + self._footprint(job) <= max_aggregate_nodes + 1e-6)
+            ):
+                fits.append(job)
+                aggregate += self._footprint(job)
+            else:
+                rest.append(job)
+        return fits, rest
+
+    def get_jobs(
+        self, max_num_jobs: int, max_nodes_per_job: Optional[int] = None, max_aggregate_nodes: Optional[float] = None
+    ) -> List["Job"]:
+        with self._cond:
+            taken, self._pool = self._split(self._pool, max_num_jobs, max_nodes_per_job, max_aggregate_nodes)
+            # The look-ahead pool is sized to the capacity left after launching `taken`
+            remaining_num = max_num_jobs - len(taken)
+            remaining_nodes = None
+            if max_aggregate_nodes is not None:
+                remaining_nodes = max(0.0, max_aggregate_nodes - sum(self._footprint(job) for job in taken))
+            self._capacity = (remaining_num, max_nodes_per_job, remaining_nodes)
+            self._pool, excess = self._split(self._pool, *self._capacity)
+            self._to_release.extend(excess)
+            self._cond.notify()
+        for job in taken:
+            job.objects = self.client.Job.objects
+        return taken
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=self.poll_period)
+                if self._stopping:
+                    return
+                to_release, self._to_release = self._to_release, []
+                max_num_jobs, max_nodes_per_job, max_aggregate_nodes = self._capacity
+                fetch_count = min(max_num_jobs - len(self._pool), MAX_JOBS_PER_SESSION_ACQUIRE)
+                if max_aggregate_nodes is not None:
+                    max_aggregate_nodes -= sum(self._footprint(job) for job in self._pool)
+            if to_release:
+                try:
+                    logger.info(f"JobSource releasing {len(to_release)} jobs that no longer fit")
+                    self.session.release_jobs([job.id for job in to_release if job.id is not None])
+                except Exception as exc:
+                    logger.exception(f"JobSource failed to release jobs; retrying later: {exc}")
+                    with self._cond:
+                        self._to_release = to_release + self._to_release
+            try:
+                if fetch_count > 0 and (max_aggregate_nodes is None or max_aggregate_nodes >= 0.01):
+                    jobs = super().get_jobs(fetch_count, max_nodes_per_job, max_aggregate_nodes)
+                    with self._cond:
+                        # The capacity may have shrunk while the request was in flight
+                        self._pool, excess = self._split(self._pool + jobs, *self._capacity)
+                        self._to_release.extend(excess)
+                    if len(excess) < len(jobs):
+                        self._wake_launcher()
+            except Exception as exc:
+                logger.exception(f"JobSource failed to acquire jobs: {exc}")
+
+    def _wake_launcher(self) -> None:
+        if self.wakeup_fd is None:
+            return
+        try:
+            os.write(self.wakeup_fd, b"\0")
+        except OSError:
+            pass  # The pipe is full (a wakeup is already pending) or was closed
@@ -1,9 +1,13 @@
 import json
 import logging
+import os
+import select
+import signal
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Type, Union
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Type, Union
 
 import click
 
@@ -11,9 +15,10 @@ from balsam._api.app import ApplicationDefinition
 from balsam.config import SiteConfig
 from balsam.platform import TimeoutExpired
 from balsam.schemas import DeserializeError, JobState
-from balsam.site import BulkStatusUpdater, SynchronousJobSource
+from balsam.site import AsyncJobSource, BulkStatusUpdater, SynchronousJobSource
+from balsam.site.launcher.backfill import EasyBackfill, expected_end, node_footprint
 from balsam.site.launcher.node_manager import InsufficientResources, NodeManager
-from balsam.site.launcher.util import countdown_timer_min
+from balsam.site.launcher.util import prefetch_blobs
 from balsam.util import SigHandler
 
 logger = logging.getLogger("balsam.site.launcher.mpi_mode")
@@ -24,6 +29,17 @@ if TYPE_CHECKING:
 
 
 class Launcher:
+    """
+    Launches MPI runs on the allocation's nodes.  Between iterations the main
+    loop sleeps until a child process exits, polling the job source every
+    `delay_sec` only while there are free resources to fill.  An
+    AsyncJobSource wakes the loop itself when it acquires Jobs, so it is
+    never polled.
+    """
+
+    # Longest sleep between iterations when no child exits
+    MAX_WAIT_SEC = 60.0
+
     def __init__(
         self,
         data_dir: Path,
@@ -36,6 +52,8 @@ class Launcher:
         delay_sec: int,
         error_tail_num_lines: int,
         max_concurrent_runs: int,
+        easy_backfill: bool = False,
+        spawn_threads: int = 1,
     ) -> None:
         self.data_dir = data_dir
         self.idle_ttl_sec = idle_ttl_sec
@@ -44,7 +62,8 @@ class Launcher:
         self.node_manager = node_manager
         self.job_source = job_source
         self.status_updater = status_updater
-        self.timer = countdown_timer_min(max(1, wall_time_min - 2), delay_sec)
+        self.delay_sec = delay_sec
+        self.end_time = time.time() + 60.0 * max(1, wall_time_min - 2)
 
         self.status_updater.start()
         self.job_source.start()
@@ -52,18 +71,90 @@ class Launcher:
         self.job_stash: "List[Job]" = []
         self.idle_time: Optional[float] = None
         self.max_concurrent_runs = max_concurrent_runs
+        self.easy_backfill = easy_backfill
+        # Expected end time and node footprint of each active run
+        self.run_ends: Dict[int, Tuple[float, float]] = {}
+        self._spawn_pool: Optional[ThreadPoolExecutor] = None
+        if spawn_threads > 1 and app_run.concurrent_start:
+            self._spawn_pool = ThreadPoolExecutor(max_workers=spawn_threads, thread_name_prefix="spawn")
 
         self.sig_handler = SigHandler()
+        # SIGCHLD handler and wakeup fd in place before _install_wakeup_fd, restored on exit
+        self._prev_sigchld_handler: Any = signal.SIG_DFL
+        self._prev_wakeup_fd = -1
+        self._wakeup_pipe: Optional[Tuple[int, int]] = self._install_wakeup_fd()
+        self._wakeup_fd: Optional[int] = self._wakeup_pipe[0] if self._wakeup_pipe else None
+        # An AsyncJobSource wakes the loop when it acquires Jobs, so free resources need no
+        # polling once the source has been given a capacity snapshot to fill
+        self._job_source_wakes = False
+        self._capacity_reported = False
+        if self._wakeup_pipe is not None and isinstance(self.job_source, AsyncJobSource):
+            self.job_source.wakeup_fd = self._wakeup_pipe[1]
+            self._job_source_wakes = True
 
-    def time_step(self) -> None:
+    def _install_wakeup_fd(self) -> Optional[Tuple[int, int]]:
+        """
+        Wake the main loop as soon as a run exits or the launcher is signalled:
+        the interpreter writes each caught signal to a pipe that `time_step`
+        selects on.  Returns the (read, write) ends of the pipe.
+        """
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        os.set_blocking(write_fd, False)
         try:
-            min_left = next(self.timer)
-        except StopIteration:
+            self._prev_sigchld_handler = signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+            self._prev_wakeup_fd = signal.set_wakeup_fd(write_fd, warn_on_full_buffer=False)
+        except ValueError:
+            logger.warning(f"Cannot handle SIGCHLD outside the main thread: polling runs every {self.delay_sec} sec")
+            os.close(read_fd)
+            os.close(write_fd)
+            return None
+        return read_fd, write_fd
+
+    def _uninstall_wakeup_fd(self) -> None:
+        """Restore the previous SIGCHLD handler and wakeup fd, and close the pipe"""
+        if self._wakeup_pipe is None:
+            return
+        if self._job_source_wakes:
+            self.job_source.wakeup_fd = None  # type: ignore
+            self._job_source_wakes = False
+        signal.set_wakeup_fd(self._prev_wakeup_fd)
+        # None means the previous handler was not installed from Python
+        signal.signal(signal.SIGCHLD, self._prev_sigchld_handler or signal.SIG_DFL)
+        for fd in self._wakeup_pipe:
+            os.close(fd)
+        self._wakeup_pipe = None
+        self._wakeup_fd = None
+
+    def _wait(self, timeout: float) -> None:
+        if self._wakeup_fd is None:
+            time.sleep(timeout)
+            return
+        readable, _, _ = select.select([self._wakeup_fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self._wakeup_fd, 512):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def _has_free_resources(self) -> bool:
+        return len(self.active_runs) < self.max_concurrent_runs and self.node_manager.aggregate_free_nodes() >= 0.01
+
+    def time_step(self) -> None:
+        sec_left = self.end_time - time.time()
+        if sec_left <= 0:
             self.sig_handler.set()
             return
 
-        m, s = map(int, divmod(min_left * 60, 60))
+        m, s = map(int, divmod(sec_left, 60))
         logger.debug(f"{m:02d}m:{s:02d}s remaining")
+        # Sleep until a run exits (or the job source acquires Jobs) unless free resources need polling
+        source_wakes = self._job_source_wakes and self._capacity_reported
+        if self._wakeup_fd is not None and (source_wakes or not self._has_free_resources()):
+            self._wait(min(sec_left, self.MAX_WAIT_SEC))
+        else:
+            self._wait(min(sec_left, self.delay_sec))
 
     def check_exit(self) -> None:
         if not self.active_runs:
@@ -82,7 +173,7 @@ class Launcher:
 
         preamble = app.shell_preamble()
         app_command = app.get_arg_str()
-        environ_vars = app.get_environ_vars()
+        environ_vars = app.get_environ_delta()
 
         # assign workers
         node_spec = self.node_manager.assign(job)
@@ -108,15 +199,16 @@ class Launcher:
         max_num_to_acquire = max(0, self.max_concurrent_runs - len(self.active_runs))
         if not self.node_manager.allow_node_packing:
             max_num_to_acquire = min(max_num_to_acquire, int(max_aggregate_nodes))
-        if max_aggregate_nodes < 0.01:
-            return []
 
+        # Called even without free capacity, so an AsyncJobSource sees the current snapshot
         acquired = self.job_source.get_jobs(
             max_num_jobs=max_num_to_acquire,
             max_nodes_per_job=max_nodes_per_job,
             max_aggregate_nodes=max_aggregate_nodes,
         )
+        self._capacity_reported = True
         if acquired:
+            prefetch_blobs(acquired)
             logger.info(
                 f"Job Acquisition: {max_nodes_per_job} empty nodes; {max_aggregate_nodes} aggregate free nodes; "
                 f"requested up to {max_num_to_acquire} jobs [node packing allowed: {self.node_manager.allow_node_packing}]; "
@@ -124,12 +216,85 @@ class Launcher:
             )
         return acquired
 
-    def launch_runs(self) -> None:
+    def _pending_jobs(self) -> List["Job"]:
         acquired = self.acquire_jobs()
-        acquired.extend(self.job_stash)
+        if self.easy_backfill:
+            # Stashed Jobs are retried first-come-first-served
+            pending = self.job_stash + acquired
+        else:
+            pending = acquired + self.job_stash
         self.job_stash = []
-        for job in acquired:
+        return pending
+
+    def _reserve(self, backfill: EasyBackfill, job: "Job") -> None:
+        if job.num_nodes > 1:
+            # Multi-node Jobs need whole empty nodes, which packed runs only free together
+            free_nodes = float(self.node_manager.count_empty_nodes())
+            job_ends = {id: end_time for id, (end_time, _) in self.run_ends.items()}
+            running = [(end_time, 1.0) for end_time in self.node_manager.node_release_times(job_ends)]
+        else:
+            free_nodes = self.node_manager.aggregate_free_nodes()
+            running = list(self.run_ends.values())
+        backfill.reserve(job, free_nodes, running, now=time.time())
+
+    def start_runs(self, prepared: List[Tuple["Job", "AppRun"]]) -> None:
+        """
+        Spawn a wave of prepared runs (in parallel, when the AppRun allows it)
+        and report them RUNNING in a single status update.  A run that fails
+        to start is reported RUN_ERROR and its nodes are freed; the others in
+        the wave are still registered.
+        """
+        errors: Dict[int, BaseException] = {}
+        if self._spawn_pool is not None and len(prepared) > 1:
+            futures = [(job, self._spawn_pool.submit(run.start)) for job, run in prepared]
+            for job, future in futures:
+                exc = future.exception()
+                if exc is not None:
+                    assert job.id is not None
+                    errors[job.id] = exc
+        else:
+            for job, run in prepared:
+                assert job.id is not None
+                try:
+                    run.start()
+                except Exception as exc:
+                    errors[job.id] = exc
+
+        now = datetime.utcnow()
+        started = [(job, run) for job, run in prepared if job.id not in errors]
+        self.status_updater.put_many(
+            [
+                {
+                    "id": job.id,
+                    "state": JobState.running,
+                    "state_timestamp": now,
+                    "state_data": {"num_nodes": float(job.num_nodes) / job.node_packing_count},
+                }
+                for job, _ in started
+            ]
+        )
+        for job, run in started:
+            assert job.id is not None
+            self.active_runs[job.id] = run
+        for id, exc in errors.items():
+            logger.error(f"Failed to start run for Job {id}: {exc!r}")
+            self.status_updater.put(
+                id,
+                state=JobState.run_error,
+                state_timestamp=now,
+                state_data={"message": "An exception occured while starting the run", "error": str(exc)},
+            )
+            self.node_manager.free(id)
+            self.run_ends.pop(id, None)
+
+    def launch_runs(self) -> None:
+        backfill = EasyBackfill(self.end_time) if self.easy_backfill else None
+        prepared: List[Tuple["Job", "AppRun"]] = []
+        for job in self._pending_jobs():
             assert job.id is not None
+            if backfill is not None and backfill.head is not None and not backfill.allows(job, time.time()):
+                self.job_stash.append(job)
+                continue
             try:
                 run = self.create_run(job)
             except DeserializeError as exc:
@@ -159,15 +324,15 @@ class Launcher:
                     f"Insufficient resources to place Job {job.id} {job.workdir}. Stashing for later launch."
                 )
                 self.job_stash.append(job)
+                if backfill is not None and backfill.head is None:
+                    self._reserve(backfill, job)
             else:
-                run.start()
-                self.status_updater.put(
-                    job.id,
-                    state=JobState.running,
-                    state_timestamp=datetime.utcnow(),
-                    state_data={"num_nodes": float(job.num_nodes) / job.node_packing_count},
-                )
-                self.active_runs[job.id] = run
+                if backfill is not None:
+                    backfill.commit(job, time.time())
+                prepared.append((job, run))
+                self.run_ends[job.id] = (expected_end(job, time.time(), self.end_time), node_footprint(job))
+        if prepared:
+            self.start_runs(prepared)
 
     def check_run(self, run: "AppRun") -> Dict[str, Any]:
         retcode = run.poll()
@@ -208,6 +373,8 @@ class Launcher:
             else:
                 self.status_updater.put(id, **status)
                 self.node_manager.free(id)
+        for id in self.active_runs.keys() - remaining_runs.keys():
+            self.run_ends.pop(id, None)
         if timeout:
             self.timeout_kill(remaining_runs.values())
             self.active_runs = {}
@@ -218,8 +385,8 @@ class Launcher:
         try:
             while not self.sig_handler.is_set():
                 self.time_step()
-                self.launch_runs()
                 self.update_states()
+                self.launch_runs()
                 self.check_exit()
         except:  # noqa
             raise
@@ -231,6 +398,9 @@ class Launcher:
             self.status_updater.terminate()
             self.job_source.join()
             self.status_updater.join()
+            if self._spawn_pool is not None:
+                self._spawn_pool.shutdown()
+            self._uninstall_wakeup_fd()
 
     def timeout_runs(self) -> None:
         for run in self.active_runs.values():
@@ -261,6 +431,7 @@ def main(
     node_manager = NodeManager(nodes, allow_node_packing=launch_settings.mpirun_allows_node_packing)
 
     ApplicationDefinition._set_client(site_config.client)
+    ApplicationDefinition._set_payload_dir(site_config.app_payload_path, site_config.data_path)
     try:
         ApplicationDefinition.load_by_site(site_config.site_id)  # Warms the cache
     except DeserializeError as exc:
@@ -272,7 +443,8 @@ def main(
 
     scheduler_id = node_cls.get_scheduler_id()
 
-    job_source = SynchronousJobSource(
+    job_source_cls = AsyncJobSource if launch_settings.mpirun_async_job_source else SynchronousJobSource
+    job_source = job_source_cls(
         client=site_config.client,
         site_id=site_config.site_id,
         filter_tags=filter_tags_dict,
@@ -280,7 +452,10 @@ def main(
         max_wall_time_min=wall_time_min,
         scheduler_id=scheduler_id,
     )
-    status_updater = BulkStatusUpdater(site_config.client)
+    status_updater = BulkStatusUpdater(
+        site_config.client,
+        wal_dir=site_config.log_path if launch_settings.status_update_wal else None,
+    )
 
     launcher = Launcher(
         data_dir=site_config.data_path,
@@ -293,5 +468,7 @@ def main(
         wall_time_min=wall_time_min,
         error_tail_num_lines=launch_settings.error_tail_num_lines,
         max_concurrent_runs=launch_settings.max_concurrent_mpiruns,
+        easy_backfill=launch_settings.mpirun_easy_backfill,
+        spawn_threads=launch_settings.mpirun_spawn_threads,
     )
     launcher.run()
@@ -1,5 +1,8 @@
 import json
 import logging
+import queue
+import sys
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
@@ -7,11 +10,11 @@ from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
 
 import zmq
 
-from balsam._api.app import ApplicationDefinition
+from balsam._api.app import ApplicationDefinition, AppType
 from balsam.config import SiteConfig
 from balsam.schemas import DeserializeError, JobState
 from balsam.site import BulkStatusUpdater, FixedDepthJobSource
-from balsam.site.launcher.util import countdown_timer_min
+from balsam.site.launcher.util import prefetch_blobs
 from balsam.util import SigHandler
 
 if TYPE_CHECKING:
@@ -22,6 +25,24 @@ logger = logging.getLogger(__name__)
 
 
 class Master:
+    """
+    Hands out Jobs to the serial mode Workers over a ZMQ ROUTER socket.
+
+    Workers (DEALER sockets) send messages without waiting for replies: each
+    reports the Jobs that started, finished or failed since the last message,
+    and may ask for `request_num_jobs` *more* Jobs.  The master adds these
+    to each Worker's outstanding demand and pushes Jobs as they become
+    available, so no Worker waits on a round trip or on the other Workers.
+
+    Job specs are prepared (App loading, command rendering, payload writes) by
+    a background thread that keeps enough specs ready for the outstanding
+    demand (at least `num_workers`), so the socket loop only moves messages.
+    """
+
+    POLL_PERIOD_MS = 100
+    READY_ADDR = "inproc://serial-mode-ready"
+    EXIT_TIMEOUT_SEC = 60.0
+
     def __init__(
         self,
         job_source: FixedDepthJobSource,
@@ -31,11 +52,12 @@ class Master:
         data_dir: Path,
         idle_ttl_sec: int,
         num_workers: int,
+        pyfunc_pool: bool = False,
     ) -> None:
         self.job_source = job_source
         self.status_updater = status_updater
         self.data_dir = data_dir
-        self.remaining_timer = countdown_timer_min(wall_time_min, delay_sec=0)
+        self.end_time = time.time() + 60.0 * wall_time_min
         self.idle_ttl_sec = idle_ttl_sec
         self.idle_time: Optional[float] = None
         self.active_ids: Set[int] = set()
@@ -43,8 +65,16 @@ class Master:
         self.occupancies: Dict[int, float] = {}
         self.num_workers = num_workers
         self.master_port = master_port
-
-        next(self.remaining_timer)
+        self.pyfunc_pool = pyfunc_pool
+        # Jobs requested but not yet sent, by Worker identity
+        self.demand: Dict[bytes, int] = {}
+        self.total_demand = 0
+        # Prepared Job specs, filled by the prep thread and drained by dispatch
+        self.ready: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self.prep_depth = max(1, num_workers)
+        self.prep_stop = threading.Event()
+        self.prep_wakeup = threading.Event()
+        self.prep_thread = threading.Thread(target=self.prepare_jobs, name="serial-mode-prep", daemon=True)
 
         self.sig_handler = SigHandler()
         self.status_updater.start()
@@ -58,11 +88,11 @@ class Master:
 
         preamble = app.shell_preamble()
         app_command = app.get_arg_str()
-        environ_vars = app.get_environ_vars()
+        environ_vars = app.get_environ_delta()
         occ = 1.0 / job.node_packing_count
         assert job.id is not None
         self.occupancies[job.id] = occ
-        return dict(
+        job_dict = dict(
             id=job.id,
             cwd=workdir,
             cmdline=app_command,
@@ -73,27 +103,57 @@ class Master:
             threads_per_core=job.threads_per_core,
             gpus_per_rank=job.gpus_per_rank,
         )
+        # The fork server runs Apps in the launcher's interpreter, without a shell to source a preamble.
+        # It deserializes the App from the payload file that get_arg_str wrote, instead of fetching it.
+        if (
+            self.pyfunc_pool
+            and app._app_type == AppType.PY_FUNC
+            and app.python_exe == sys.executable
+            and not preamble
+            and app._payload_dir is not None
+        ):
+            assert job._read_model is not None
+            assert app._serialized_class is not None
+            job_dict["pyfunc"] = {
+                "app_id": job.app_id,
+                "app_path": str(app._write_app_payload(app._serialized_class)),
+                "job_json": job._read_model.json(),
+            }
+        return job_dict
 
     def update_job_states(
         self, done_ids: List[int], error_logs: List[Tuple[int, int, str]], started_ids: List[int]
     ) -> None:
         now = datetime.utcnow()
+        updates: List[Dict[str, Any]] = []
 
         for id in done_ids:
-            self.status_updater.put(id, JobState.run_done, state_timestamp=now)
+            updates.append({"id": id, "state": JobState.run_done, "state_timestamp": now})
 
         for id, retcode, tail in error_logs:
-            self.status_updater.put(
-                id, JobState.run_error, state_timestamp=now, state_data={"returncode": retcode, "error": tail}
+            updates.append(
+                {
+                    "id": id,
+                    "state": JobState.run_error,
+                    "state_timestamp": now,
+                    "state_data": {"returncode": retcode, "error": tail},
+                }
             )
 
         for id in started_ids:
-            self.status_updater.put(
-                id, JobState.running, state_timestamp=now, state_data={"num_nodes": self.occupancies.pop(id, 1.0)}
+            updates.append(
+                {
+                    "id": id,
+                    "state": JobState.running,
+                    "state_timestamp": now,
+                    "state_data": {"num_nodes": self.occupancies.pop(id, 1.0)},
+                }
             )
+        self.status_updater.put_many(updates)
 
     def acquire_jobs(self, max_jobs: int) -> List[Dict[str, Any]]:
         next_jobs = self.job_source.get_jobs(max_jobs)
+        prefetch_blobs(next_jobs)
         new_job_specs = []
         for job in next_jobs:
             assert job.id is not None
@@ -114,12 +174,35 @@ class Master:
                 new_job_specs.append(spec)
         return new_job_specs
 
-    def handle_request(self) -> None:
-        msg = self.socket.recv_json()
+    def prepare_jobs(self) -> None:
+        """Prep thread: keep Job specs ready for the outstanding demand"""
+        signal = self.context.socket(zmq.PUSH)
+        signal.connect(self.READY_ADDR)
+        try:
+            while not self.prep_stop.is_set():
+                num_free = max(self.prep_depth, self.total_demand) - self.ready.qsize()
+                new_job_specs = self.acquire_jobs(num_free) if num_free > 0 else []
+                if not new_job_specs:
+                    # Woken early by new demand, by dispatch taking specs, or by shutdown
+                    self.prep_wakeup.wait(self.POLL_PERIOD_MS / 1000)
+                    self.prep_wakeup.clear()
+                    continue
+                for spec in new_job_specs:
+                    self.ready.put(spec)
+                try:
+                    signal.send(b"", zmq.NOBLOCK)
+                except zmq.Again:
+                    pass
+        except Exception:
+            logger.exception("Job preparation thread failed: aborting")
+            self.sig_handler.set()
+        finally:
+            signal.close(linger=0)
 
-        done_ids: List[int] = msg["done"]  # type: ignore
-        error_logs: List[Tuple[int, int, str]] = msg["error"]  # type: ignore
-        started_ids: List[int] = msg["started"]  # type: ignore
+    def handle_message(self, identity: bytes, msg: Dict[str, Any]) -> None:
+        done_ids: List[int] = msg["done"]
+        error_logs: List[Tuple[int, int, str]] = msg["error"]
+        started_ids: List[int] = msg["started"]
         self.update_job_states(done_ids, error_logs, started_ids)
 
         finished_ids = set(done_ids) | set(log[0] for log in error_logs)
@@ -127,15 +210,48 @@ class Master:
         self.active_ids -= finished_ids
         self.num_outstanding_jobs -= len(finished_ids)
 
-        src = msg["source"]  # type: ignore
-        max_jobs: int = msg["request_num_jobs"]  # type: ignore
-        logger.debug(f"Worker {src} requested {max_jobs} jobs")
-        new_job_specs = self.acquire_jobs(max_jobs)
+        max_jobs: int = msg["request_num_jobs"]
+        if max_jobs:
+            logger.debug(f"Worker {msg['source']} requested {max_jobs} more jobs")
+        self.demand[identity] = self.demand.get(identity, 0) + max_jobs
+        self.total_demand += max_jobs
+        if max_jobs:
+            self.prep_wakeup.set()
+
+    def receive_messages(self) -> None:
+        """Handle every message that has arrived, without blocking"""
+        while True:
+            try:
+                identity, frame = self.socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            self.handle_message(identity, json.loads(frame))
 
-        self.socket.send_json({"new_jobs": new_job_specs})
-        self.num_outstanding_jobs += len(new_job_specs)
-        if new_job_specs:
-            logger.debug(f"Sent {len(new_job_specs)} new jobs to {src}")
+    def receive_ready_signals(self) -> None:
+        while True:
+            try:
+                self.ready_signal.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+
+    def dispatch(self) -> None:
+        """Send prepared Jobs to the Workers with outstanding demand, round-robin"""
+        for identity in [identity for identity, num in self.demand.items() if num > 0]:
+            new_job_specs: List[Dict[str, Any]] = []
+            while len(new_job_specs) < self.demand[identity]:
+                try:
+                    new_job_specs.append(self.ready.get_nowait())
+                except queue.Empty:
+                    break
+            if not new_job_specs:
+                return
+            self.socket.send_multipart([identity, json.dumps({"new_jobs": new_job_specs}).encode()])
+            self.num_outstanding_jobs += len(new_job_specs)
+            # Served Workers move to the back of the line
+            self.demand[identity] = self.demand.pop(identity) - len(new_job_specs)
+            self.total_demand -= len(new_job_specs)
+            self.prep_wakeup.set()
+            logger.debug(f"Sent {len(new_job_specs)} new jobs to worker")
 
     def idle_check(self) -> None:
         if not self.status_updater.is_alive():
@@ -156,13 +272,21 @@ class Master:
         try:
             self.context = zmq.Context()
             self.context.setsockopt(zmq.LINGER, 0)
-            self.socket = self.context.socket(zmq.REP)
+            self.socket = self.context.socket(zmq.ROUTER)
             self.socket.bind(f"tcp://*:{self.master_port}")
             logger.debug("Master ZMQ socket bound.")
-
-            for remaining_minutes in self.remaining_timer:
-                logger.debug(f"{remaining_minutes} minutes remaining")
-                self.handle_request()
+            self.ready_signal = self.context.socket(zmq.PULL)
+            self.ready_signal.bind(self.READY_ADDR)
+            poller = zmq.Poller()
+            poller.register(self.socket, zmq.POLLIN)
+            poller.register(self.ready_signal, zmq.POLLIN)
+            self.prep_thread.start()
+
+            while time.time() < self.end_time:
+                poller.poll(timeout=self.POLL_PERIOD_MS)
+                self.receive_ready_signals()
+                self.receive_messages()
+                self.dispatch()
                 self.idle_check()
                 if self.sig_handler.is_set():
                     logger.info("Signal: master breaking main loop")
@@ -173,10 +297,17 @@ class Master:
             self.shutdown()
             self.socket.setsockopt(zmq.LINGER, 0)
             self.socket.close(linger=0)
+            self.ready_signal.close(linger=0)
             self.context.term()
             logger.info("shutdown done: ensemble master exit gracefully")
 
     def shutdown(self) -> None:
+        # Stop preparing Jobs before the job source goes away
+        self.prep_stop.set()
+        self.prep_wakeup.set()
+        if self.prep_thread.is_alive():
+            self.prep_thread.join()
+
         now = datetime.utcnow()
         logger.info(f"Timing out {len(self.active_ids)} active runs")
         for id in self.active_ids:
@@ -203,11 +334,27 @@ class Master:
         self.job_source.join()
         logger.info("JobSource has joined.")
         logger.info("Master sending exit message to all Workers")
-        for _ in range(self.num_workers):
-            self.socket.recv_json()
-            self.socket.send_json({"exit": True})
+        self.send_exit()
         logger.info("All workers have received exit message. Quitting.")
 
+    def send_exit(self) -> None:
+        """Tell every Worker to exit, including those that have not sent a message yet"""
+        exit_msg = json.dumps({"exit": True}).encode()
+        exited = set()
+        deadline = time.time() + self.EXIT_TIMEOUT_SEC
+        for identity in self.demand:
+            self.socket.send_multipart([identity, exit_msg])
+            exited.add(identity)
+        while len(exited) < self.num_workers:
+            if time.time() > deadline:
+                logger.warning(f"{self.num_workers - len(exited)} workers never connected; not waiting for them")
+                return
+            if self.socket.poll(timeout=self.POLL_PERIOD_MS):
+                identity, _ = self.socket.recv_multipart()
+                if identity not in exited:
+                    self.socket.send_multipart([identity, exit_msg])
+                    exited.add(identity)
+
 
 def master_main(wall_time_min: int, master_port: int, log_filename: str, num_workers: int, filter_tags: str) -> None:
     site_config = SiteConfig()
@@ -217,6 +364,7 @@ def master_main(wall_time_min: int, master_port: int, log_filename: str, num_wor
     logger.debug("Launching master")
 
     ApplicationDefinition._set_client(site_config.client)
+    ApplicationDefinition._set_payload_dir(site_config.app_payload_path, site_config.data_path)
     try:
         ApplicationDefinition.load_by_site(site_config.site_id)  # Warms the cache
     except DeserializeError as exc:
@@ -239,8 +387,12 @@ def master_main(wall_time_min: int, master_port: int, log_filename: str, num_wor
         serial_only=True,
         sort_by=site_config.settings.launcher.sort_by,
         max_nodes_per_job=1,
+        adaptive_min_depth=num_workers if launch_settings.serial_mode_adaptive_prefetch else None,
+    )
+    status_updater = BulkStatusUpdater(
+        site_config.client,
+        wal_dir=site_config.log_path if launch_settings.status_update_wal else None,
     )
-    status_updater = BulkStatusUpdater(site_config.client)
 
     master = Master(
         job_source=job_source,
@@ -250,5 +402,6 @@ def master_main(wall_time_min: int, master_port: int, log_filename: str, num_wor
         data_dir=site_config.data_path,
         idle_ttl_sec=launch_settings.idle_ttl_sec,
         num_workers=num_workers,
+        pyfunc_pool=launch_settings.serial_mode_pyfunc_pool,
     )
     master.run()
@@ -11,6 +11,7 @@ import zmq
 from balsam.config import SiteConfig
 from balsam.platform import TimeoutExpired
 from balsam.site.launcher.node_manager import InsufficientResources, NodeManager, NodeSpec
+from balsam.site.launcher.pyfunc_pool import PyFuncPool, PyFuncPoolRun
 from balsam.util import SigHandler
 
 if TYPE_CHECKING:
@@ -35,6 +36,7 @@ class Worker:
         error_tail_num_lines: int,
         num_prefetch_jobs: int,
         master_subproc: "Optional[subprocess.Popen[bytes]]",
+        pyfunc_pool: Optional[PyFuncPool] = None,
     ) -> None:
         self.sig_handler = SigHandler()
         self.hostname = socket.gethostname()
@@ -45,6 +47,7 @@ class Worker:
         self.error_tail_num_lines = error_tail_num_lines
         self.num_prefetch_jobs = num_prefetch_jobs
         self.master_subproc = master_subproc
+        self.pyfunc_pool = pyfunc_pool
 
         self.app_runs: Dict[int, "AppRun"] = {}
         self.start_times: Dict[int, float] = {}
@@ -52,10 +55,16 @@ class Worker:
         self.job_specs: Dict[int, Dict[str, Any]] = {}
         self.node_specs: Dict[int, NodeSpec] = {}
         self.runnable_cache: Dict[int, Dict[str, Any]] = {}
+        # Jobs requested from the master but not received yet
+        self.num_requested = 0
+        self.connected = False
 
     def cleanup_proc(self, id: int, timeout: float = 0) -> None:
         self.kill(id, timeout=timeout)
         self.node_manager.free(id)
+        proc = self.app_runs[id]
+        if isinstance(proc, PyFuncPoolRun):
+            proc.release()
         del self.app_runs[id]
         del self.start_times[id]
         del self.retry_counts[id]
@@ -103,15 +112,23 @@ class Worker:
         node_spec = self.node_specs[id]
         job_spec.pop("id")
         job_spec.pop("node_occupancy")
+        pyfunc = job_spec.pop("pyfunc", None)
 
         logger.debug(f"Job {id} WORKER_START")
-        proc = self.app_run(
+        run_kwargs = dict(
             **job_spec,
             node_spec=node_spec,
             ranks_per_node=1,
             launch_params={},
             outfile_path=Path(job_spec["cwd"]).joinpath("job.out"),
         )
+        proc: "AppRun"
+        if pyfunc is not None and self.pyfunc_pool is not None:
+            proc = PyFuncPoolRun(
+                self.pyfunc_pool, pyfunc["app_id"], pyfunc["app_path"], pyfunc["job_json"], **run_kwargs
+            )
+        else:
+            proc = self.app_run(**run_kwargs)
         proc.start()
         self.app_runs[id] = proc
 
@@ -148,6 +165,8 @@ class Worker:
         ids = list(self.app_runs.keys())
         for id in ids:
             self.cleanup_proc(id, timeout=self.CHECK_PERIOD)
+        if self.pyfunc_pool is not None:
+            self.pyfunc_pool.shutdown()
         self.socket.setsockopt(zmq.LINGER, 0)
         self.socket.close(linger=0)
         self.context.term()
@@ -179,26 +198,38 @@ class Worker:
         """Run a cycle of Job dispatch. Returns True if worker should continue; False if time to exit."""
         done_ids, errors = self.poll_processes()
         started_ids = self.start_jobs()
-        request_num_jobs = max(0, self.num_prefetch_jobs - len(self.runnable_cache))
-
-        msg = {
-            "source": self.hostname,
-            "started": started_ids,
-            "done": done_ids,
-            "error": errors,
-            "request_num_jobs": request_num_jobs,
-        }
-        self.socket.send_json(msg)
-        logger.debug("Worker awaiting response...")
-        response_msg = self.socket.recv_json()
-        logger.debug("Worker response received")
-
-        if response_msg.get("exit"):  # type: ignore
-            logger.info(f"Worker {self.hostname} received exit message: break")
-            return False
-
-        if response_msg.get("new_jobs"):  # type: ignore
-            self.runnable_cache.update({job["id"]: job for job in response_msg["new_jobs"]})  # type: ignore
+        request_num_jobs = max(0, self.num_prefetch_jobs - len(self.runnable_cache) - self.num_requested)
+
+        # Messages are not answered in lockstep: the first one registers this
+        # Worker with the master, which then pushes Jobs as they are requested
+        if done_ids or errors or started_ids or request_num_jobs or not self.connected:
+            msg = {
+                "source": self.hostname,
+                "started": started_ids,
+                "done": done_ids,
+                "error": errors,
+                "request_num_jobs": request_num_jobs,
+            }
+            self.socket.send_json(msg)
+            self.num_requested += request_num_jobs
+            self.connected = True
+        return self.receive(timeout_sec=self.delay_sec)
+
+    def receive(self, timeout_sec: float) -> bool:
+        """Handle messages from the master, waiting up to `timeout_sec` for the first one"""
+        if not self.socket.poll(timeout=int(1000 * timeout_sec)):
+            return True
+        while True:
+            try:
+                response_msg = self.socket.recv_json(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            if response_msg.get("exit"):  # type: ignore
+                logger.info(f"Worker {self.hostname} received exit message: break")
+                return False
+            new_jobs = response_msg.get("new_jobs", [])  # type: ignore
+            self.runnable_cache.update({job["id"]: job for job in new_jobs})
+            self.num_requested -= len(new_jobs)
 
         logger.debug(
             f"{self.hostname} fraction available: {self.node_manager.aggregate_free_nodes()} "
@@ -210,14 +241,14 @@ class Worker:
     def run(self) -> None:
         self.context = zmq.Context()
         self.context.setsockopt(zmq.LINGER, 0)
-        self.socket = self.context.socket(zmq.REQ)
+        self.socket = self.context.socket(zmq.DEALER)
         self.socket.connect(self.master_address)
         logger.debug(f"Worker connected to {self.master_address}")
 
         # Run the Worker loop until master sends "exit" message. Does not quit on SIGTERM.
+        # Each cycle waits up to `delay_sec` for the master, waking early when Jobs arrive.
         while self.cycle():
             # If SIGTERM has been received, pass onto master and keep waiting for "exit"
-            time.sleep(self.delay_sec)
             if self.sig_handler.is_set() and self.master_subproc is not None:
                 self.master_subproc.terminate()
                 logger.info("Signal: forwarded SIGTERM to master subprocess.")
@@ -250,6 +281,13 @@ def worker_main(
     logger.debug(f"node.hostname={node_cls.get_job_nodelist()[0].hostname} and hostname={hostname}")
     nodes = [node for node in node_cls.get_job_nodelist() if node.hostname.split(".")[0] == hostname]
     node_manager = NodeManager(nodes, allow_node_packing=True)
+
+    pyfunc_pool = None
+    if launch_settings.serial_mode_pyfunc_pool:
+        # Fork the server before the Worker starts any threads
+        pyfunc_pool = PyFuncPool(site_config.client)
+        pyfunc_pool.start()
+
     worker = Worker(
         app_run=launch_settings.local_app_launcher,
         node_manager=node_manager,
@@ -259,6 +297,7 @@ def worker_main(
         error_tail_num_lines=launch_settings.error_tail_num_lines,
         num_prefetch_jobs=launch_settings.serial_mode_prefetch_per_rank,
         master_subproc=master_proc,
+        pyfunc_pool=pyfunc_pool,
     )
 
     try:
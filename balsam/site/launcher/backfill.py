@@ -0,0 +1,77 @@
+from logging import getLogger
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from balsam._api.models import Job
+
+logger = getLogger(__name__)
+
+
+def node_footprint(job: "Job") -> float:
+    """Nodes (or fraction of a node) occupied by the Job"""
+    if job.num_nodes > 1:
+        return float(job.num_nodes)
+    return 1.0 / job.node_packing_count
+
+
+def expected_end(job: "Job", start_time: float, batch_end_time: float) -> float:
+    """When the Job should finish, judging by its `wall_time_min` estimate"""
+    if not job.wall_time_min:
+        return batch_end_time
+    return min(batch_end_time, start_time + 60.0 * job.wall_time_min)
+
+
+class EasyBackfill:
+    """
+    EASY backfill over one pass of the launcher's pending Jobs.
+
+    The first Job that does not fit (the head) gets a reservation at the
+    "shadow time": the earliest time that enough nodes will be free for it,
+    judging by the expected end times of the running Jobs.  Later Jobs are
+    only started if they will finish before the shadow time, or if they fit
+    in the nodes left over once the head Job starts, so that they never
+    delay it.  Jobs without a `wall_time_min` are assumed to run until the
+    end of the batch job; if the head could not start before then, no
+    reservation is made.
+    """
+
+    def __init__(self, batch_end_time: float) -> None:
+        self.batch_end_time = batch_end_time
+        self.head: Optional["Job"] = None
+        self.shadow_time: Optional[float] = None
+        self.extra_nodes = 0.0
+
+    def reserve(self, head: "Job", free_nodes: float, running: List[Tuple[float, float]], now: float) -> None:
+        """
+        Reserve nodes for the `head` Job, given the currently free nodes and
+        the `(expected_end, nodes)` of each running Job.
+        """
+        self.head = head
+        need = node_footprint(head)
+        for end_time, nodes in sorted(running):
+            if end_time >= self.batch_end_time:
+                break
+            free_nodes += nodes
+            if free_nodes >= need:
+                self.shadow_time = max(now, end_time)
+                self.extra_nodes = free_nodes - need
+                logger.debug(
+                    f"Reserved {need} nodes for Job {head.id} in {self.shadow_time - now:.0f} sec; "
+                    f"{self.extra_nodes} extra nodes for backfill"
+                )
+                return
+        logger.debug(f"Job {head.id} cannot start before the batch job ends: no reservation")
+
+    def _outlasts_shadow(self, job: "Job", now: float) -> bool:
+        return self.shadow_time is not None and expected_end(job, now, self.batch_end_time) > self.shadow_time
+
+    def allows(self, job: "Job", now: float) -> bool:
+        """True if starting `job` now cannot delay the head Job"""
+        if not self._outlasts_shadow(job, now):
+            return True
+        return node_footprint(job) <= self.extra_nodes
+
+    def commit(self, job: "Job", now: float) -> None:
+        """Record that `job` was placed: if it outlasts the shadow time, it uses up extra nodes"""
+        if self._outlasts_shadow(job, now):
+            self.extra_nodes -= node_footprint(job)
@@ -1,5 +1,6 @@
+from itertools import islice
 from logging import getLogger
-from typing import TYPE_CHECKING, Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 
 from pydantic import BaseModel, validator
 
@@ -44,18 +45,87 @@ class NodeSpec(BaseModel):
         return v
 
 
+# Free occupancy, idle CPU count, idle GPU count
+CapacityKey = Tuple[float, int, int]
+
+
 class NodeManager:
+    """
+    Tracks the nodes' free resources for the launcher.
+
+    Nodes are indexed in buckets of identical free capacity, and the empty
+    nodes and total occupancy are kept as running counters.  Since the number
+    of distinct capacities is small (it depends on the job shapes, not the
+    node count), assigning, freeing and capacity queries do not scan every
+    node in large allocations.
+
+    Empty nodes are also grouped by their network locality (`ComputeNode.group`)
+    so that multi-node Jobs span as few groups as possible.
+    """
+
     def __init__(self, node_list: "List[ComputeNode]", allow_node_packing: bool = True) -> None:
         self.nodes = node_list
         self.job_node_map: Dict[int, List[int]] = {}
         self.allow_node_packing = allow_node_packing
+        # Dicts are used as insertion-ordered sets of node indices
+        self._buckets: Dict[CapacityKey, Dict[int, None]] = {}
+        self._node_keys: Dict[int, CapacityKey] = {}
+        self._empty_nodes: Dict[int, None] = {}
+        self._empty_by_group: Dict[Optional[str], Dict[int, None]] = {}
+        self._total_occupancy = 0.0
+        for node_idx in range(len(self.nodes)):
+            self._index(node_idx)
+
+    @staticmethod
+    def _capacity(node: "ComputeNode") -> CapacityKey:
+        return (round(1.0 - node.occupancy, 3), node.num_idle_cpus, node.num_idle_gpus)
+
+    def _index(self, node_idx: int) -> None:
+        node = self.nodes[node_idx]
+        key = self._capacity(node)
+        self._buckets.setdefault(key, {})[node_idx] = None
+        self._node_keys[node_idx] = key
+        if node.occupancy == 0.0:
+            self._empty_nodes[node_idx] = None
+            self._empty_by_group.setdefault(node.group, {})[node_idx] = None
+        self._total_occupancy += node.occupancy
+
+    def _unindex(self, node_idx: int) -> None:
+        key = self._node_keys.pop(node_idx)
+        bucket = self._buckets[key]
+        del bucket[node_idx]
+        if not bucket:
+            del self._buckets[key]
+        if node_idx in self._empty_nodes:
+            del self._empty_nodes[node_idx]
+            group = self.nodes[node_idx].group
+            del self._empty_by_group[group][node_idx]
+            if not self._empty_by_group[group]:
+                del self._empty_by_group[group]
+        self._total_occupancy -= self.nodes[node_idx].occupancy
+
+    def _candidates(self, num_cpus: int, num_gpus: int, node_occupancy: float) -> Iterator[int]:
+        """
+        Yields one node index from each bucket with enough free capacity,
+        tightest fit first, so that empty nodes are kept for multi-node jobs
+        """
+        fits = [
+            key
+            for key in self._buckets
+            if key[0] + 0.001 >= node_occupancy and key[1] >= num_cpus and key[2] >= num_gpus
+        ]
+        for key in sorted(fits):
+            yield next(iter(self._buckets[key]))
 
     def _assign_single_node(self, job_id: int, num_cpus: int, num_gpus: int, node_occupancy: float) -> NodeSpec:
         if not self.allow_node_packing:
             node_occupancy = 1.0
-        for node_idx, node in enumerate(self.nodes):
+        for node_idx in self._candidates(num_cpus, num_gpus, node_occupancy):
+            node = self.nodes[node_idx]
             if node.check_fit(num_cpus, num_gpus, node_occupancy):
+                self._unindex(node_idx)
                 spec = node.assign(job_id, num_cpus, num_gpus, node_occupancy)
+                self._index(node_idx)
                 self.job_node_map[job_id] = [node_idx]
                 return NodeSpec(
                     node_ids=[node.node_id],
@@ -65,30 +135,54 @@ class NodeManager:
                 )
         raise InsufficientResources
 
-    def _assign_multi_node(self, job_id: int, num_nodes: int) -> NodeSpec:
-        assigned_nodes = []
-        assigned_idxs = []
-        for node_idx, node in enumerate(self.nodes):
-            if node.check_fit(num_cpus=0, num_gpus=0, occupancy=1.0):
-                assigned_nodes.append(node)
-                assigned_idxs.append(node_idx)
-            if len(assigned_nodes) == num_nodes:
+    def _pick_empty_nodes(self, num_nodes: int) -> List[int]:
+        """
+        The smallest group with enough empty nodes, if there is one; otherwise
+        the largest groups first, which spans the fewest groups
+        """
+        sizes = sorted((len(nodes), i, group) for i, (group, nodes) in enumerate(self._empty_by_group.items()))
+        for size, _, group in sizes:
+            if size >= num_nodes:
+                return list(islice(self._empty_by_group[group], num_nodes))
+        picked: List[int] = []
+        for _, _, group in reversed(sizes):
+            picked.extend(islice(self._empty_by_group[group], num_nodes - len(picked)))
+            if len(picked) == num_nodes:
                 break
-        else:
+        return picked
+
+    def _assign_multi_node(self, job_id: int, num_nodes: int) -> NodeSpec:
+        if len(self._empty_nodes) < num_nodes:
             raise InsufficientResources
+        assigned_idxs = self._pick_empty_nodes(num_nodes)
         node_ids, hostnames = [], []
-        for node in assigned_nodes:
+        for node_idx in assigned_idxs:
+            node = self.nodes[node_idx]
+            self._unindex(node_idx)
             node.assign(job_id, num_cpus=0, num_gpus=0, occupancy=1.0)
+            self._index(node_idx)
             node_ids.append(node.node_id)
             hostnames.append(node.hostname)
         self.job_node_map[job_id] = assigned_idxs
         return NodeSpec(node_ids=node_ids, hostnames=hostnames)
 
     def count_empty_nodes(self) -> int:
-        return len([node for node in self.nodes if node.occupancy == 0.0])
+        return len(self._empty_nodes)
 
     def aggregate_free_nodes(self) -> float:
-        return float(len(self.nodes)) - sum(n.occupancy for n in self.nodes)
+        return max(0.0, round(len(self.nodes) - self._total_occupancy, 6))
+
+    def node_release_times(self, job_end_times: Dict[int, float]) -> List[float]:
+        """
+        When each busy node becomes empty, given the expected end time of each
+        assigned Job: a node packed with several Jobs empties when the last ends.
+        """
+        release_times: Dict[int, float] = {}
+        for job_id, node_idxs in self.job_node_map.items():
+            end_time = job_end_times[job_id]
+            for idx in node_idxs:
+                release_times[idx] = max(end_time, release_times.get(idx, end_time))
+        return list(release_times.values())
 
     def assign(self, job: Job) -> NodeSpec:
         assert job.id is not None
@@ -122,5 +216,6 @@ class NodeManager:
     def free(self, job_id: int) -> None:
         node_idxs = self.job_node_map.pop(job_id)
         for idx in node_idxs:
-            node = self.nodes[idx]
-            node.free(job_id)
+            self._unindex(idx)
+            self.nodes[idx].free(job_id)
+            self._index(idx)
@@ -0,0 +1,379 @@
+"""
+Warm runner pool for PY_FUNC Apps in serial mode.
+
+Launching a PY_FUNC Job normally costs a fresh interpreter which imports balsam,
+loads the Site config, and deserializes the App before any user code runs.  A
+`PyFuncPool` instead starts one fork server per worker node, which has already
+imported balsam and deserializes each App once, from the payload file that the
+launcher writes under the Site's `.app-payloads` (no API request per App).
+Every Job runs in a child forked from the server: its output goes to `job.out`
+with the same BALSAM-RETURN-VALUE / BALSAM-EXCEPTION lines that `python_runner`
+prints.
+"""
+
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import traceback
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type
+
+import psutil  # type: ignore
+
+from balsam._api.app import ApplicationDefinition
+from balsam.platform import TimeoutExpired
+from balsam.platform.app_run import LocalAppRun
+
+from .python_runner import load_app_payload, log_exception, read_payload, run_app
+
+if TYPE_CHECKING:
+    from balsam.client import RESTClient
+
+logger = logging.getLogger(__name__)
+
+# Return code reported for runs that were lost with the fork server (retried like a failed Popen)
+LOST_RUN_RETURNCODE = 12345
+TERM_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+
+class RunRequest:
+    def __init__(
+        self,
+        run_id: int,
+        app_id: int,
+        app_path: str,
+        job_json: str,
+        cwd: str,
+        outfile_path: str,
+        envs: Dict[str, str],
+        cpu_ids: List[int],
+    ) -> None:
+        self.run_id = run_id
+        self.app_id = app_id
+        self.app_path = app_path
+        self.job_json = job_json
+        self.cwd = cwd
+        self.outfile_path = outfile_path
+        self.envs = envs
+        self.cpu_ids = cpu_ids
+
+
+def _exit_code(status: int) -> int:
+    """Convert a waitpid() status to a Popen-style return code"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _redirect_output(outfile_path: str) -> None:
+    fd = os.open(outfile_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+    os.close(fd)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    sys.stdout = open(1, "w", buffering=1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+
+
+def _run_child(
+    request: RunRequest,
+    app_cls: Optional[Type[ApplicationDefinition]],
+    load_error: Optional[Exception],
+    client: "RESTClient",
+) -> int:
+    """Body of a forked child: the equivalent of running python_runner in a subprocess"""
+    # The launcher's handlers are inherited: restore the defaults before unblocking (see spawn)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, TERM_SIGNALS)
+    _redirect_output(request.outfile_path)
+    os.chdir(request.cwd)
+    # The child inherits the launcher's environment: apply only the run's delta
+    os.environ.update(request.envs)
+    if request.cpu_ids:
+        try:
+            psutil.Process().cpu_affinity(request.cpu_ids)
+        except AttributeError:
+            pass
+
+    try:
+        try:
+            if load_error is not None:
+                raise load_error
+            assert app_cls is not None
+            job = client.Job._from_api(json.loads(request.job_json))
+            params = job.get_parameters(fetch_blobs=False)
+        except Exception as exc:
+            log_exception(exc)
+            raise
+        run_app(app_cls, job, params, client)
+    except SystemExit as exc:
+        if exc.code is None or isinstance(exc.code, int):
+            return exc.code or 0
+        print(exc.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+class _ForkServer:
+    """Runs in the pool process: forks a child per RunRequest and reports each child's return code"""
+
+    def __init__(self, conn: Connection, client: "RESTClient", poll_period: float) -> None:
+        self.conn = conn
+        self.client = client
+        self.poll_period = poll_period
+        # By payload path: the path changes with the App's serialized class
+        self.apps: Dict[str, Type[ApplicationDefinition]] = {}
+        self.load_errors: Dict[str, Exception] = {}
+        self.children: Dict[int, int] = {}  # pid: run_id
+        ApplicationDefinition._set_client(client)
+
+    def load_app(
+        self, app_id: int, app_path: str
+    ) -> Tuple[Optional[Type[ApplicationDefinition]], Optional[Exception]]:
+        if app_path in self.load_errors:
+            return None, self.load_errors[app_path]
+        if app_path not in self.apps:
+            try:
+                self.apps[app_path] = load_app_payload(app_id, read_payload(app_path))
+            except Exception as exc:
+                logger.exception(f"Fork server failed to load App {app_id} from {app_path}")
+                self.load_errors[app_path] = exc
+                return None, exc
+        return self.apps[app_path], None
+
+    def spawn(self, request: RunRequest) -> None:
+        app_cls, load_error = self.load_app(request.app_id, request.app_path)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Hold termination signals until the child has reset its handlers
+        signal.pthread_sigmask(signal.SIG_BLOCK, TERM_SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self.conn.close()
+                code = _run_child(request, app_cls, load_error, self.client)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, TERM_SIGNALS)
+        self.children[pid] = request.run_id
+
+    def reap(self) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            run_id = self.children.pop(pid, None)
+            if run_id is not None:
+                self.conn.send(("done", run_id, _exit_code(status)))
+
+    def send_signal(self, run_id: int, signum: int) -> None:
+        for pid, child_run in self.children.items():
+            if child_run == run_id:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    def kill_all(self) -> None:
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.children):
+            os.waitpid(pid, 0)
+        self.children.clear()
+
+    def serve(self) -> None:
+        try:
+            while True:
+                if self.conn.poll(self.poll_period):
+                    msg = self.conn.recv()
+                    if msg[0] == "run":
+                        self.spawn(msg[1])
+                    elif msg[0] == "signal":
+                        self.send_signal(msg[1], msg[2])
+                    elif msg[0] == "exit":
+                        break
+                self.reap()
+        except (EOFError, OSError):
+            logger.warning("Fork server lost connection to the worker")
+        finally:
+            self.kill_all()
+
+
+def _serve(conn: Connection, client: "RESTClient", poll_period: float) -> None:
+    _ForkServer(conn, client, poll_period).serve()
+
+
+class PyFuncPool:
+    """
+    Worker-side handle to a fork server.  Start the pool before the worker
+    creates any threads (e.g. its ZMQ context), so the server forks cleanly.
+    """
+
+    POLL_PERIOD = 0.02
+
+    def __init__(self, client: "RESTClient") -> None:
+        self.client = client
+        self._conn: Optional[Connection] = None
+        self._process: Optional[Any] = None
+        self._run_ids = itertools.count()
+        self._returncodes: Dict[int, Optional[int]] = {}
+
+    def start(self) -> None:
+        ctx = multiprocessing.get_context("fork")
+        self._conn, server_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_serve,
+            args=(server_conn, self.client, self.POLL_PERIOD),
+            name="balsam-pyfunc-pool",
+            daemon=True,
+        )
+        self._process.start()
+        server_conn.close()
+        logger.info(f"Started PY_FUNC fork server (pid {self._process.pid})")
+
+    @property
+    def alive(self) -> bool:
+        return self._conn is not None
+
+    def _lost(self) -> None:
+        logger.error("PY_FUNC fork server exited: outstanding runs are lost")
+        self._conn = None
+        for run_id, retcode in self._returncodes.items():
+            if retcode is None:
+                self._returncodes[run_id] = LOST_RUN_RETURNCODE
+
+    def _send(self, msg: Tuple[Any, ...]) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.send(msg)
+        except OSError:
+            self._lost()
+
+    def _drain(self, timeout: float = 0) -> None:
+        """Receive return codes from the fork server, waiting up to `timeout` for the first"""
+        while self._conn is not None:
+            try:
+                if not self._conn.poll(timeout):
+                    return
+                _, run_id, retcode = self._conn.recv()
+            except (EOFError, OSError):
+                self._lost()
+                return
+            if run_id in self._returncodes:
+                self._returncodes[run_id] = retcode
+            timeout = 0
+
+    def submit(
+        self,
+        app_id: int,
+        app_path: str,
+        job_json: str,
+        cwd: Path,
+        outfile_path: Path,
+        envs: Dict[str, str],
+        cpu_ids: List[int],
+    ) -> int:
+        run_id = next(self._run_ids)
+        self._returncodes[run_id] = None if self.alive else LOST_RUN_RETURNCODE
+        request = RunRequest(run_id, app_id, app_path, job_json, str(cwd), str(outfile_path), envs, cpu_ids)
+        self._send(("run", request))
+        return run_id
+
+    def poll(self, run_id: int) -> Optional[int]:
+        self._drain()
+        return self._returncodes[run_id]
+
+    def wait(self, run_id: int, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            retcode = self.poll(run_id)
+            if retcode is not None:
+                return retcode
+            remaining = self.POLL_PERIOD if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutExpired(cmd=f"PY_FUNC run {run_id}", timeout=timeout)
+            self._drain(min(remaining, self.POLL_PERIOD))
+
+    def signal(self, run_id: int, signum: int) -> None:
+        self._send(("signal", run_id, signum))
+
+    def release(self, run_id: int) -> None:
+        self._returncodes.pop(run_id, None)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._send(("exit",))
+        if self._process is not None:
+            self._process.join(timeout=timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class PyFuncPoolRun(LocalAppRun):
+    """AppRun interface to a PY_FUNC Job running in a PyFuncPool"""
+
+    def __init__(self, pool: PyFuncPool, app_id: int, app_path: str, job_json: str, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._pool = pool
+        self._app_id = app_id
+        self._app_path = app_path
+        self._job_json = job_json
+        self._run_id: Optional[int] = None
+
+    def start(self) -> None:
+        self._run_id = self._pool.submit(
+            self._app_id,
+            self._app_path,
+            self._job_json,
+            self._cwd,
+            self._outfile_path,
+            self._env_delta(),
+            self._node_spec.cpu_ids[0],
+        )
+        logger.info(f"{self.__class__.__name__} submitted App {self._app_id} run in {self._cwd}")
+
+    def poll(self) -> Optional[int]:
+        assert self._run_id is not None
+        return self._pool.poll(self._run_id)
+
+    def terminate(self) -> None:
+        assert self._run_id is not None
+        self._pool.signal(self._run_id, signal.SIGTERM)
+
+    def kill(self) -> None:
+        assert self._run_id is not None
+        self._pool.signal(self._run_id, signal.SIGKILL)
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        assert self._run_id is not None
+        return self._pool.wait(self._run_id, timeout=timeout)
+
+    def release(self) -> None:
+        """Forget the return code once the Worker is done with this run"""
+        if self._run_id is not None:
+            self._pool.release(self._run_id)
@@ -1,11 +1,14 @@
 import json
 import sys
-from typing import Any, Dict, List, Tuple, Type
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Type
 
 from balsam._api.app import ApplicationDefinition, is_appdef
 from balsam._api.models import App, Job
 from balsam.config import SiteConfig
-from balsam.schemas import SerializeError, serialize, serialize_exception
+from balsam.schemas import DEFAULT_SERIALIZER, SerializeError, serialize, serialize_exception
+
+if TYPE_CHECKING:
+    from balsam.client import RESTClient
 
 
 def is_mpi_rank_nonzero() -> bool:
@@ -25,30 +28,55 @@ def is_mpi_rank_nonzero() -> bool:
 
 
 def unpack_chunks(
-    app_id: int, num_app_chunks: int, chunks: List[str]
+    app_id: int, num_app_chunks: int, chunks: List[str], client: "RESTClient"
 ) -> Tuple[Type[ApplicationDefinition], Job, Dict[str, Any]]:
     # sys.argv contains the serialized ApplicationDefinition and app_id (not the JSON app representation)
     app_encoded = "".join(chunks[:num_app_chunks])
+    # sys.argv contains the full JSON representation of the Job:
+    job_encoded = "".join(chunks[num_app_chunks:])
+    return unpack_payloads(app_id, app_encoded, job_encoded, client)
+
+
+def read_payload(path: str) -> str:
+    """Read a payload file written by the launcher (ranks on a node share it through the page cache)"""
+    with open(path, "r", encoding="utf-8") as fp:
+        return fp.read()
+
+
+def unpack_files(
+    app_id: int, app_path: str, job_path: str, client: "RESTClient"
+) -> Tuple[Type[ApplicationDefinition], Job, Dict[str, Any]]:
+    return unpack_payloads(app_id, read_payload(app_path), read_payload(job_path), client)
+
+
+def load_app_payload(app_id: int, app_encoded: str) -> Type[ApplicationDefinition]:
+    """Deserialize the App class from its launcher payload, without fetching the App from the API"""
     app = App(_api_data=True, id=app_id, site_id=0, name="AppName", serialized_class=app_encoded, source_code="")
     app_def = ApplicationDefinition.from_serialized(app)
     if not is_appdef(app_def):
         raise ValueError(f"{app_def} is not an ApplicationDefinition; type is {type(app_def)}")
+    return app_def
+
+
+def unpack_payloads(
+    app_id: int, app_encoded: str, job_encoded: str, client: "RESTClient"
+) -> Tuple[Type[ApplicationDefinition], Job, Dict[str, Any]]:
+    app_def = load_app_payload(app_id, app_encoded)
 
-    # sys.argv contains the full JSON representation of the Job:
-    job_encoded = "".join(chunks[num_app_chunks:])
     job_dict: Dict[str, Any] = json.loads(job_encoded)
-    job = Job._from_api(job_dict)
-    params = job.get_parameters()
+    job = client.Job._from_api(job_dict)
+    # The launcher prefetched any parameter blobs into the Site's blob cache when it acquired the Job
+    params = job.get_parameters(fetch_blobs=False)
 
     return app_def, job, params
 
 
-def log_exception(exc: Exception) -> None:
+def log_exception(exc: Exception, serializer: str = DEFAULT_SERIALIZER) -> None:
     if is_mpi_rank_nonzero():
         return
 
     try:
-        serialized_exception = serialize_exception(exc)
+        serialized_exception = serialize_exception(exc, serializer)
     except SerializeError as ser_exc:
         print(f"Warning: failed to serialize the original exception that occured: {exc}")
         print(f"This was the exception-serialization error: {ser_exc}")
@@ -56,29 +84,41 @@ def log_exception(exc: Exception) -> None:
         print("BALSAM-EXCEPTION", serialized_exception, flush=True)
 
 
-def log_result(ret_val: Any) -> None:
+def log_result(ret_val: Any, serializer: str = DEFAULT_SERIALIZER) -> None:
     if is_mpi_rank_nonzero():
         return
-    print("BALSAM-RETURN-VALUE", serialize(ret_val), flush=True)
+    print("BALSAM-RETURN-VALUE", serialize(ret_val, serializer, cache=False), flush=True)
 
 
-def main(app_id: int, num_app_chunks: int, chunks: List[str]) -> None:
-    site_config = SiteConfig()
+def run_app(app_cls: Type[ApplicationDefinition], job: Job, params: Dict[str, Any], client: "RESTClient") -> None:
+    """Run the App for `job`, printing its return value or exception for `read_pyapp_result`"""
+    serializer = app_cls.serializer
     try:
-        app_cls, job, params = unpack_chunks(app_id, num_app_chunks, chunks)
         app = app_cls(job)
-        app._set_client(site_config.client)
+        app._set_client(client)
         if not callable(app.run):
             raise AttributeError(f"ApplicationDefinition {app_cls} does not have a run() function")
         return_value = app.run(**params)
-        log_result(return_value)
+        log_result(return_value, serializer)
+    except Exception as exc:
+        log_exception(exc, serializer)
+        raise
+
+
+def main(argv: List[str]) -> None:
+    site_config = SiteConfig()
+    try:
+        if argv[0] == "--files":
+            app_cls, job, params = unpack_files(int(argv[1]), argv[2], argv[3], site_config.client)
+        else:
+            app_cls, job, params = unpack_chunks(int(argv[0]), int(argv[1]), argv[2:], site_config.client)
     except Exception as exc:
         log_exception(exc)
         raise
+    run_app(app_cls, job, params, site_config.client)
 
 
 if __name__ == "__main__":
     # python -m balsam.site.launcher.python_runner APP_ID NUM_APP_CHUNKS [APP_B64_CHUNKS] [JOB_JSON_CHUNKS]
-    app_id = int(sys.argv[1])
-    num_app_chunks = int(sys.argv[2])
-    main(app_id, num_app_chunks, sys.argv[3:])
+    # python -m balsam.site.launcher.python_runner --files APP_ID APP_PAYLOAD_PATH JOB_JSON_PATH
+    main(sys.argv[1:])
@@ -1,6 +1,9 @@
 import logging
 import time
-from typing import Iterator
+from typing import TYPE_CHECKING, Iterator, List
+
+if TYPE_CHECKING:
+    from balsam._api.models import Job
 
 logger = logging.getLogger(__name__)
 
@@ -24,3 +27,18 @@ def countdown_timer_min(time_limit_min: int, delay_sec: int) -> Iterator[float]:
             yield remaining_min
         else:
             return
+
+
+def prefetch_blobs(jobs: List["Job"]) -> None:
+    """
+    Fetch the parameter blobs of newly acquired Jobs into the Site's blob cache,
+    where their runners read them.  A failure is logged: the runners then
+    report the missing blobs as a Job error.
+    """
+    if not any(job._read_model is not None and job._read_model.blob_digests for job in jobs):
+        return
+    try:
+        # Jobs from a job source are bound to its client
+        jobs[0].objects.prefetch_blobs(jobs)
+    except Exception as exc:
+        logger.warning(f"Failed to prefetch the parameter blobs of {len(jobs)} Jobs: {exc!r}")
@@ -8,7 +8,7 @@ from pathlib import Path
 from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Union
 
 from balsam._api.app import ApplicationDefinition, AppType
-from balsam.schemas import DeserializeError, JobState, JobUpdate
+from balsam.schemas import DeserializeError, JobState, JobUpdate, cache_stats
 from balsam.site import BulkStatusUpdater, FixedDepthJobSource
 from balsam.util import Process, SigHandler
 
@@ -163,6 +163,7 @@ def run_worker(
             status_updater.put(**update_data)
             logger.debug(f"Job {job.id} advanced to {job.state}")
 
+    logger.info(f"Serialization cache stats: {cache_stats()}")
     logger.info("Signal: ProcessingWorker exit")
 
 
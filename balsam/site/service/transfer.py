@@ -182,9 +182,11 @@ class TransferService(BalsamService):
             logger.error(f"Non-fatal error in poll_tasks: {exc}")
             return
 
-        for task in tasks:
-            items = task_map[task.task_id]
-            self.update_transfers(items, task)
+        # One POST /batch for the TransferItem updates of every polled task
+        with self.client.pipeline():
+            for task in tasks:
+                items = task_map[task.task_id]
+                self.update_transfers(items, task)
 
         max_new_tasks = max(0, self.max_concurrent_transfers - num_active_tasks)
         submit_batches = islice(self.item_batch_iter(pending_submit), max_new_tasks)
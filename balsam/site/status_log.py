@@ -0,0 +1,222 @@
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple, Union
+
+import psutil  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+LogEntry = Tuple[int, Dict[str, Any]]
+
+
+def _encode(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Cannot serialize {type(obj)} in status log")
+
+
+def _decode(update: Dict[str, Any]) -> Dict[str, Any]:
+    timestamp = update.get("state_timestamp")
+    if isinstance(timestamp, str):
+        update["state_timestamp"] = datetime.fromisoformat(timestamp)
+    return update
+
+
+def log_owner(path: Path) -> Optional[Tuple[str, int]]:
+    """The (hostname, pid) of the updater that wrote a status log, parsed from its file name"""
+    stem = path.name[len("status-updates.") : -len(".wal")]
+    hostname, _, owner = stem.rpartition(".")
+    try:
+        return hostname, int(owner.split("-")[0])
+    except ValueError:
+        return None
+
+
+def _try_flock(fp: IO[str]) -> bool:
+    """
+    Lock `fp` exclusively.  Returns False only if another process holds the
+    lock: other failures (e.g. a file system without flock support) are
+    logged and ignored, since the lease alone guards logs across nodes.
+    """
+    try:
+        fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    except OSError as exc:
+        logger.warning(f"Could not lock status log {fp.name}: {exc}")
+    return True
+
+
+def read_unacked(path: Path) -> List[LogEntry]:
+    """
+    Returns the entries of a status log written after its last acknowledgement.
+    A torn line at the end of the file (from a crash mid-write) is ignored.
+    """
+    entries: List[LogEntry] = []
+    acked = -1
+    with open(path) as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping corrupt line in status log {path}")
+                continue
+            if "ack" in record:
+                acked = max(acked, record["ack"])
+            else:
+                entries.append((record["seq"], _decode(record["update"])))
+    return [(seq, update) for seq, update in entries if seq > acked]
+
+
+class StatusLog:
+    """
+    Append-only, fsync'ed log of Job status updates, written by the
+    StatusUpdater before the updates are sent to the API.
+
+    Each batch of updates is appended and fsync'ed once (group commit), and
+    an `{"ack": seq}` record is appended after the API accepts every update up
+    to `seq`.  Logs left behind by a dead updater are adopted (copied into
+    the new log) by the next one, so that their unacknowledged updates are
+    replayed.
+
+    The log directory may be shared by launchers on several nodes, where
+    flock cannot tell whether a log's owner is alive.  A log is therefore
+    orphaned only if its owner is a dead process on this host (the hostname
+    and pid are in the file name), or if it was not written for `lease`
+    seconds: a live updater renews the lease with `heartbeat`.  An orphan is
+    claimed by renaming it, so only one of several updaters adopts it.
+    """
+
+    PATTERN = "status-updates.*.wal"
+
+    def __init__(self, log_dir: Union[str, Path], max_size: int = 64 * 1024 * 1024, lease: float = 600.0) -> None:
+        self.log_dir = Path(log_dir)
+        self.hostname = socket.gethostname()
+        self.path = self.log_dir.joinpath(f"status-updates.{self.hostname}.{os.getpid()}.wal")
+        self.max_size = max_size
+        self.lease = lease
+        self._fp: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._acked = 0
+        self._renewed = time.monotonic()
+
+    def open(self, select: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None) -> List[LogEntry]:
+        """
+        Open this process's log and adopt any orphaned logs in `log_dir`.
+        The adopted updates are filtered by `select`, if given (e.g. to skip
+        stale ones).  Returns the adopted entries that still need to be sent.
+        """
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self._fp = open(self.path, "a")
+        _try_flock(self._fp)
+        backlog: List[Dict[str, Any]] = []
+        adopted: List[Path] = []
+        for path in sorted(self.log_dir.glob(self.PATTERN)):
+            claimed = self._claim(path, len(adopted)) if path != self.path else None
+            if claimed is not None:
+                try:
+                    backlog.extend(update for _, update in read_unacked(claimed))
+                except OSError as exc:
+                    logger.warning(f"Could not read status log {claimed}: {exc}")
+                    continue
+                adopted.append(claimed)
+        if backlog and select is not None:
+            backlog = select(backlog)
+        # The adopted logs are removed only after their entries are durable here
+        entries = self.append(backlog) if backlog else []
+        for path in adopted:
+            path.unlink()
+        if entries:
+            logger.info(f"Replaying {len(entries)} unacknowledged status updates from {self.log_dir}")
+        return entries
+
+    def _is_orphaned(self, path: Path) -> bool:
+        try:
+            idle_sec = time.time() - path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if idle_sec > self.lease:
+            return True
+        owner = log_owner(path)
+        return owner is not None and owner[0] == self.hostname and not psutil.pid_exists(owner[1])
+
+    def _claim(self, path: Path, num: int) -> Optional[Path]:
+        """Take over an orphaned log by renaming it after this process; returns the new path"""
+        if not self._is_orphaned(path):
+            return None
+        claimed = self.log_dir.joinpath(f"status-updates.{self.hostname}.{os.getpid()}-{num}.wal")
+        try:
+            with open(path, "r") as fp:
+                if not _try_flock(fp):
+                    return None  # Owned by a live updater on this host
+                os.rename(path, claimed)
+        except FileNotFoundError:
+            return None  # Claimed by another updater
+        except OSError as exc:
+            logger.warning(f"Could not adopt status log {path}: {exc}")
+            return None
+        return claimed
+
+    def heartbeat(self) -> None:
+        """Renew the lease on this log (at most once per quarter lease)"""
+        now = time.monotonic()
+        if now - self._renewed < self.lease / 4:
+            return
+        with self._lock:
+            if self._fp is None:
+                return
+            try:
+                os.utime(self.path)
+            except OSError as exc:
+                logger.warning(f"Could not renew the lease on status log {self.path}: {exc}")
+        self._renewed = now
+
+    def append(self, updates: List[Dict[str, Any]]) -> List[LogEntry]:
+        """Append a batch of updates with a single fsync"""
+        assert self._fp is not None, "StatusLog is not open"
+        with self._lock:
+            entries = []
+            for update in updates:
+                self._seq += 1
+                entries.append((self._seq, update))
+                self._fp.write(json.dumps({"seq": self._seq, "update": update}, default=_encode) + "\n")
+            self._sync()
+        return entries
+
+    def ack(self, seq: int) -> None:
+        """Mark every entry up to `seq` as accepted by the API"""
+        with self._lock:
+            if self._fp is None:
+                return
+            self._acked = max(self._acked, seq)
+            if self._acked == self._seq and self._fp.tell() > self.max_size:
+                self._fp.truncate(0)
+            else:
+                self._fp.write(json.dumps({"ack": seq}) + "\n")
+            self._sync()
+
+    def _sync(self) -> None:
+        assert self._fp is not None
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+
+    def close(self) -> None:
+        """Close the log, removing it if every entry was acknowledged"""
+        with self._lock:
+            if self._fp is None:
+                return
+            if self._acked == self._seq:
+                try:
+                    self.path.unlink()
+                except FileNotFoundError:
+                    logger.warning(f"Status log {self.path} was adopted by another updater")
+            self._fp.close()
+            self._fp = None
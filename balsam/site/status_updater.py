@@ -1,13 +1,19 @@
 import logging
 import queue
-from collections import defaultdict
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from math import ceil
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, TypeVar, cast
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, TypeVar, Union
 
-from balsam.schemas import MAX_ITEMS_PER_BULK_OP, JobState
+import requests
+
+from balsam.schemas import DONE_STATES, MAX_ITEMS_PER_BULK_OP, JobState
 from balsam.util import Process, SigHandler
 
+from .status_log import LogEntry, StatusLog
 from .util import Queue
 
 if TYPE_CHECKING:
@@ -23,40 +29,121 @@ def chunk_list(items: List[T], chunk_size: int) -> List[List[T]]:
 
 
 class StatusUpdater(Process):
-    def __init__(self, client: "RESTClient") -> None:
+    """
+    Collects Job updates in a background process and sends them in batches.
+    A batch is sent `max_delay` seconds after its first update arrives, or as
+    soon as it holds `max_batch_size` updates, whichever comes first.
+
+    If `wal_dir` is given, each batch is first written to a `StatusLog` in
+    that directory and sent from a background thread, so that a slow or
+    unreachable API never holds up the queue and updates survive a restart.
+    """
+
+    def __init__(
+        self,
+        client: "RESTClient",
+        max_delay: float = 1.0,
+        max_batch_size: int = 10_000,
+        wal_dir: Union[None, str, Path] = None,
+        shutdown_timeout: float = 30.0,
+    ) -> None:
         super().__init__()
         self.client = client
-        self.queue: "Queue[Dict[str, Any]]" = Queue()
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self.wal_dir = wal_dir
+        self.shutdown_timeout = shutdown_timeout
+        # Each item is a list of updates, put together by `put` or `put_many`
+        self.queue: "Queue[List[Dict[str, Any]]]" = Queue()
 
     def _run(self) -> None:
         self.client.close_session()
         sig_handler = SigHandler()
+        if self.wal_dir is not None:
+            return self._run_logged(sig_handler, StatusLog(self.wal_dir))
 
         while not sig_handler.is_set():
             try:
                 item = self.queue.get(block=True, timeout=1)
             except queue.Empty:
                 continue
-
-            updates = [item]
-            while len(updates) < 10_000:
-                try:
-                    item = self.queue.get(block=True, timeout=1)
-                    updates.append(item)
-                except queue.Empty:
-                    break
-            self._perform_updates(updates)
+            self._perform_updates(self._collect_batch(item))
 
         logger.info("Signal: break out of StatusUpdater main loop")
         self._drain_queue()
         logger.info("StatusUpdater thread finished.")
 
+    def _run_logged(self, sig_handler: SigHandler, status_log: StatusLog) -> None:
+        shipper = LogShipper(status_log, self._ship_updates, self.max_batch_size)
+        shipper.submit(status_log.open(select=self._skip_stale))
+        shipper.start()
+
+        while not sig_handler.is_set():
+            status_log.heartbeat()
+            try:
+                item = self.queue.get(block=True, timeout=1)
+            except queue.Empty:
+                continue
+            shipper.submit(status_log.append(self._collect_batch(item)))
+
+        logger.info("Signal: break out of StatusUpdater main loop")
+        updates = []
+        while True:
+            try:
+                updates.extend(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        shipper.submit(status_log.append(updates))
+        shipper.stop(timeout=self.shutdown_timeout)
+        status_log.close()
+        logger.info("StatusUpdater thread finished.")
+
+    def _skip_stale(self, updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drop replayed updates of Jobs that were deleted, reset, or have already
+        reached the update's state (or a later one), so that a replay never
+        rolls a Job back. Only the Jobs' current states are compared: the
+        server's `last_update` changes on any write, from a different clock.
+        """
+        job_ids = sorted({update["id"] for update in updates})
+        try:
+            job_states = dict(self.client.Job.objects.filter(id=job_ids).values_list("id", "state"))
+        except Exception as exc:
+            logger.warning(f"Could not check replayed status updates against their Jobs; replaying all: {exc}")
+            return updates
+        fresh = [
+            update
+            for update in updates
+            if update["id"] in job_states and _is_pending(job_states[update["id"]], update["state"])
+        ]
+        if len(fresh) < len(updates):
+            logger.info(f"Skipping {len(updates) - len(fresh)} replayed status updates already passed by their Jobs")
+        return fresh
+
+    def _ship_updates(self, updates: List[Dict[str, Any]]) -> None:
+        # The LogShipper backs off on its own and must see rejections at once
+        with self.client.no_retries():
+            self._perform_updates(updates)
+
+    def _collect_batch(self, first_item: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        updates = list(first_item)
+        deadline = time.monotonic() + self.max_delay
+        while len(updates) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                updates.extend(self.queue.get(block=True, timeout=remaining))
+            except queue.Empty:
+                break
+        return updates
+
     def _drain_queue(self) -> None:
         updates = []
         while True:
             try:
                 item = self.queue.get_nowait()
-                updates.append(item)
+                updates.extend(item)
             except queue.Empty:
                 break
         if updates:
@@ -73,33 +160,188 @@ class StatusUpdater(Process):
         if state_data is None:
             state_data = {}
         self.queue.put_nowait(
-            {
-                "id": id,
-                "state": state,
-                "state_timestamp": state_timestamp,
-                "state_data": state_data,
-                **kwargs,
-            }
+            [
+                {
+                    "id": id,
+                    "state": state,
+                    "state_timestamp": state_timestamp,
+                    "state_data": state_data,
+                    **kwargs,
+                }
+            ]
         )
 
+    def put_many(self, updates: List[Dict[str, Any]]) -> None:
+        """Enqueue several updates (each with the same keys as `put`) as one item"""
+        if updates:
+            self.queue.put_nowait([{"state_timestamp": None, "state_data": {}, **update} for update in updates])
+
     def _perform_updates(self, updates: List[Dict[str, Any]]) -> None:
         raise NotImplementedError
 
 
+# Order of the states a Job passes through; RUN_DONE, RUN_ERROR and RUN_TIMEOUT
+# are alternative outcomes of the same run and share a rank
+_STATE_RANKS: Dict[JobState, int] = {
+    JobState.created: 0,
+    JobState.awaiting_parents: 0,
+    JobState.ready: 0,
+    JobState.staged_in: 1,
+    JobState.preprocessed: 2,
+    JobState.restart_ready: 2,
+    JobState.running: 3,
+    JobState.run_done: 4,
+    JobState.run_error: 4,
+    JobState.run_timeout: 4,
+    JobState.postprocessed: 5,
+    JobState.staged_out: 6,
+    JobState.job_finished: 7,
+    JobState.failed: 7,
+}
+_RESET_STATES = {JobState.created, JobState.awaiting_parents, JobState.ready, JobState.restart_ready}
+
+
+def _is_pending(job_state: str, update_state: str) -> bool:
+    """Whether a Job in `job_state` can still legally move to `update_state`"""
+    current, target = JobState(job_state), JobState(update_state)
+    if current in DONE_STATES or current in _RESET_STATES:
+        return False
+    return _STATE_RANKS[current] < _STATE_RANKS[target]
+
+
+def fold_updates(updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fold each Job's updates into one, in timestamp order: the last state wins
+    and earlier transitions are kept in `state_history`, so that the API logs
+    every transition from a single bulk update.
+    """
+    folded: Dict[int, Dict[str, Any]] = {}
+    for update in sorted(updates, key=lambda x: x["state_timestamp"] or datetime.min):
+        previous = folded.get(update["id"])
+        if previous is None:
+            folded[update["id"]] = dict(update)
+            continue
+        history = previous.pop("state_history", [])
+        history.append(
+            {
+                "state": previous["state"],
+                "state_timestamp": previous["state_timestamp"],
+                "state_data": previous["state_data"],
+            }
+        )
+        folded[update["id"]] = {**previous, **update, "state_history": history}
+    return list(folded.values())
+
+
+# Client errors that may succeed if the same request is sent again later
+RETRYABLE_STATUS_CODES = {401, 408, 429}
+
+
+def _is_rejected(exc: BaseException) -> bool:
+    """True if the API refused the request itself (4xx), so retrying it unchanged is futile"""
+    cause: Optional[BaseException] = exc
+    while cause is not None:
+        if isinstance(cause, requests.HTTPError) and cause.response is not None:
+            status_code = cause.response.status_code
+            return 400 <= status_code < 500 and status_code not in RETRYABLE_STATUS_CODES
+        cause = cause.__cause__ or cause.__context__
+    return False
+
+
+class LogShipper(threading.Thread):
+    """
+    Sends logged status updates to the API in bulk, acknowledging each batch
+    in the `StatusLog` once it is accepted.  Batches that fail to send are
+    retried with backoff.  A batch the API rejects outright is split in
+    halves until the offending updates are isolated; only those are logged
+    and dropped, so they cannot block the updates behind them.
+    """
+
+    def __init__(
+        self,
+        status_log: StatusLog,
+        send: Callable[[List[Dict[str, Any]]], None],
+        max_batch_size: int,
+        max_backoff: float = 60.0,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.status_log = status_log
+        self.send = send
+        self.max_batch_size = max_batch_size
+        self.max_backoff = max_backoff
+        self._pending: Deque[LogEntry] = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+
+    def submit(self, entries: List[LogEntry]) -> None:
+        with self._cond:
+            self._pending.extend(entries)
+            self._cond.notify()
+
+    def stop(self, timeout: float) -> None:
+        """Ship the remaining updates, giving up after `timeout` seconds"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self.join(timeout=timeout)
+        if self.is_alive():
+            logger.warning(f"{len(self._pending)} status updates were left unsent in {self.status_log.path}")
+
+    def _next_batch(self) -> List[LogEntry]:
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            count = min(len(self._pending), self.max_batch_size)
+            return [self._pending[i] for i in range(count)]
+
+    def run(self) -> None:
+        backoff = 1.0
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                self._ship(batch)
+            except Exception as exc:
+                logger.warning(f"Failed to send status updates; retrying in {backoff} sec: {exc}")
+                time.sleep(backoff)
+                backoff = min(2 * backoff, self.max_backoff)
+                continue
+            backoff = 1.0
+
+    def _ship(self, batch: List[LogEntry]) -> None:
+        """
+        Send `batch`, acknowledging each part as soon as it is settled, so a
+        retry after a transient error resumes from the first unsent update.
+        """
+        try:
+            self.send([update for _, update in batch])
+        except Exception as exc:
+            if not _is_rejected(exc):
+                raise
+            if len(batch) > 1:
+                mid = len(batch) // 2
+                self._ship(batch[:mid])
+                self._ship(batch[mid:])
+                return
+            logger.error(f"API rejected status update {batch[0][1]}; dropping it: {exc}")
+        self._ack(batch)
+
+    def _ack(self, entries: List[LogEntry]) -> None:
+        self.status_log.ack(entries[-1][0])
+        with self._cond:
+            for _ in entries:
+                self._pending.popleft()
+
+
 class BulkStatusUpdater(StatusUpdater):
     def _perform_updates(self, updates: List[Dict[str, Any]]) -> None:
         """
-        In case two job updates occur in the same window,
-        we sort updates by timestamp and avoid duplicate job
-        updates in the same API call
+        In case a job has several updates in the same window, they are folded
+        into one, so each window costs a single bulk update per chunk of jobs.
+        Chunks are sent one by one, so a rejected chunk does not roll back the others.
         """
-        updates_by_id = cast(Dict[Any, List[Dict[str, Any]]], defaultdict(list))
-        for update in sorted(updates, key=lambda x: x["state_timestamp"]):  # type: ignore
-            updates_by_id[update["id"]].append(update)
-
-        while updates_by_id:
-            bulk_update = [update_list.pop(0) for update_list in updates_by_id.values()]
-            for chunk in chunk_list(bulk_update, chunk_size=MAX_ITEMS_PER_BULK_OP):
-                self.client.bulk_patch("jobs/", chunk)
-            logger.info(f"StatusUpdater bulk-updated {len(bulk_update)} jobs")
-            updates_by_id = {k: v for k, v in updates_by_id.items() if v}
+        bulk_update = fold_updates(updates)
+        for chunk in chunk_list(bulk_update, chunk_size=MAX_ITEMS_PER_BULK_OP):
+            self.client.bulk_patch("jobs/", chunk)
+        logger.info(f"StatusUpdater bulk-updated {len(bulk_update)} jobs ({len(updates)} updates)")
@@ -1,11 +1,21 @@
+import copy
+import json
+import os
 import random
+import subprocess
+import sys
+import threading
+import time
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from uuid import uuid4
 
 import pytest
+import requests
 
 from balsam._api.app import ApplicationDefinition
-from balsam.schemas import TransferItemState
+from balsam.client import AppCache, BlobCache, RequestStats
+from balsam.schemas import BULK_OP_LIMIT_EXCEEDED, TransferItemState
 
 GeomOpt = None
 AppA = None
@@ -171,6 +181,46 @@ class TestSite:
         assert retrieved == site1
         assert retrieved.id == site1.id
 
+    def test_unchanged_site_reused_from_cache(self, client, mocker):
+        Site = client.Site
+        Site.objects.create(name="polaris", path="/projects/foo")
+        first = Site.objects.get(name="polaris")
+
+        spy = mocker.spy(client, "get_conditional")
+        again = Site.objects.get(name="polaris")
+        etag, data = spy.spy_return
+        assert etag is not None and data is None
+        assert again == first and again is not first
+
+        first.path = "/projects/bar"
+        first.save()
+        assert Site.objects.get(name="polaris").path.as_posix() == "/projects/bar"
+
+    def test_conditional_cache_is_bounded(self, client, mocker):
+        Site = client.Site
+        Site.objects.create(name="polaris", path="/projects/foo")
+        mocker.patch("balsam._api.manager.CONDITIONAL_CACHE_BYTES", 16)
+        Site.objects._conditional_cache.pop(client, None)
+        Site.objects.get(name="polaris")
+
+        # The response is larger than the whole cache: it is fetched again in full
+        spy = mocker.spy(client, "get_conditional")
+        Site.objects.get(name="polaris")
+        etag, data = spy.spy_return
+        assert data is not None
+
+    def test_conditional_get_spanning_pages_is_not_refetched(self, client, mocker):
+        Site = client.Site
+        for i in range(3):
+            Site.objects.create(name=f"polaris{i}", path=f"/projects/{i}")
+        mocker.patch("balsam._api.manager.MAX_PAGE_SIZE", 2)
+        conditional = mocker.spy(client, "get_conditional")
+        get = mocker.spy(client, "get")
+        assert len(Site.objects.all()) == 3
+        # The first page comes from the conditional GET and only the second is fetched
+        assert conditional.call_count == 1
+        assert get.call_count == 1
+
     def test_get_raises_doesnotexist(self, client):
         Site = client.Site
         with pytest.raises(Site.DoesNotExist):
@@ -267,6 +317,26 @@ class TestApps:
         assert loaded_appdef.__app_id__ == AppPy.__app_id__
         assert loaded_appdef.run(None, 5, 4) == 9
 
+    def test_load_by_site_uses_app_cache(self, client, appdef_py, mocker, tmp_path):
+        site = client.Site.objects.create(name="polaris", path="/projects/foo")
+        AppPy = appdef_py
+        AppPy.site = site
+        AppPy.sync()
+        client.app_cache = AppCache(tmp_path)
+        ApplicationDefinition._set_client(client)
+        try:
+            apps = ApplicationDefinition.load_by_site(site.id)
+            assert apps["AppPy"].run(None, 5, 4) == 9
+            assert len(list(tmp_path.glob(f"{AppPy.__app_id__}-*.json"))) == 1
+
+            # Unchanged Apps load from the cache, without downloading them again
+            fetch = mocker.spy(client.App.objects, "filter")
+            apps = ApplicationDefinition.load_by_site(site.id)
+            assert apps["AppPy"].__app_id__ == AppPy.__app_id__
+            fetch.assert_not_called()
+        finally:
+            client.app_cache = None
+
 
 class TestJobs:
     """Jobs and TransferItems"""
@@ -318,6 +388,20 @@ class TestJobs:
         assert job.app_id == GeomOpt.__app_id__
         assert job.state == "STAGED_IN"
 
+    def test_parameters_use_app_serializer(self, client, appdef):
+        site = client.Site.objects.create(name="polaris", path="/projects/foo")
+        GeomOpt = appdef
+        GeomOpt.site = site
+        GeomOpt.serializer = "pickle5"
+        GeomOpt.sync()
+
+        job = GeomOpt.submit(workdir="test/36", geometry="h2o.xyz")
+        fetched = client.Job.objects.get(id=job.id)
+        assert fetched._read_model.serialized_parameters.startswith("@pickle5:")
+        assert fetched.get_parameters() == {"geometry": "h2o.xyz"}
+        # The class itself needs a serializer that ships code by value
+        assert not client.App.objects.get(id=GeomOpt.__app_id__).serialized_class.startswith("@")
+
     def test_set_and_fetch_data(self, client):
         App = client.App
         Site = client.Site
@@ -513,6 +597,170 @@ class TestJobs:
         assert Job.objects.count() == 6
         assert Job.objects.filter(id=ids).count() == 3
 
+    def test_query_by_long_id_list(self, client, mocker):
+        App = client.App
+        Site = client.Site
+        Job = client.Job
+        site = Site.objects.create(name="polaris", path="/projects/foo")
+        app = App.objects.create(site_id=site.id, name="one", serialized_class="txt", source_code="txt")
+        jobs = Job.objects.bulk_create([Job(f"foo/{i}", app_id=app.id) for i in range(1200)])
+        ids = [j.id for j in jobs]
+
+        query = Job.objects.filter(id=ids[:1100])
+        assert Job.objects._use_query_body(query._filters)
+        assert query.count() == 1100
+        assert len(query.order_by("-workdir")) == 1100
+        bulk_put = mocker.spy(client, "bulk_put")
+        assert query.update(tags={"subset": "yes"}) == 1100
+        assert bulk_put.call_count == 1
+        assert Job.objects.filter(tags={"subset": "yes"}).count() == 1100
+        query.delete()
+        assert Job.objects.count() == 100
+
+    def test_oversized_query_update_falls_back_to_chunks(self, client, mocker):
+        Job = client.Job
+        site = client.Site.objects.create(name="polaris", path="/projects/foo")
+        app = client.App.objects.create(site_id=site.id, name="one", serialized_class="txt", source_code="txt")
+        Job.objects.bulk_create([Job(f"foo/{i}", app_id=app.id) for i in range(3)])
+
+        rejection = requests.Response()
+        rejection.status_code = 400
+        rejection._content = json.dumps({"detail": {"code": BULK_OP_LIMIT_EXCEEDED, "limit": 1}}).encode()
+        do_request = client._do_request
+
+        def reject_query_update(url, method, *args, **kwargs):
+            # Only the update by filters is rejected: the fallback updates chunks of ids
+            if method == "PUT" and url.endswith("jobs/query") and "workdir__contains" in args[1]["filters"]:
+                raise requests.HTTPError("400 Client Error", response=rejection)
+            return do_request(url, method, *args, **kwargs)
+
+        mocker.patch.object(client, "_do_request", side_effect=reject_query_update)
+        mocker.patch.object(client, "backoff", side_effect=AssertionError("retried a rejected request"))
+        assert Job.objects.filter(workdir__contains="foo").update(tags={"chunked": "yes"}) == 3
+        assert Job.objects.filter(tags={"chunked": "yes"}).count() == 3
+
+    def test_wait_on_change_feed(self, client, mocker):
+        Job = client.Job
+        site = client.Site.objects.create(name="polaris", path="/projects/foo")
+        app = client.App.objects.create(site_id=site.id, name="one", serialized_class="txt", source_code="txt")
+        jobs = Job.objects.bulk_create([Job(f"foo/{i}", app_id=app.id) for i in range(5)])
+
+        # A separate client (own HTTP session) finishes one Job in the background
+        updater = copy.copy(client)
+        updater._session = None
+
+        def finish_job() -> None:
+            threading.Event().wait(0.5)  # time.sleep is patched below
+            updater.bulk_patch("jobs/", [{"id": jobs[2].id, "state": "JOB_FINISHED"}])
+
+        refresh = mocker.spy(Job.objects, "bulk_refresh")
+        # The change feed is used by default: the client never sleeps to poll
+        sleep = mocker.patch("balsam._api.bases.time.sleep", side_effect=AssertionError("polled"))
+        thread = threading.Thread(target=finish_job)
+        thread.start()
+        result = Job.objects.wait(jobs, timeout=30, poll_interval=60, return_when="FIRST_COMPLETED")
+        thread.join()
+        mocker.stop(sleep)
+
+        assert [job.id for job in result.done] == [jobs[2].id]
+        assert len(result.not_done) == 4
+        # Initial full refresh, then only the changed Job
+        assert refresh.call_count == 2
+        assert [job.id for job in refresh.call_args.args[0]] == [jobs[2].id]
+
+        # Polling fallback times out with nothing completed
+        result = Job.objects.wait(result.not_done, timeout=0.2, poll_interval=0.1, notify=False)
+        assert len(result.not_done) == 4
+
+        feed = Job.objects.changes(after_seq=0, fields=["workdir"], query=Job.objects.filter(state="JOB_FINISHED"))
+        assert [(change["id"], change["workdir"]) for change in feed.changes] == [(jobs[2].id, "foo/2")]
+        assert Job.objects.changes(after_seq=feed.seq).changes == []
+
+    def test_polling_fallback_backs_off(self, client, mocker):
+        Job = client.Job
+        site = client.Site.objects.create(name="polaris", path="/projects/foo")
+        app = client.App.objects.create(site_id=site.id, name="one", serialized_class="txt", source_code="txt")
+        jobs = Job.objects.bulk_create([Job(f"foo/{i}", app_id=app.id) for i in range(2)])
+
+        # The change feed is down: fall back to refreshing every pending Job
+        mocker.patch.object(Job.objects, "changes", side_effect=ConnectionError("feed down"))
+        sleep = mocker.patch("balsam._api.bases.time.sleep")
+        finish_on = {3: jobs[0], 8: jobs[1]}
+
+        def refresh(pending):
+            if refresh_mock.call_count in finish_on:
+                finish_on[refresh_mock.call_count].state = "JOB_FINISHED"
+
+        refresh_mock = mocker.patch.object(Job.objects, "bulk_refresh", side_effect=refresh)
+        completed = list(Job.objects.as_completed(jobs, poll_interval=1.0))
+
+        assert [job.id for job in completed] == [jobs[0].id, jobs[1].id]
+        # Doubles while nothing completes, up to 8x; resets after a completion
+        assert [c.args[0] for c in sleep.call_args_list] == [1.0, 2.0, 4.0, 1.0, 2.0, 4.0, 8.0, 8.0]
+
+    def test_shared_parameters_stored_as_blob(self, client, mocker, tmp_path):
+        Job = client.Job
+        site = client.Site.objects.create(name="polaris", path="/projects/foo")
+        app = client.App.objects.create(site_id=site.id, name="one", serialized_class="txt", source_code="txt")
+        config = {"matrix": list(range(20_000))}
+        jobs = [Job(f"foo/{i}", app_id=app.id, parameters={"x": i, "config": config}) for i in range(10)]
+
+        client.blob_cache = BlobCache(tmp_path)
+        request = mocker.spy(client, "request")
+        created = Job.objects.bulk_create(jobs)
+        uploads = [c for c in request.call_args_list if c.args[:2] == ("blobs/", "POST")]
+        assert len(uploads) == 1 and len(uploads[0].kwargs["json"]) == 1
+        assert all(len(job._read_model.serialized_parameters) < 1000 for job in created)
+
+        # A new process on the Site reads the blob from the shared cache directory
+        client.blob_cache = BlobCache(tmp_path)
+        fetched = Job.objects.get(id=created[3].id)
+        assert fetched.get_parameters() == {"x": 3, "config": config}
+        assert not [c for c in request.call_args_list if c.args[:2] == ("blobs/", "GET")]
+
+        # Without a local copy, the blob is fetched from the server by digest
+        client.blob_cache = BlobCache()
+        assert fetched.get_parameters()["config"] == config
+        assert len([c for c in request.call_args_list if c.args[:2] == ("blobs/", "GET")]) == 1
+
+        # Runners only read the cache, which the launcher fills when it acquires Jobs
+        client.blob_cache = BlobCache()
+        with pytest.raises(ValueError, match="not in the blob cache"):
+            fetched.get_parameters(fetch_blobs=False)
+        Job.objects.prefetch_blobs(created)
+        assert len([c for c in request.call_args_list if c.args[:2] == ("blobs/", "GET")]) == 2
+        assert fetched.get_parameters(fetch_blobs=False)["config"] == config
+
+        # Deleting the Jobs reclaims the blob; a client that still caches it uploads it again
+        (digest,) = fetched._read_model.blob_digests
+        Job.objects.filter(id=[job.id for job in created]).delete()
+        assert client.get("blobs/", digest=[digest]) == []
+        Job.objects.bulk_create([Job("bar/0", app_id=app.id, parameters={"x": 0, "config": config})])
+        assert [blob["digest"] for blob in client.get("blobs/", digest=[digest])] == [digest]
+
+    def test_values_and_columns(self, client):
+        App = client.App
+        Site = client.Site
+        Job = client.Job
+        site = Site.objects.create(name="polaris", path="/projects/foo")
+        app = App.objects.create(site_id=site.id, name="one", serialized_class="txt", source_code="txt")
+        jobs = Job.objects.bulk_create([Job(f"foo/{i}", app_id=app.id, num_nodes=i + 1) for i in range(4)])
+
+        query = Job.objects.filter(id=[j.id for j in jobs]).order_by("workdir")
+        rows = query.values("workdir", "num_nodes")
+        assert rows[0] == {"workdir": Path("foo/0"), "num_nodes": 1}
+        assert query.values_list("num_nodes", flat=True) == [1, 2, 3, 4]
+        assert query.values_list("id", "state")[0] == (jobs[0].id, "STAGED_IN")
+        with pytest.raises(TypeError):
+            query.values_list("id", "state", flat=True)
+        with pytest.raises(ValueError):
+            query.values("not_a_field")
+
+        numpy = pytest.importorskip("numpy")
+        columns = query.to_columns("id", "num_nodes")
+        assert isinstance(columns["num_nodes"], numpy.ndarray)
+        assert columns["num_nodes"].sum() == 10
+
     def test_state_ordering(self, client):
         App = client.App
         Site = client.Site
@@ -1141,6 +1389,38 @@ class TestSessions:
         sess.refresh_from_db()
         assert sess.heartbeat > creation_time
 
+    def test_pipeline_tick_update_and_acquire(self, client, mocker):
+        site, app = self.create_site_app(client)
+        jobs = client.Job.objects.bulk_create([self.job(client, i, app) for i in range(3)])
+        sess = self.create_sess(client, site)
+        request = mocker.spy(client, "_request_with_retry")
+
+        with client.pipeline() as pipe:
+            sess.tick()
+            for job in jobs:
+                job.state = "PREPROCESSED"
+            client.Job.objects.bulk_update(jobs)
+            acquired = sess.acquire_jobs(max_num_jobs=8)
+            assert len(pipe) == 0
+
+        assert request.call_count == 1
+        assert request.call_args.args[:2] == ("batch/", "POST")
+        assert sorted(j.id for j in acquired) == sorted(j.id for j in jobs)
+
+        # Other requests flush queued operations first
+        with client.pipeline():
+            sess.tick()
+            assert client.Job.objects.filter(state="PREPROCESSED").count() == 3
+        assert request.call_count == 3
+
+        # Queued writes are discarded if the block raises
+        with pytest.raises(RuntimeError):
+            with client.pipeline():
+                sess.tick()
+                raise RuntimeError("interrupted")
+        assert request.call_count == 3
+        assert client._active_pipeline() is None
+
     def test_delete(self, client):
         site, app = self.create_site_app(client)
         self.create_jobs(client, app, num_jobs=3)
@@ -1164,3 +1444,54 @@ class TestSessions:
             max_num_jobs=8,
         )
         assert len(acquired) == 3
+
+
+class TestClientInstrumentation:
+    def test_request_stats(self, client, mocker, monkeypatch, tmp_path):
+        stats = RequestStats(stats_path=tmp_path / "launcher.api-stats", dump_period=0)
+        monkeypatch.setattr(client, "instrumentation", stats)
+        site = client.Site.objects.create(name="polaris", path="/projects/foo")
+        client.Site.objects.get(id=site.id)
+
+        # One failed connection attempt is retried after backing off
+        do_request = client._do_request
+        mocker.patch.object(
+            client, "_do_request", side_effect=[requests.ConnectionError("refused"), mocker.DEFAULT], wraps=do_request
+        )
+        mocker.patch.object(client, "backoff")
+        client.Site.objects.get(id=site.id)
+
+        endpoints = stats.summary()["endpoints"]
+        assert endpoints["POST sites"]["latency"]["count"] == 1
+        assert endpoints["POST sites"]["bytes_out"] > 0
+        assert endpoints["POST sites"]["bytes_in"] > 0
+        get_site = endpoints["GET sites"]
+        assert get_site["latency"]["count"] == 3
+        assert get_site["errors"] == 1
+        assert get_site["retries"] == 1
+
+        path = stats.dump()
+        assert path.parent == tmp_path
+        assert json.loads(path.read_text())["endpoints"] == endpoints
+
+    def test_request_stats_are_dumped_periodically_and_at_exit(self, tmp_path):
+        stats = RequestStats(stats_path=tmp_path / "idle.api-stats", dump_period=0.05)
+        stats.record_request("GET", "sites/", 0.01, 200, 0, 10)
+        path = tmp_path / f"idle.api-stats.{os.getpid()}.json"
+        deadline = time.monotonic() + 5
+        while not path.exists():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        # A short-lived process writes its stats on exit, before the first period elapses
+        script = (
+            "import os, sys\n"
+            "from balsam.client import RequestStats\n"
+            "stats = RequestStats(stats_path=sys.argv[1], dump_period=3600)\n"
+            "stats.record_request('PUT', 'sessions/1', 0.01, 200, 5, 5)\n"
+            "print(os.getpid())\n"
+        )
+        stats_path = tmp_path / "launcher.api-stats"
+        pid = subprocess.check_output([sys.executable, "-c", script, str(stats_path)], text=True).strip()
+        summary = json.loads((tmp_path / f"launcher.api-stats.{pid}.json").read_text())
+        assert summary["endpoints"]["PUT sessions/{id}"]["latency"]["count"] == 1
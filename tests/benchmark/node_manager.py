@@ -0,0 +1,73 @@
+"""
+Simulate launcher cycles on a large allocation to time the NodeManager.
+
+    python -m tests.benchmark.node_manager [--nodes 10000] [--cycles 50]
+
+Each cycle frees a random fraction of the running jobs, queries the free
+capacity as the MPI launcher does, and fills the allocation back up with a
+mix of packed single-node jobs and multi-node jobs.
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from balsam.platform.compute_node import PolarisNode
+from balsam.site.launcher.node_manager import InsufficientResources, NodeManager
+
+# (num_nodes, ranks_per_node, gpus_per_rank, node_packing_count)
+JOB_SHAPES = [(1, 1, 1, 4), (1, 8, 0, 8), (1, 32, 0, 1), (4, 1, 0, 1), (16, 1, 0, 1)]
+
+
+def fill(manager: NodeManager, running: Dict[int, int], next_id: int) -> int:
+    while manager.aggregate_free_nodes() > 0:
+        num_nodes, ranks_per_node, gpus_per_rank, packing = random.choice(JOB_SHAPES)
+        try:
+            manager.assign_from_params(
+                id=next_id,
+                num_nodes=num_nodes,
+                ranks_per_node=ranks_per_node,
+                threads_per_rank=1,
+                threads_per_core=1,
+                gpus_per_rank=gpus_per_rank,
+                node_occupancy=1.0 / packing,
+            )
+        except InsufficientResources:
+            return next_id
+        running[next_id] = num_nodes
+        next_id += 1
+    return next_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--cycles", type=int, default=50)
+    parser.add_argument("--free-fraction", type=float, default=0.1)
+    args = parser.parse_args()
+    random.seed(0)
+
+    nodes = [PolarisNode(i, f"x3000c0s{i}") for i in range(args.nodes)]
+    manager = NodeManager(nodes, allow_node_packing=True)
+    running: Dict[int, int] = {}
+    next_id = fill(manager, running, 0)
+    print(f"{args.nodes} nodes: {len(running)} jobs running after the initial fill")
+
+    times: List[float] = []
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        for job_id in random.sample(list(running), int(len(running) * args.free_fraction)):
+            manager.free(job_id)
+            del running[job_id]
+        manager.count_empty_nodes()
+        manager.aggregate_free_nodes()
+        next_id = fill(manager, running, next_id)
+        times.append(time.perf_counter() - start)
+
+    print(f"{args.cycles} cycles: {sum(times) / len(times) * 1000:.1f} ms mean, {max(times) * 1000:.1f} ms max")
+    print(f"{next_id} jobs assigned, {len(running)} running at the end")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Drive the serial mode Master with many simulated Workers to measure how fast
+it hands out Jobs and ingests their status updates.
+
+    python -m tests.benchmark.serial_mode_master [--workers 1 16 256] [--jobs 20000] [--apps shell pyfunc]
+
+Every simulated Worker is a DEALER socket that "runs" each Job instantly: as
+soon as a batch arrives, it reports the Jobs as started and done and asks for
+as many more.  The Master uses an in-memory job source and status updater, so
+only the Job spec preparation, messaging and bookkeeping are timed.  Specs
+are rendered from real Apps: a templated shell command, or a PY_FUNC App whose
+payload files are written under a temporary data directory.
+"""
+
+import argparse
+import json
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Type
+
+import zmq
+
+from balsam._api.app import ApplicationDefinition
+from balsam.site.launcher._serial_mode_master import Master
+from balsam.util import SigHandler
+
+
+class ShellApp(ApplicationDefinition):
+    site = 0
+    command_template = "echo {{ name }} > {{ outfile }}"
+
+
+class PyFuncApp(ApplicationDefinition):
+    site = 0
+
+    def run(self, x: int) -> int:
+        return x * 2
+
+
+APPS: Dict[str, Type[ApplicationDefinition]] = {"shell": ShellApp, "pyfunc": PyFuncApp}
+
+
+class ReadModel:
+    def __init__(self, job: "BenchJob") -> None:
+        self.job = job
+        self.blob_digests: List[str] = []
+
+    def json(self) -> str:
+        return json.dumps({"id": self.job.id, "workdir": str(self.job.workdir), "parameters": self.job.parameters})
+
+
+class BenchJob:
+    """The attributes of a Job that the Master reads to build its spec"""
+
+    threads_per_rank = 1
+    threads_per_core = 1
+    gpus_per_rank = 0.0
+    node_packing_count = 1
+
+    def __init__(self, id: int, app_id: int) -> None:
+        self.id = id
+        self.app_id = app_id
+        self.workdir = Path(f"bench/{id}")
+        self.parameters = {"name": f"job{id}", "outfile": "out.txt", "x": id}
+        self._read_model = ReadModel(self)
+
+    def get_parameters(self) -> Dict[str, Any]:
+        return self.parameters
+
+    def resolve_workdir(self, data_path: Path) -> Path:
+        return data_path.joinpath(self.workdir)
+
+
+def register_app(app_cls: Type[ApplicationDefinition], app_id: int) -> None:
+    app_cls.__app_id__ = app_id
+    app_cls._serialized_class = "x" * 4096  # Stands in for the dill-serialized class
+    ApplicationDefinition._app_id_cache[app_id] = app_cls
+
+
+class MemoryJobSource:
+    def __init__(self, num_jobs: int, app_id: int) -> None:
+        self.jobs: Deque[BenchJob] = deque(BenchJob(i, app_id) for i in range(num_jobs))
+        self.queue = SimpleNamespace(cancel_join_thread=lambda: None)
+
+    def get_jobs(self, max_num_jobs: int) -> List[BenchJob]:
+        return [self.jobs.popleft() for _ in range(min(max_num_jobs, len(self.jobs)))]
+
+    def start(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        pass
+
+    def join(self) -> None:
+        pass
+
+
+class CountingStatusUpdater:
+    def __init__(self) -> None:
+        self.num_updates = 0
+
+    def put(self, *args: Any, **kwargs: Any) -> None:
+        self.num_updates += 1
+
+    def put_many(self, updates: List[Dict[str, Any]]) -> None:
+        self.num_updates += len(updates)
+
+    def is_alive(self) -> bool:
+        return True
+
+    def start(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        pass
+
+    def join(self) -> None:
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("", 0))
+        port: int = sock.getsockname()[1]
+    return port
+
+
+def run_workers(master: Master, port: int, num_workers: int, num_jobs: int, prefetch: int, result: Dict) -> None:
+    context = zmq.Context()
+    context.set(zmq.MAX_SOCKETS, num_workers + 16)
+    poller = zmq.Poller()
+    sockets = []
+    for i in range(num_workers):
+        sock = context.socket(zmq.DEALER)
+        sock.connect(f"tcp://localhost:{port}")
+        poller.register(sock, zmq.POLLIN)
+        sockets.append(sock)
+        sock.send_json({"source": f"worker{i}", "started": [], "done": [], "error": [], "request_num_jobs": prefetch})
+
+    num_done = 0
+    start = time.perf_counter()
+    while num_done < num_jobs:
+        for sock, _ in poller.poll(timeout=1000):
+            ids = [job["id"] for job in sock.recv_json()["new_jobs"]]
+            sock.send_json(
+                {"source": "worker", "started": ids, "done": ids, "error": [], "request_num_jobs": len(ids)}
+            )
+            num_done += len(ids)
+    result["elapsed"] = time.perf_counter() - start
+
+    master.sig_handler.set()
+    num_exited = 0
+    while num_exited < num_workers:
+        for sock, _ in poller.poll(timeout=1000):
+            if sock.recv_json().get("exit"):
+                num_exited += 1
+    for sock in sockets:
+        sock.close(linger=0)
+    context.term()
+
+
+def bench(app_name: str, num_workers: int, num_jobs: int, prefetch: int) -> None:
+    port = free_port()
+    app_id = list(APPS).index(app_name) + 1
+    job_source = MemoryJobSource(num_jobs, app_id)
+    status_updater = CountingStatusUpdater()
+    SigHandler._exit_event.clear()  # Set by the previous run
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp).joinpath("data")
+        ApplicationDefinition._set_payload_dir(Path(tmp).joinpath("payloads"), data_dir)
+        master = Master(
+            job_source=job_source,  # type: ignore
+            status_updater=status_updater,  # type: ignore
+            wall_time_min=60,
+            master_port=port,
+            data_dir=data_dir,
+            idle_ttl_sec=3600,
+            num_workers=num_workers,
+        )
+        result: Dict[str, float] = {}
+        workers = threading.Thread(target=run_workers, args=(master, port, num_workers, num_jobs, prefetch, result))
+        workers.start()
+        master.run()
+        workers.join()
+
+    elapsed = result["elapsed"]
+    print(
+        f"{app_name:>6s} {num_workers:5d} workers: {num_jobs} jobs in {elapsed:.2f} sec "
+        f"({num_jobs / elapsed:,.0f} jobs/sec, {status_updater.num_updates} status updates)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 16, 256])
+    parser.add_argument("--jobs", type=int, default=20_000)
+    parser.add_argument("--prefetch", type=int, default=4, help="Jobs requested by each Worker at a time")
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    args = parser.parse_args()
+
+    for app_id, app_cls in enumerate(APPS.values(), 1):
+        register_app(app_cls, app_id)
+    for app_name in args.apps:
+        for num_workers in args.workers:
+            bench(app_name, num_workers, args.jobs, args.prefetch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare the serializer backends on NumPy-heavy Job parameters and return values.
+
+    python -m tests.benchmark.serializers [--repeat N]
+
+Reports the median serialize and deserialize times and the payload size
+(the base64 text actually stored and sent over the API) for each backend.
+"""
+
+import argparse
+import time
+from statistics import median
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from balsam.schemas import SerializeError, deserialize, serialize
+
+SPECS = ["dill", "cloudpickle", "pickle5", "dill+zstd", "cloudpickle+zstd", "pickle5+zstd"]
+
+
+def make_payloads() -> Dict[str, Any]:
+    rng = np.random.default_rng(seed=0)
+    return {
+        "random 8 MB array": {"x": rng.random(1_000_000)},
+        "sparse 8 MB array": {"x": np.where(rng.random(1_000_000) > 0.99, 1.0, 0.0)},
+        "100 x 80 kB arrays": {f"x{i}": rng.random(10_000) for i in range(100)},
+        "mixed dict": {
+            "grid": rng.integers(0, 255, size=(512, 512), dtype=np.uint8),
+            "coords": rng.random((10_000, 3)),
+            "config": {"name": "run-1", "steps": list(range(1000)), "tol": 1e-6},
+        },
+    }
+
+
+def timeit(func: Callable[[], Any], repeat: int) -> float:
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'payload':<20} {'serializer':<18} {'dump ms':>9} {'load ms':>9} {'size MB':>9}")
+    for name, payload in make_payloads().items():
+        for spec in SPECS:
+            try:
+                serialized = serialize(payload, spec, cache=False)
+            except SerializeError as exc:
+                print(f"{name:<20} {spec:<18} skipped: {exc}")
+                continue
+            dump_time = timeit(lambda: serialize(payload, spec, cache=False), args.repeat)
+            load_time = timeit(lambda: deserialize(serialized, cache=False), args.repeat)
+            print(
+                f"{name:<20} {spec:<18} {dump_time * 1000:9.1f} {load_time * 1000:9.1f} {len(serialized) / 1e6:9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
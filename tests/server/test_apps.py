@@ -1,5 +1,9 @@
+import hashlib
+
 from fastapi import status
 
+from balsam.server.models import crud
+
 from .util import create_app, create_site
 
 
@@ -71,3 +75,48 @@ def test_cannot_add_app_to_other_user_site(fastapi_user_test_client):
     client1, client2 = fastapi_user_test_client(), fastapi_user_test_client()
     site = create_site(client1)
     create_app(client2, site_id=site["id"], check=status.HTTP_404_NOT_FOUND)
+
+
+def test_app_versions_hash_serialized_class(auth_client):
+    site1 = create_site(auth_client, name="site1", path="/site/1")
+    site2 = create_site(auth_client, name="site2", path="/site/2")
+    app = create_app(auth_client, site1["id"], name="SayHelloA")
+    create_app(auth_client, site2["id"], name="SayHelloB")
+
+    versions = auth_client.get("/apps/versions", site_id=site1["id"])
+    assert versions == [
+        {
+            "id": app["id"],
+            "site_id": site1["id"],
+            "name": "SayHelloA",
+            "class_hash": hashlib.md5(b"txt").hexdigest(),
+        }
+    ]
+
+    auth_client.put(f"/apps/{app['id']}", serialized_class="changed")
+    versions = auth_client.get("/apps/versions", site_id=site1["id"])
+    assert versions[0]["class_hash"] == hashlib.md5(b"changed").hexdigest()
+
+
+def test_conditional_get_skips_loading_apps(auth_client, mocker):
+    site = create_site(auth_client)
+    app = create_app(auth_client, site["id"])
+    fetch = mocker.spy(crud.apps, "fetch")
+    for url in ["/apps/", f"/apps/{app['id']}"]:
+        etag = auth_client._client.get(url).headers["ETag"]
+        fetch.reset_mock()
+        response = auth_client._client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert fetch.call_count == 0
+
+    auth_client.put(f"/apps/{app['id']}", description="updated")
+    response = auth_client._client.get(f"/apps/{app['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["description"] == "updated"
+
+    # Adding an App changes the validator of the list
+    etag = auth_client._client.get("/apps/").headers["ETag"]
+    create_app(auth_client, site["id"], name="other")
+    response = auth_client._client.get("/apps/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["results"]) == 2
@@ -1,5 +1,6 @@
 """APIClient-driven tests"""
 
+import hashlib
 import random
 import time
 from datetime import datetime, timedelta
@@ -8,8 +9,11 @@ from uuid import uuid4
 import pytest
 from dateutil.parser import isoparse
 from fastapi import status
+from sqlalchemy.exc import IntegrityError
 
+from balsam import schemas
 from balsam.server import models
+from balsam.server.models import crud
 
 from .util import create_app, create_site
 
@@ -227,6 +231,37 @@ def test_bulk_patch(auth_client, job_dict):
         assert job["state"] == "PREPROCESSED"
 
 
+def test_bulk_patch_with_state_history_logs_each_transition(auth_client, job_dict):
+    job = auth_client.bulk_post("/jobs/", [job_dict(transfers={})])[0]
+    assert job["state"] == "STAGED_IN"
+    count = auth_client.bulk_patch(
+        "/jobs/",
+        [
+            {
+                "id": job["id"],
+                "state": "RUN_DONE",
+                "state_timestamp": "2022-01-01T00:00:02",
+                "state_history": [
+                    {"state": "PREPROCESSED", "state_timestamp": "2022-01-01T00:00:00"},
+                    {"state": "RUNNING", "state_timestamp": "2022-01-01T00:00:01", "state_data": {"node": "n1"}},
+                ],
+            }
+        ],
+    )
+    assert count == 1
+    assert auth_client.get(f"/jobs/{job['id']}")["state"] == "RUN_DONE"
+
+    events = auth_client.get("/events/", job_id=job["id"], ordering="timestamp")["results"]
+    events = [e for e in events if e["from_state"] != "CREATED"]
+    transitions = [(e["from_state"], e["to_state"]) for e in events]
+    assert transitions == [
+        ("STAGED_IN", "PREPROCESSED"),
+        ("PREPROCESSED", "RUNNING"),
+        ("RUNNING", "RUN_DONE"),
+    ]
+    assert events[1]["data"] == {"node": "n1"}
+
+
 def test_acquire_for_launch(auth_client, job_dict, create_session):
     """Jobs become associated with BatchJob"""
     jobs = auth_client.bulk_post("/jobs/", [job_dict(transfers={}) for _ in range(10)])
@@ -272,6 +307,99 @@ def test_acquire_for_launch(auth_client, job_dict, create_session):
         assert job["batch_job_id"] == session2.batch_job_id
 
 
+def test_batch_patch_tick_and_acquire(auth_client, job_dict, create_session):
+    jobs = auth_client.bulk_post("/jobs/", [job_dict(transfers={}) for _ in range(4)])
+    ids = [j["id"] for j in jobs]
+    session = create_session()
+
+    resp = auth_client.post(
+        "/batch/",
+        operations=[
+            {"method": "PATCH", "path": "/jobs/", "body": [{"id": id, "state": "PREPROCESSED"} for id in ids]},
+            {"method": "PUT", "path": f"/sessions/{session.id}"},
+            {"method": "POST", "path": f"/sessions/{session.id}", "body": {"max_num_jobs": 8, "filter_tags": {}}},
+            {"method": "PUT", "path": "/sessions/999999"},
+        ],
+        check=status.HTTP_200_OK,
+    )
+    patched, ticked, acquired, missing = resp["results"]
+    assert patched == {"status_code": 200, "data": 4, "detail": None}
+    assert ticked["status_code"] == 200
+    assert sorted(job["id"] for job in acquired["data"]) == ids
+    assert missing["status_code"] == 404
+
+    # Sub-operations before the failure were committed
+    for job in auth_client.get("/jobs/", id=ids)["results"]:
+        assert job["state"] == "PREPROCESSED"
+
+
+def test_atomic_batch_rolls_back_on_failure(auth_client, job_dict):
+    jobs = auth_client.bulk_post("/jobs/", [job_dict(transfers={}) for _ in range(2)])
+    ids = [j["id"] for j in jobs]
+    resp = auth_client.post(
+        "/batch/",
+        atomic=True,
+        operations=[
+            {"method": "PATCH", "path": "jobs", "body": [{"id": id, "state": "PREPROCESSED"} for id in ids]},
+            {"method": "PATCH", "path": "transfers", "body": [{"id": 999999, "state": "done"}]},
+        ],
+        check=status.HTTP_400_BAD_REQUEST,
+    )
+    assert resp["detail"]["operation"] == 1
+    for job in auth_client.get("/jobs/", id=ids)["results"]:
+        assert job["state"] == "STAGED_IN"
+
+    # Unsupported operations are rejected up front
+    auth_client.post(
+        "/batch/",
+        operations=[{"method": "DELETE", "path": "jobs"}],
+        check=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def test_batch_reports_database_errors_per_operation(auth_client, job_dict, create_session, mocker):
+    jobs = auth_client.bulk_post("/jobs/", [job_dict(transfers={}) for _ in range(2)])
+    ids = [j["id"] for j in jobs]
+    session = create_session()
+    mocker.patch(
+        "balsam.server.models.crud.sessions.tick",
+        side_effect=IntegrityError("UPDATE sessions", {}, Exception("duplicate key")),
+    )
+    resp = auth_client.post(
+        "/batch/",
+        operations=[
+            {"method": "PATCH", "path": "jobs", "body": [{"id": id, "state": "PREPROCESSED"} for id in ids]},
+            {"method": "PUT", "path": f"/sessions/{session.id}"},
+        ],
+        check=status.HTTP_200_OK,
+    )
+    patched, ticked = resp["results"]
+    assert patched["status_code"] == 200
+    assert ticked["status_code"] == 409
+    for job in auth_client.get("/jobs/", id=ids)["results"]:
+        assert job["state"] == "PREPROCESSED"
+
+
+def test_release_hands_jobs_back_to_other_sessions(auth_client, job_dict, create_session):
+    jobs = auth_client.bulk_post("/jobs/", [job_dict(transfers={}) for _ in range(4)])
+    ids = [j["id"] for j in jobs]
+    auth_client.bulk_put("/jobs/", {"state": "PREPROCESSED"}, id=ids)
+    session1, session2 = create_session(), create_session()
+    acquire_spec = dict(max_wall_time_min=120, filter_tags={}, max_num_jobs=10, max_aggregate_nodes=10.0)
+
+    acquired = auth_client.post(f"/sessions/{session1.id}", **acquire_spec, check=status.HTTP_200_OK)
+    assert len(acquired) == 4
+    auth_client.bulk_patch("/jobs/", [{"id": acquired[0]["id"], "state": "RUNNING"}])
+
+    # Running Jobs stay locked; the others can be acquired by another Session
+    num_released = auth_client.post(
+        f"/sessions/{session1.id}/release", job_ids=[j["id"] for j in acquired], check=status.HTTP_200_OK
+    )
+    assert num_released == 3
+    reacquired = auth_client.post(f"/sessions/{session2.id}", **acquire_spec, check=status.HTTP_200_OK)
+    assert {j["id"] for j in reacquired} == {j["id"] for j in acquired[1:]}
+
+
 def test_update_to_running_does_not_release_lock(auth_client, job_dict, create_session, db_session):
     jobs = auth_client.bulk_post("/jobs/", [job_dict(transfers={}) for _ in range(10)])
 
@@ -485,6 +613,144 @@ def test_can_filter_on_id(auth_client, job_dict):
     assert workdirs == ["B", "C"]
 
 
+def test_list_projects_fields(auth_client, job_dict):
+    specs = [job_dict(workdir="A"), job_dict(workdir="B")]
+    auth_client.bulk_post("/jobs/", specs)
+    res = auth_client.get("/jobs/", fields=["id", "workdir"], ordering="workdir")
+    assert res["count"] == 2
+    assert [set(job.keys()) for job in res["results"]] == [{"id", "workdir"}] * 2
+    assert [job["workdir"] for job in res["results"]] == ["A", "B"]
+    auth_client.get("/jobs/", fields=["id", "owner_id"], check=status.HTTP_400_BAD_REQUEST)
+
+
+def test_list_does_not_load_internal_columns(auth_client, job_dict, mocker):
+    auth_client.bulk_post("/jobs/", [job_dict(workdir="A")])
+    fetch = mocker.spy(crud.jobs, "fetch")
+    auth_client.get("/jobs/")
+    _, rows = fetch.spy_return
+    assert len(rows) == 1
+    assert "change_seq" not in rows[0]
+    assert set(rows[0]) <= set(schemas.JobOut.__fields__) | {"session_id"}
+
+
+def test_query_with_filters_in_body(auth_client, job_dict, mocker):
+    specs = [job_dict(workdir="A"), job_dict(workdir="B"), job_dict(workdir="C")]
+    A, B, C = auth_client.bulk_post("/jobs/", specs)
+
+    # Large id list is joined against an unnested array; unknown ids are ignored
+    ids = [B["id"], C["id"], *range(C["id"] + 1000, C["id"] + 2000)]
+    res = auth_client.post("/jobs/query", check=status.HTTP_200_OK, filters={"id": ids, "ordering": "-workdir"})
+    assert res["count"] == 2
+    assert [job["workdir"] for job in res["results"]] == ["C", "B"]
+
+    num_updated = auth_client.put("/jobs/query", filters={"id": ids}, update={"tags": {"foo": "bar"}})
+    assert num_updated == 2
+    assert auth_client.get("/jobs/", tags="foo:bar")["count"] == 2
+
+    # Oversized updates are counted and rejected before any row is locked
+    mocker.patch("balsam.schemas.MAX_ITEMS_PER_BULK_OP", 1)
+    select_for_update = mocker.spy(crud.jobs, "select_jobs_for_update")
+    res = auth_client.put(
+        "/jobs/query", check=status.HTTP_400_BAD_REQUEST, filters={"id": ids}, update={"tags": {"foo": "baz"}}
+    )
+    assert res["detail"]["code"] == schemas.BULK_OP_LIMIT_EXCEEDED
+    assert res["detail"]["count"] == 2
+    assert select_for_update.call_count == 0
+
+    response = auth_client._client.delete("/jobs/query", json={"filters": {"id": ids}})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == 2
+    assert auth_client.get("/jobs/")["count"] == 1
+
+
+def test_changes_feed(auth_client, job_dict):
+    jobs = auth_client.bulk_post("/jobs/", [job_dict(transfers={}) for _ in range(3)])
+    ids = [job["id"] for job in jobs]
+    seq = auth_client.get("/jobs/changes")["seq"]
+
+    # No changes yet: long-poll returns empty after waiting
+    start = time.time()
+    resp = auth_client.get("/jobs/changes", after_seq=seq, wait=0.5)
+    assert resp["results"] == []
+    assert resp["seq"] >= seq
+    assert time.time() - start >= 0.5
+
+    auth_client.bulk_patch("/jobs/", [{"id": ids[1], "state": "PREPROCESSED"}])
+    resp = auth_client.get("/jobs/changes", after_seq=seq, wait=5)
+    assert [(c["id"], c["state"]) for c in resp["results"]] == [(ids[1], "PREPROCESSED")]
+    assert auth_client.get("/jobs/changes", after_seq=resp["seq"])["results"] == []
+
+    # Changes are ordered by transaction, and pages resume within a transaction
+    auth_client.bulk_patch("/jobs/", [{"id": ids[2], "state": "PREPROCESSED"}])
+    auth_client.bulk_patch("/jobs/", [{"id": id, "state": "RESTART_READY"} for id in ids[:2]])
+    resp = auth_client.get("/jobs/changes", after_seq=seq, limit=2, fields=["num_nodes"])
+    assert resp["has_more"]
+    assert [(c["id"], c["state"], c["num_nodes"]) for c in resp["results"]] == [
+        (ids[2], "PREPROCESSED", 2),
+        (ids[0], "RESTART_READY", 2),
+    ]
+    resp = auth_client.get("/jobs/changes", after_seq=resp["seq"], after_id=resp["after_id"], limit=2)
+    assert not resp["has_more"]
+    assert resp["after_id"] is None
+    assert [c["id"] for c in resp["results"]] == ids[1:2]
+
+    # A transaction larger than a page is split across pages
+    auth_client.bulk_put("/jobs/", {"tags": {"page": "split"}}, id=ids)
+    cursor = {"after_seq": resp["seq"]}
+    pages = []
+    while True:
+        resp = auth_client.get("/jobs/changes", limit=1, **cursor)
+        pages.append([c["id"] for c in resp["results"]])
+        if not resp["has_more"]:
+            break
+        cursor = {"after_seq": resp["seq"], "after_id": resp["after_id"]}
+    assert pages == [[ids[0]], [ids[1]], [ids[2]]]
+
+    # Starting from 0 replays the latest state of every Job
+    resp = auth_client.get("/jobs/changes", after_seq=0)
+    assert sorted(c["id"] for c in resp["results"]) == ids
+
+
+def test_blobs_are_deduplicated_and_owner_scoped(auth_client, fastapi_user_test_client):
+    data = "x" * 100
+    blob = {"digest": hashlib.sha256(data.encode()).hexdigest(), "data": data}
+    assert auth_client.bulk_post("/blobs/", [blob, blob]) == [blob["digest"]]
+    assert auth_client.bulk_post("/blobs/", [blob]) == []
+
+    fetched = auth_client.get("/blobs/", digest=[blob["digest"], "0" * 64])
+    assert fetched == [blob]
+    other_client = fastapi_user_test_client()
+    assert other_client.get("/blobs/", digest=[blob["digest"]]) == []
+
+    bad_blob = {"digest": "0" * 64, "data": data}
+    auth_client.bulk_post("/blobs/", [bad_blob], check=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+def test_jobs_reference_blobs_until_deleted_or_replaced(auth_client, job_dict):
+    blobs = [{"digest": hashlib.sha256(data.encode()).hexdigest(), "data": data} for data in ["x" * 100, "y" * 100]]
+    auth_client.bulk_post("/blobs/", blobs)
+    x, y = (blob["digest"] for blob in blobs)
+
+    resp = auth_client.bulk_post(
+        "/jobs/", [{**job_dict(), "blob_digests": ["0" * 64]}], check=status.HTTP_400_BAD_REQUEST
+    )
+    assert resp["detail"]["code"] == schemas.MISSING_BLOBS
+    assert resp["detail"]["digests"] == ["0" * 64]
+
+    A, B = auth_client.bulk_post(
+        "/jobs/", [{**job_dict(), "blob_digests": [x, y]}, {**job_dict(), "blob_digests": [x]}]
+    )
+    assert A["blob_digests"] == [x, y]
+
+    # Blob y is reclaimed with the only Job referencing it
+    auth_client.delete(f"/jobs/{A['id']}")
+    assert [blob["digest"] for blob in auth_client.get("/blobs/", digest=[x, y])] == [x]
+
+    # Blob x is reclaimed once B's parameters no longer reference it
+    auth_client.bulk_patch("/jobs/", [{"id": B["id"], "blob_digests": []}])
+    assert auth_client.get("/blobs/", digest=[x]) == []
+
+
 def test_can_filter_on_parents(auth_client, job_dict):
     specs = [job_dict(workdir="A"), job_dict(workdir="B")]
     parentA, parentB = auth_client.bulk_post("/jobs/", specs)
@@ -1,3 +1,6 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
 from dateutil.parser import isoparse
 from fastapi import status
 
@@ -41,6 +44,43 @@ def test_detail_view(auth_client):
     assert retrieved_site == created_site
 
 
+def test_conditional_get(auth_client, db_session):
+    created_site = create_site(auth_client)
+    id = created_site["id"]
+    for url in ["/sites/", f"/sites/{id}"]:
+        response = auth_client._client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers["ETag"]
+        response = auth_client._client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+        assert not response.content
+
+    def set_last_refresh(last_refresh):
+        db_session.query(models.Site).filter(models.Site.id == id).update({"last_refresh": last_refresh})
+        db_session.commit()
+
+    # A change in an unfinished second is neither advertised nor validated by date
+    unsettled = datetime.utcnow() + timedelta(seconds=5)
+    set_last_refresh(unsettled)
+    response = auth_client._client.get(f"/sites/{id}")
+    assert "Last-Modified" not in response.headers
+    since = format_datetime(unsettled.replace(tzinfo=timezone.utc), usegmt=True)
+    response = auth_client._client.get(f"/sites/{id}", headers={"If-Modified-Since": since})
+    assert response.status_code == status.HTTP_200_OK
+
+    set_last_refresh(datetime.utcnow() - timedelta(seconds=10))
+    last_modified = auth_client._client.get(f"/sites/{id}").headers["Last-Modified"]
+    response = auth_client._client.get(f"/sites/{id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    auth_client.put(f"/sites/{id}", path="/projects/updated")
+    response = auth_client._client.get("/sites/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert response.json()["results"][0]["path"] == "/projects/updated"
+
+
 def test_update_site_status(auth_client):
     created_site = create_site(auth_client)
     id = created_site["id"]
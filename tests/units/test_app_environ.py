@@ -0,0 +1,53 @@
+import os
+from datetime import datetime
+
+from balsam._api.models import Job
+from balsam.api import ApplicationDefinition
+
+
+class Hello(ApplicationDefinition):
+    site = 0
+    command_template = "echo hello"
+    environment_variables = {"HELLO_MODE": "loud"}
+
+
+class CustomEnv(ApplicationDefinition):
+    site = 0
+    command_template = "echo hello"
+    environment_variables = {"HELLO_MODE": "loud"}
+
+    def get_environ_vars(self):
+        envs = super().get_environ_vars()
+        envs["CUSTOM"] = "1"
+        return envs
+
+
+def make_job():
+    return Job(
+        _api_data=True,
+        id=5,
+        workdir="test/5",
+        app_id=1,
+        state="PREPROCESSED",
+        threads_per_rank=4,
+        serialized_parameters="",
+        serialized_exception="",
+        serialized_return_value="",
+        last_update=datetime.utcnow(),
+        pending_file_cleanup=True,
+    )
+
+
+def test_environ_delta_excludes_launcher_environment(monkeypatch):
+    monkeypatch.setenv("LARGE_MODULE_PATH", "/opt/modules")
+    app = Hello(make_job())
+    assert app.get_environ_delta() == {"HELLO_MODE": "loud", "BALSAM_JOB_ID": "5", "OMP_NUM_THREADS": "4"}
+    assert app.get_environ_vars() == {**os.environ, **app.get_environ_delta()}
+
+
+def test_environ_delta_honors_get_environ_vars_override(monkeypatch):
+    monkeypatch.setenv("LARGE_MODULE_PATH", "/opt/modules")
+    delta = CustomEnv(make_job()).get_environ_delta()
+    assert delta["CUSTOM"] == "1"
+    assert delta["HELLO_MODE"] == "loud"
+    assert "LARGE_MODULE_PATH" not in delta
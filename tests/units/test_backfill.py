@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from balsam._api.models import Job
+from balsam.site.launcher.backfill import EasyBackfill
+
+
+def make_job(job_id, num_nodes=1, wall_time_min=0, node_packing_count=1):
+    return Job(
+        _api_data=True,
+        id=job_id,
+        workdir=f"test/{job_id}",
+        app_id=1,
+        state="PREPROCESSED",
+        num_nodes=num_nodes,
+        wall_time_min=wall_time_min,
+        node_packing_count=node_packing_count,
+        serialized_parameters="",
+        serialized_exception="",
+        serialized_return_value="",
+        last_update=datetime.utcnow(),
+        pending_file_cleanup=True,
+    )
+
+
+def test_backfill_never_delays_the_head_job():
+    # 1 free node; 4 nodes free up in 10 minutes and 2 more in 30 minutes
+    backfill = EasyBackfill(batch_end_time=3600.0)
+    backfill.reserve(make_job(1, num_nodes=4), free_nodes=1.0, running=[(1800.0, 2.0), (600.0, 4.0)], now=0.0)
+    assert backfill.shadow_time == 600.0
+    assert backfill.extra_nodes == 1.0
+
+    assert backfill.allows(make_job(2, wall_time_min=5), now=0.0)
+    backfill.commit(make_job(2, wall_time_min=5), now=0.0)
+    assert backfill.extra_nodes == 1.0
+
+    # Allowed, but not placed (e.g. InsufficientResources): the extra node is not used up
+    assert backfill.allows(make_job(3, wall_time_min=20), now=0.0)
+    assert backfill.extra_nodes == 1.0
+    backfill.commit(make_job(3, wall_time_min=20), now=0.0)  # Uses the extra node
+    assert not backfill.allows(make_job(4, wall_time_min=20), now=0.0)
+    assert not backfill.allows(make_job(5), now=0.0)
+
+
+def test_no_reservation_past_the_batch_job_end():
+    backfill = EasyBackfill(batch_end_time=3600.0)
+    backfill.reserve(make_job(1, num_nodes=4), free_nodes=1.0, running=[(3600.0, 4.0)], now=0.0)
+    assert backfill.shadow_time is None
+    assert backfill.allows(make_job(2), now=0.0)
@@ -0,0 +1,45 @@
+from balsam.platform.compute_node import AuroraNode, PolarisNode
+from balsam.platform.compute_node.compute_node import ComputeNode
+
+
+class FlatNode(ComputeNode):
+    cpu_ids = list(range(8))
+    gpu_ids = ["a", "b"]
+
+
+def test_slots_are_reused_after_free():
+    node = FlatNode(0, "flat")
+    assert node.assign(1, num_cpus=3, num_gpus=1, occupancy=0.5)["cpu_ids"] == [0, 1, 2]
+    assert node.assign(2, num_cpus=2, num_gpus=1, occupancy=0.5) == {
+        "cpu_ids": [3, 4],
+        "gpu_ids": ["b"],
+        "occupancy": 0.5,
+    }
+    assert not node.check_fit(num_cpus=1, num_gpus=0, occupancy=0.1)
+    node.free(1)
+    assert node.idle_cpus == [0, 1, 2, 5, 6, 7]
+    assert node.busy_gpus == ["b"]
+    assert node.num_idle_cpus == 6 and node.num_idle_gpus == 1
+    assert node.assign(3, num_cpus=4, num_gpus=1, occupancy=0.5)["cpu_ids"] == [0, 1, 2, 5]
+
+
+def test_polaris_jobs_stay_within_numa_domain():
+    node = PolarisNode(0, "polaris")
+    specs = [node.assign(job_id, num_cpus=2, num_gpus=1, occupancy=0.25) for job_id in range(4)]
+    assert [spec["gpu_ids"] for spec in specs] == [[3], [2], [1], [0]]
+    assert [spec["cpu_ids"] for spec in specs] == [[0, 1], [8, 9], [16, 17], [24, 25]]
+
+
+def test_topology_falls_back_when_no_domain_fits():
+    node = AuroraNode(0, "aurora")
+    spec = node.assign(1, num_cpus=4, num_gpus=8)
+    assert spec["gpu_ids"] == ["0.0", "0.1", "1.0", "1.1", "2.0", "2.1", "3.0", "3.1"]
+    spec = node.assign(2, num_cpus=4, num_gpus=2, occupancy=0.0)
+    assert spec["cpu_ids"] == [52, 53, 54, 55]
+    assert spec["gpu_ids"] == ["4.0", "4.1"]
+
+
+def test_domains_without_matching_gpus_only_constrain_cpus():
+    node = PolarisNode(0, "polaris", gpu_ids=["MIG-GPU-x/1/0", "MIG-GPU-x/2/0"])
+    spec = node.assign(1, num_cpus=2, num_gpus=1, occupancy=0.5)
+    assert spec == {"cpu_ids": [0, 1], "gpu_ids": ["MIG-GPU-x/1/0"], "occupancy": 0.5}
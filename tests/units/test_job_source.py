@@ -0,0 +1,72 @@
+import os
+import time
+from types import SimpleNamespace
+
+from balsam.site.job_source import AsyncJobSource, PrefetchController
+
+
+def test_prefetch_depth_follows_littles_law():
+    controller = PrefetchController(min_depth=4, max_depth=1000, poll_period=1.0)
+    assert controller.target_depth() == 4
+
+    # 50 jobs/sec consumed, with 0.25 sec acquire latency and 1 sec polls
+    controller.queue_filled(100, now=0.0)
+    controller.observe_queue(50, now=1.0)
+    controller.observe_acquire(0.25)
+    assert controller.rate == 50.0
+    assert controller.target_depth() == 125
+
+
+def test_prefetch_depth_is_bounded():
+    controller = PrefetchController(min_depth=4, max_depth=100, poll_period=1.0)
+    controller.queue_filled(100, now=0.0)
+    controller.observe_queue(50, now=1.0)
+    assert controller.target_depth() == 100
+    # Never prefetch more than could start before the walltime ends
+    assert controller.target_depth(remaining_sec=0.5) == 25
+    assert controller.target_depth(remaining_sec=0.0) == 4
+
+
+def test_drained_queue_polls_faster():
+    controller = PrefetchController(min_depth=1, max_depth=100, poll_period=1.0)
+    controller.queue_filled(10, now=0.0)
+    controller.observe_queue(0, now=1.0)
+    assert controller.poll_period == PrefetchController.FAST_POLL_PERIOD
+    controller.queue_filled(10, now=1.0)
+    controller.observe_queue(5, now=2.0)
+    assert controller.poll_period == 1.0
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_async_job_source_releases_jobs_that_no_longer_fit(mocker):
+    mocker.patch("balsam.site.job_source.SessionThread")
+    source = AsyncJobSource(client=mocker.MagicMock(), site_id=1, poll_period=0.01)
+    session = source.session
+    session.acquire_jobs.return_value = [
+        SimpleNamespace(id=i, num_nodes=1, node_packing_count=1, batch_job_id=None) for i in range(3)
+    ]
+    # A failed release is retried on the next poll
+    session.release_jobs.side_effect = [RuntimeError("API unavailable"), None]
+    read_fd, source.wakeup_fd = os.pipe()
+    source.start()
+
+    # The first call only sets the capacity snapshot; acquisition happens in the background
+    assert source.get_jobs(max_num_jobs=3, max_nodes_per_job=3, max_aggregate_nodes=3.0) == []
+    wait_for(lambda: len(source._pool) == 3)
+    assert session.acquire_jobs.call_args[1]["max_aggregate_nodes"] == 3.0
+    assert os.read(read_fd, 1) == b"\0"
+    session.acquire_jobs.return_value = []
+
+    # One node is left: one Job is handed out and the other two go back to the server
+    assert [job.id for job in source.get_jobs(max_num_jobs=3, max_aggregate_nodes=1.0)] == [0]
+    wait_for(lambda: session.release_jobs.call_count == 2)
+    assert [call[0][0] for call in session.release_jobs.call_args_list] == [[1, 2], [1, 2]]
+    source.terminate()
+    os.close(read_fd)
+    os.close(source.wakeup_fd)
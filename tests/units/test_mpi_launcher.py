@@ -1,3 +1,9 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pytest
@@ -8,6 +14,7 @@ from balsam.platform.app_run import MPICHRun
 from balsam.platform.compute_node import PolarisNode
 from balsam.site.launcher._mpi_mode import Launcher
 from balsam.site.launcher.node_manager import NodeManager
+from balsam.util import SigHandler
 
 
 class HelloWorld(ApplicationDefinition):
@@ -16,6 +23,21 @@ class HelloWorld(ApplicationDefinition):
     parameters = {}
 
 
+def make_job(id):
+    return Job(
+        _api_data=True,
+        id=id,
+        workdir=f"test/{id}",
+        app_id=1,
+        state="PREPROCESSED",
+        serialized_parameters="",
+        serialized_exception="",
+        serialized_return_value="",
+        last_update=datetime.utcnow(),
+        pending_file_cleanup=True,
+    )
+
+
 @pytest.fixture(scope="function")
 def launcher(mocker, tmp_path):
     mocker.patch("balsam.platform.app_run.app_run.SubprocessAppRun", autospec=True)
@@ -51,7 +73,7 @@ def launcher(mocker, tmp_path):
         scheduler_id=25,
     )
     status_updater = mock_status_updater(client)
-    return Launcher(
+    launcher = Launcher(
         data_dir=tmp_path,
         idle_ttl_sec=10,
         delay_sec=0.01,
@@ -63,7 +85,81 @@ def launcher(mocker, tmp_path):
         error_tail_num_lines=10,
         max_concurrent_runs=1000,
     )
+    yield launcher
+    launcher._uninstall_wakeup_fd()
 
 
 def test_launcher_foo(launcher, tmp_path):
     launcher.launch_runs()
+
+
+def test_launcher_wakes_when_run_exits(launcher):
+    launcher.node_manager.assign_from_params(
+        id=100,
+        num_nodes=len(launcher.node_manager.nodes),
+        ranks_per_node=1,
+        threads_per_rank=1,
+        threads_per_core=1,
+        gpus_per_rank=0,
+        node_occupancy=1.0,
+    )
+    assert not launcher._has_free_resources()
+    start = time.monotonic()
+    proc = subprocess.Popen(["sleep", "0.2"])
+    launcher.time_step()
+    assert time.monotonic() - start < 5.0
+    assert proc.wait() == 0
+
+
+def test_launcher_restores_signal_state_on_exit(launcher):
+    wakeup_pipe = launcher._wakeup_pipe
+    assert wakeup_pipe is not None
+    assert signal.getsignal(signal.SIGCHLD) not in (signal.SIG_DFL, None)
+    launcher.sig_handler.set()
+    launcher.run()
+    SigHandler._exit_event.clear()
+    assert signal.getsignal(signal.SIGCHLD) == signal.SIG_DFL
+    assert signal.set_wakeup_fd(-1) == -1
+    with pytest.raises(OSError):
+        os.fstat(wakeup_pipe[0])
+
+
+def test_launcher_sleeps_until_job_source_wakes_it(launcher):
+    # With an AsyncJobSource attached, free resources do not cause polling
+    launcher._job_source_wakes = launcher._capacity_reported = True
+    assert launcher._has_free_resources()
+    timer = threading.Timer(0.2, os.write, args=(launcher._wakeup_pipe[1], b"\0"))
+    start = time.monotonic()
+    timer.start()
+    launcher.time_step()
+    assert 0.15 < time.monotonic() - start < 5.0
+
+
+def test_launch_wave_starts_runs_in_parallel(launcher, mocker):
+    launcher._spawn_pool = ThreadPoolExecutor(max_workers=4)
+    jobs = [make_job(i) for i in range(4)]
+    barrier = threading.Barrier(4, timeout=5)
+    runs = [mocker.Mock(start=barrier.wait) for _ in jobs]
+    launcher.start_runs(list(zip(jobs, runs)))
+
+    launcher.status_updater.put_many.assert_called_once()
+    updates = launcher.status_updater.put_many.call_args[0][0]
+    assert [update["id"] for update in updates] == [job.id for job in jobs]
+    assert len({update["state_timestamp"] for update in updates}) == 1
+    assert set(launcher.active_runs) == {job.id for job in jobs}
+
+
+def test_failed_start_does_not_orphan_the_wave(launcher, mocker):
+    launcher._spawn_pool = ThreadPoolExecutor(max_workers=4)
+    jobs = [make_job(i) for i in range(3)]
+    for job in jobs:
+        launcher.node_manager.assign(job)
+    runs = [mocker.Mock(), mocker.Mock(start=mocker.Mock(side_effect=OSError("mpiexec not found"))), mocker.Mock()]
+    launcher.start_runs(list(zip(jobs, runs)))
+
+    updates = launcher.status_updater.put_many.call_args[0][0]
+    assert [update["id"] for update in updates] == [jobs[0].id, jobs[2].id]
+    assert set(launcher.active_runs) == {jobs[0].id, jobs[2].id}
+    (id,), kwargs = launcher.status_updater.put.call_args
+    assert id == jobs[1].id and kwargs["state"] == "RUN_ERROR"
+    assert jobs[1].id not in launcher.node_manager.job_node_map
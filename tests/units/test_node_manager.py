@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from balsam.platform.compute_node import PolarisNode
+from balsam.site.launcher.node_manager import InsufficientResources, NodeManager
+
+
+def assign(manager, job_id, num_nodes=1, ranks_per_node=1, gpus_per_rank=0, packing=1):
+    return manager.assign_from_params(
+        id=job_id,
+        num_nodes=num_nodes,
+        ranks_per_node=ranks_per_node,
+        threads_per_rank=1,
+        threads_per_core=1,
+        gpus_per_rank=gpus_per_rank,
+        node_occupancy=1.0 / packing,
+    )
+
+
+def test_packed_jobs_keep_empty_nodes_for_multi_node_jobs():
+    manager = NodeManager([PolarisNode(i, f"node{i}") for i in range(3)])
+    first = assign(manager, 1, gpus_per_rank=1, packing=4)
+    second = assign(manager, 2, gpus_per_rank=1, packing=4)
+    assert first.node_ids == second.node_ids == ["0"]
+    assert manager.count_empty_nodes() == 2
+    assert manager.aggregate_free_nodes() == 2.5
+
+    assert assign(manager, 3, num_nodes=2).node_ids == ["1", "2"]
+    with pytest.raises(InsufficientResources):
+        assign(manager, 4, num_nodes=1)
+    manager.free(3)
+    assert manager.count_empty_nodes() == 2
+
+
+def test_capacity_counters_match_nodes():
+    random.seed(1)
+    nodes = [PolarisNode(i, f"node{i}") for i in range(50)]
+    manager = NodeManager(nodes)
+    running = []
+    for job_id in range(500):
+        if running and random.random() < 0.4:
+            manager.free(running.pop(random.randrange(len(running))))
+        try:
+            assign(manager, job_id, num_nodes=random.choice([1, 1, 1, 2]), packing=random.choice([1, 2, 4, 8]))
+        except InsufficientResources:
+            continue
+        running.append(job_id)
+        assert manager.count_empty_nodes() == len([n for n in nodes if n.occupancy == 0.0])
+        assert manager.aggregate_free_nodes() == pytest.approx(len(nodes) - sum(n.occupancy for n in nodes))
+
+
+def test_packed_nodes_are_released_by_their_last_job():
+    manager = NodeManager([PolarisNode(i, f"node{i}") for i in range(3)])
+    assign(manager, 1, packing=2)
+    assign(manager, 2, packing=2)
+    assign(manager, 3, num_nodes=2)
+    # Jobs 1 and 2 share node 0, which only empties when both have ended
+    assert sorted(manager.node_release_times({1: 10.0, 2: 50.0, 3: 30.0})) == [30.0, 30.0, 50.0]
+
+
+def test_multi_node_jobs_span_few_groups():
+    # Cabinets x1 and x2 with 4 nodes each, x3 with 2 nodes
+    hostnames = [f"x{rack}c0s{slot}b0n0" for rack, count in [(1, 4), (2, 4), (3, 2)] for slot in range(count)]
+    manager = NodeManager([PolarisNode(hostname, hostname) for hostname in hostnames])
+    assign(manager, 1, packing=2)  # Leaves 3 empty nodes in x1
+
+    def racks(spec):
+        return sorted(hostname[:2] for hostname in spec.hostnames)
+
+    assert racks(assign(manager, 2, num_nodes=2)) == ["x3", "x3"]
+    assert racks(assign(manager, 3, num_nodes=4)) == ["x2"] * 4
+    manager.free(2)
+    manager.free(3)
+    assert racks(assign(manager, 4, num_nodes=5)) == ["x1"] + ["x2"] * 4
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+
+from balsam._api.models import Job
+from balsam.api import ApplicationDefinition
+from balsam.schemas import code_serializer, deserialize, serialize
+from balsam.site.launcher.node_manager import NodeSpec
+from balsam.site.launcher.pyfunc_pool import PyFuncPool, PyFuncPoolRun
+
+
+class Doubler(ApplicationDefinition):
+    site = 0
+
+    def run(self, x):
+        print("doubling", x)
+        return 2 * x
+
+
+class Raiser(ApplicationDefinition):
+    site = 0
+
+    def run(self):
+        raise ValueError("bad input")
+
+
+class Sleeper(ApplicationDefinition):
+    site = 0
+
+    def run(self):
+        import time
+
+        time.sleep(60)
+
+
+APPS = {101: Doubler, 102: Raiser, 103: Sleeper}
+
+
+def make_job(job_id, app_id, params):
+    return Job(
+        _api_data=True,
+        id=job_id,
+        workdir=f"test/{job_id}",
+        app_id=app_id,
+        state="RUNNING",
+        serialized_parameters=serialize(params),
+        serialized_exception="",
+        serialized_return_value="",
+        last_update=datetime.utcnow(),
+        pending_file_cleanup=True,
+    )
+
+
+@pytest.fixture
+def app_paths(tmp_path):
+    """The App payloads, as the launcher writes them: the fork server never fetches Apps from the API"""
+    paths = {}
+    for app_id, app_cls in APPS.items():
+        path = tmp_path.joinpath(f"app-{app_id}")
+        path.write_text(serialize(app_cls, code_serializer(app_cls.serializer)))
+        paths[app_id] = str(path)
+    return paths
+
+
+@pytest.fixture
+def pool(mocker):
+    client = mocker.MagicMock()
+    client.Job = Job
+    pool = PyFuncPool(client)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def start_run(pool, tmp_path, app_paths, job):
+    cwd = tmp_path.joinpath(str(job.id))
+    cwd.mkdir()
+    run = PyFuncPoolRun(
+        pool,
+        job.app_id,
+        app_paths[job.app_id],
+        job._read_model.json(),
+        cmdline="",
+        preamble=None,
+        envs={"BALSAM_JOB_ID": str(job.id)},
+        cwd=cwd,
+        outfile_path=cwd.joinpath("job.out"),
+        node_spec=NodeSpec(node_ids=[0], hostnames=["localhost"], cpu_ids=[[]], gpu_ids=[[]]),
+        ranks_per_node=1,
+        threads_per_rank=1,
+        threads_per_core=1,
+        launch_params={},
+        gpus_per_rank=0,
+    )
+    run.start()
+    return run, cwd.joinpath("job.out")
+
+
+def test_pool_reports_return_values_and_exceptions(pool, tmp_path, app_paths):
+    ok_run, ok_out = start_run(pool, tmp_path, app_paths, make_job(1, 101, {"x": 21}))
+    err_run, err_out = start_run(pool, tmp_path, app_paths, make_job(2, 102, {}))
+    assert ok_run.wait(timeout=30) == 0
+    assert err_run.wait(timeout=30) == 1
+
+    ok_lines = ok_out.read_text().splitlines()
+    assert ok_lines[0] == "doubling 21"
+    marker, payload = ok_lines[1].split(None, 1)
+    assert marker == "BALSAM-RETURN-VALUE"
+    assert deserialize(payload) == 42
+
+    exc_line = next(line for line in err_out.read_text().splitlines() if line.startswith("BALSAM-EXCEPTION"))
+    exc, _ = deserialize(exc_line.split(None, 1)[1])
+    assert isinstance(exc, ValueError)
+    assert "bad input" in err_run.tail_output()
+
+
+def test_pool_terminates_runs(pool, tmp_path, app_paths):
+    run, _ = start_run(pool, tmp_path, app_paths, make_job(3, 103, {}))
+    assert run.poll() is None
+    run.terminate()
+    assert run.wait(timeout=30) < 0
@@ -0,0 +1,53 @@
+import shlex
+from datetime import datetime
+
+from balsam._api.models import Job
+from balsam.api import ApplicationDefinition
+from balsam.schemas import serialize
+from balsam.site.launcher.python_runner import unpack_files
+
+
+class Adder(ApplicationDefinition):
+    site = 0
+
+    def run(self, x, y):
+        return x + y
+
+
+def make_job(job_id):
+    return Job(
+        _api_data=True,
+        id=job_id,
+        workdir=f"test/{job_id}",
+        app_id=7,
+        state="PREPROCESSED",
+        serialized_parameters=serialize({"x": job_id, "y": 1}),
+        serialized_exception="",
+        serialized_return_value="",
+        last_update=datetime.utcnow(),
+        pending_file_cleanup=True,
+    )
+
+
+def test_pyrunner_payloads_are_passed_by_file(mocker, monkeypatch, tmp_path):
+    for attr in ("_payload_dir", "_data_dir", "_payload_paths"):
+        monkeypatch.setattr(ApplicationDefinition, attr, getattr(ApplicationDefinition, attr))
+    monkeypatch.setattr(Adder, "__app_id__", 7)
+    monkeypatch.setattr(Adder, "_serialized_class", serialize(Adder))
+    ApplicationDefinition._set_payload_dir(tmp_path.joinpath("payloads"), tmp_path.joinpath("data"))
+    client = mocker.MagicMock()
+    client.Job = Job
+
+    for job_id in (1, 2):
+        cmdline = Adder(make_job(job_id)).get_arg_str()
+        args = shlex.split(cmdline)
+        assert args[3:5] == ["--files", "7"]
+        assert args[6] == str(tmp_path.joinpath("data", "test", str(job_id), ".balsam-job.json"))
+
+        app_cls, job, params = unpack_files(7, args[5], args[6], client)
+        assert app_cls.__name__ == "Adder"
+        assert job.id == job_id
+        assert app_cls(job).run(**params) == job_id + 1
+
+    # The App payload is written once and shared by every Job
+    assert len(list(tmp_path.joinpath("payloads").iterdir())) == 1
@@ -0,0 +1,106 @@
+import socket
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import zmq
+
+from balsam.site.launcher._serial_mode_master import Master
+from balsam.site.launcher._serial_mode_worker import Worker
+from balsam.site.launcher.node_manager import InsufficientResources
+from balsam.util import SigHandler
+
+
+class SpecMaster(Master):
+    def job_to_dict(self, job):
+        return {"id": job.id}
+
+
+def fake_job(id):
+    return SimpleNamespace(id=id, _read_model=SimpleNamespace(blob_digests=[]))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("", 0))
+        return sock.getsockname()[1]
+
+
+def worker_msg(request_num_jobs=0, started=(), done=()):
+    return {
+        "source": "test",
+        "started": list(started),
+        "done": list(done),
+        "error": [],
+        "request_num_jobs": request_num_jobs,
+    }
+
+
+def test_master_pushes_jobs_to_outstanding_requests(mocker):
+    SigHandler._exit_event.clear()
+    port = free_port()
+    job_source = mocker.MagicMock()
+    available = [[fake_job(1)], [], [fake_job(2), fake_job(3)]]
+    job_source.get_jobs.side_effect = lambda max_jobs: available.pop(0) if available else []
+    status_updater = mocker.MagicMock()
+    master = SpecMaster(job_source, status_updater, 1, port, Path("data"), idle_ttl_sec=3600, num_workers=1)
+    received = []
+    exit_msgs = []
+
+    def worker():
+        context = zmq.Context()
+        sock = context.socket(zmq.DEALER)
+        sock.connect(f"tcp://localhost:{port}")
+        sock.send_json(worker_msg(request_num_jobs=3))
+        # Jobs that were not available at request time arrive without asking again
+        while len(received) < 3:
+            received.extend(job["id"] for job in sock.recv_json()["new_jobs"])
+        sock.send_json(worker_msg(started=received, done=received))
+        while not any(len(call[0][0]) == 6 for call in status_updater.put_many.call_args_list):
+            time.sleep(0.01)
+        master.sig_handler.set()
+        exit_msgs.append(sock.recv_json())
+        sock.close(linger=0)
+        context.term()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    master.run()
+    thread.join()
+    SigHandler._exit_event.clear()
+
+    assert received == [1, 2, 3]
+    # Specs are prepared for the outstanding demand, and no more
+    assert all(1 <= call[0][0] <= 3 for call in job_source.get_jobs.call_args_list)
+    assert master.num_outstanding_jobs == 0
+    assert exit_msgs == [{"exit": True}]
+
+
+def test_worker_does_not_wait_on_master(mocker):
+    worker = Worker(
+        app_run=mocker.MagicMock(),
+        node_manager=mocker.MagicMock(),
+        master_host="localhost",
+        master_port=0,
+        delay_sec=0,
+        error_tail_num_lines=10,
+        num_prefetch_jobs=4,
+        master_subproc=None,
+    )
+    worker.socket = mocker.MagicMock()
+    worker.socket.poll.return_value = 0
+    assert worker.cycle()
+    assert worker.socket.send_json.call_args[0][0]["request_num_jobs"] == 4
+
+    # Nothing to report and the request is still outstanding: no message
+    assert worker.cycle()
+    assert worker.socket.send_json.call_count == 1
+
+    worker.socket.poll.return_value = zmq.POLLIN
+    worker.socket.recv_json.side_effect = [{"new_jobs": [{"id": 1}]}, zmq.Again(), {"exit": True}]
+    worker.node_manager.assign_from_params.side_effect = InsufficientResources
+    assert worker.cycle()
+    assert worker.num_requested == 3
+    assert list(worker.runnable_cache) == [1]
+    assert not worker.cycle()
@@ -0,0 +1,96 @@
+import base64
+
+import dill
+import pytest
+
+from balsam.schemas import DeserializeError, PayloadCache, SerializeError, blob, deserialize, serialize, serializer
+
+np = pytest.importorskip("numpy")
+
+SPECS = ["dill", "pickle5", "cloudpickle"]
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_round_trip_numpy_payload(spec):
+    payload = {"grid": np.random.rand(64, 64), "labels": np.arange(100), "name": "run-1"}
+    serialized = serialize(payload, spec)
+    assert serialized.startswith(f"@{spec}:") == (spec != "dill")
+
+    result = deserialize(serialized)
+    assert result["name"] == "run-1"
+    assert np.array_equal(result["grid"], payload["grid"])
+    assert np.array_equal(result["labels"], payload["labels"])
+    result["grid"][0, 0] = -1.0
+
+
+def test_zstd_compression():
+    pytest.importorskip("zstandard")
+    payload = {"zeros": np.zeros(100_000)}
+    compressed = serialize(payload, "pickle5+zstd")
+    assert compressed.startswith("@pickle5+zstd:")
+    assert len(compressed) < len(serialize(payload, "pickle5")) / 10
+    assert np.array_equal(deserialize(compressed)["zeros"], payload["zeros"])
+
+
+def test_decodes_legacy_dill_payload():
+    legacy = base64.b64encode(dill.dumps({"x": [1, 2, 3]}, recurse=True)).decode("utf-8")
+    assert deserialize(legacy) == {"x": [1, 2, 3]}
+
+
+def test_unknown_serializer():
+    with pytest.raises(SerializeError):
+        serialize({"x": 1}, "marshal")
+    with pytest.raises(DeserializeError):
+        deserialize("@marshal:AAAA")
+
+
+def test_deserialize_cache_is_bounded_by_bytes(monkeypatch):
+    payloads = [serialize(str(i) * 1000) for i in range(3)]
+    # Room for two entries (each counted as twice its payload size), not three
+    cache = PayloadCache(max_bytes=5 * len(payloads[0]))
+    monkeypatch.setattr(serializer, "deserialize_cache", cache)
+    assert all(len(p) == len(payloads[0]) for p in payloads)
+
+    first = deserialize(payloads[0])
+    assert deserialize(payloads[0]) is first
+    # An equal payload in a different string object is a hit as well
+    assert deserialize("".join(payloads[0])) is first
+    deserialize(payloads[1])
+    deserialize(payloads[2])
+    assert deserialize(payloads[0]) is not first
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 4 and stats["evictions"] == 2
+    assert stats["bytes"] <= stats["max_bytes"]
+
+    deserialize(payloads[1], cache=False)
+    assert cache.stats()["misses"] == 4
+
+
+def test_large_parameters_are_serialized_once(monkeypatch):
+    big = "x" * blob.MIN_BLOB_SIZE
+    calls = []
+
+    def spy(obj, *args):
+        calls.append(obj)
+        return serialize(obj, *args)
+
+    monkeypatch.setattr(blob, "serialize", spy)
+    serialized, blobs = blob.serialize_parameters({"big": big, "small": 1})
+    assert sum(obj is big for obj in calls) == 1
+    assert list(blobs.values()) == [serialize(big)]
+    assert deserialize(serialized) == {"big": blob.BlobRef(blob.blob_digest(serialize(big))), "small": 1}
+
+
+def test_small_parameters_are_serialized_whole_once(monkeypatch):
+    calls = []
+
+    def spy(obj, *args):
+        calls.append(obj)
+        return serialize(obj, *args)
+
+    monkeypatch.setattr(blob, "serialize", spy)
+    params = {"x": 1, "name": "world"}
+    serialized, blobs = blob.serialize_parameters(params)
+    assert calls == [params]
+    assert blobs == {}
+    assert deserialize(serialized) == params
@@ -0,0 +1,196 @@
+import errno
+import os
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from balsam.client import RequestsClient
+from balsam.site.status_log import StatusLog
+from balsam.site.status_updater import BulkStatusUpdater, LogShipper, fold_updates
+
+
+def test_successive_transitions_fold_into_one_update():
+    t0 = datetime(2022, 1, 1)
+    updates = [
+        {"id": 1, "state": "RUN_DONE", "state_timestamp": t0 + timedelta(seconds=5), "state_data": {}},
+        {"id": 2, "state": "RUNNING", "state_timestamp": t0 + timedelta(seconds=1), "state_data": {}},
+        {"id": 1, "state": "RUNNING", "state_timestamp": t0, "state_data": {"node": "n1"}, "batch_job_id": 3},
+    ]
+    folded = {update["id"]: update for update in fold_updates(updates)}
+    assert len(folded) == 2
+    assert "state_history" not in folded[2]
+
+    job1 = folded[1]
+    assert job1["state"] == "RUN_DONE"
+    assert job1["state_timestamp"] == t0 + timedelta(seconds=5)
+    assert job1["batch_job_id"] == 3
+    assert job1["state_history"] == [{"state": "RUNNING", "state_timestamp": t0, "state_data": {"node": "n1"}}]
+
+
+def test_status_log_replays_unacknowledged_updates(tmp_path):
+    t0 = datetime(2022, 1, 1)
+    dead_log = StatusLog(tmp_path)
+    dead_log.path = tmp_path.joinpath("status-updates.crashed-host.1.wal")
+    dead_log.open()
+    entries = dead_log.append(
+        [{"id": n, "state": "RUN_DONE", "state_timestamp": t0, "state_data": {}} for n in range(4)]
+    )
+    dead_log.ack(entries[1][0])
+    # Simulate a crash on another node: the log is never closed and its lease expires
+    dead_log._fp.close()
+    expired = time.time() - 2 * dead_log.lease
+    os.utime(dead_log.path, (expired, expired))
+
+    status_log = StatusLog(tmp_path)
+    backlog = status_log.open()
+    assert [update["id"] for _, update in backlog] == [2, 3]
+    assert backlog[0][1]["state_timestamp"] == t0
+    assert not dead_log.path.exists()
+
+    sent = []
+    shipper = LogShipper(status_log, sent.append, max_batch_size=10)
+    shipper.submit(backlog)
+    shipper.start()
+    shipper.stop(timeout=5)
+    assert [[update["id"] for update in batch] for batch in sent] == [[2, 3]]
+    status_log.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def write_log(tmp_path, hostname, pid):
+    log = StatusLog(tmp_path)
+    log.path = tmp_path.joinpath(f"status-updates.{hostname}.{pid}.wal")
+    log.open()
+    log.append([{"id": pid, "state": "RUN_DONE", "state_timestamp": None, "state_data": {}}])
+    log._fp.close()
+    return log.path
+
+
+def test_status_log_adopts_only_orphaned_logs(tmp_path, mocker):
+    mocker.patch("balsam.site.status_log.fcntl.flock", side_effect=OSError(errno.ENOLCK, "No locks available"))
+    proc = subprocess.Popen(["true"])
+    proc.wait()
+    status_log = StatusLog(tmp_path)
+    live_remote = write_log(tmp_path, "other-node", 1)
+    live_local = write_log(tmp_path, status_log.hostname, os.getppid())
+    write_log(tmp_path, status_log.hostname, proc.pid)
+
+    backlog = status_log.open()
+    assert [update["id"] for _, update in backlog] == [proc.pid]
+    assert sorted(tmp_path.iterdir()) == sorted([live_remote, live_local, status_log.path])
+    status_log.close()
+
+
+def test_replay_skips_updates_already_passed_by_their_jobs(mocker):
+    t0 = datetime(2022, 1, 1)
+    client = mocker.MagicMock()
+    client.Job.objects.filter.return_value.values_list.return_value = [
+        (1, "RUNNING"),
+        (2, "RUN_DONE"),
+        (3, "RESTART_READY"),
+        (4, "JOB_FINISHED"),
+        (5, "PREPROCESSED"),
+    ]
+    updater = BulkStatusUpdater(client)
+    updates = [
+        # RUNNING was acked (bumping the server-side last_update) before RUN_DONE was shipped
+        {"id": 1, "state": "RUN_DONE", "state_timestamp": t0 - timedelta(hours=1), "state_data": {}},
+        {"id": 2, "state": "RUN_DONE", "state_timestamp": t0, "state_data": {}},
+        {"id": 3, "state": "RUN_DONE", "state_timestamp": t0, "state_data": {}},
+        {"id": 4, "state": "RUN_ERROR", "state_timestamp": t0, "state_data": {}},
+        {"id": 5, "state": "RUNNING", "state_timestamp": t0, "state_data": {}},
+        {"id": 6, "state": "RUN_DONE", "state_timestamp": t0, "state_data": {}},
+    ]
+    assert [update["id"] for update in updater._skip_stale(updates)] == [1, 5]
+    client.Job.objects.filter.assert_called_once_with(id=[1, 2, 3, 4, 5, 6])
+    client.Job.objects.filter.return_value.values_list.assert_called_once_with("id", "state")
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f"{status_code} Error", response=response)
+
+
+def test_log_shipper_drops_only_rejected_updates(tmp_path, mocker):
+    sleep = mocker.patch("balsam.site.status_updater.time.sleep")
+    status_log = StatusLog(tmp_path)
+    status_log.open()
+    entries = status_log.append([{"id": n, "state": "RUN_DONE", "state_data": {}} for n in range(5)])
+    responses = [http_error(429)]
+    sent = []
+
+    def send(updates):
+        ids = [update["id"] for update in updates]
+        if responses:
+            raise responses.pop()
+        if 3 in ids:
+            raise http_error(400)
+        sent.append(ids)
+
+    shipper = LogShipper(status_log, send, max_batch_size=10)
+    shipper.submit(entries)
+    shipper.start()
+    shipper.stop(timeout=5)
+    assert sleep.call_count == 1
+    assert sorted(id for ids in sent for id in ids) == [0, 1, 2, 4]
+    assert not shipper._pending
+    status_log.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_log_shipper_bisects_api_rejections_without_client_retries(tmp_path, mocker):
+    client = RequestsClient(api_root="http://balsam.test")
+    client._authenticated = True
+    client_sleep = mocker.patch("balsam.client.requests_client.time.sleep")
+    shipper_sleep = mocker.patch("balsam.site.status_updater.time.sleep")
+    sent = []
+
+    def request(http_method, url, json=None, **kwargs):
+        ids = [update["id"] for update in json]
+        response = requests.Response()
+        response.url = url
+        if 3 in ids:
+            # As the bulk update endpoint rejects unknown Job IDs: a 400 without an error code
+            response.status_code = 400
+            response._content = b'{"detail": "Could not find some Job IDs"}'
+        else:
+            response.status_code = 200
+            response._content = b"[]"
+            sent.append(ids)
+        return response
+
+    mocker.patch.object(requests.Session, "request", side_effect=request)
+    status_log = StatusLog(tmp_path)
+    status_log.open()
+    entries = status_log.append([{"id": n, "state": "RUN_DONE", "state_data": {}} for n in range(5)])
+    updater = BulkStatusUpdater(client)
+    shipper = LogShipper(status_log, updater._ship_updates, max_batch_size=10)
+    shipper.submit(entries)
+    shipper.start()
+    shipper.stop(timeout=5)
+
+    assert client_sleep.call_count == 0
+    assert shipper_sleep.call_count == 0
+    assert sorted(id for ids in sent for id in ids) == [0, 1, 2, 4]
+    assert not shipper._pending
+    status_log.close()
+
+
+def test_put_many_enqueues_one_item(mocker):
+    updater = BulkStatusUpdater(mocker.MagicMock(), max_delay=0.1)
+    updater.put_many([{"id": 1, "state": "RUNNING"}, {"id": 2, "state": "RUNNING"}])
+    updater.put(3, "RUN_DONE")
+    batch = updater._collect_batch(updater.queue.get(timeout=1))
+    assert [update["id"] for update in batch] == [1, 2, 3]
+    assert batch[0]["state_data"] == {}
+
+
+def test_bulk_update_is_sent_per_chunk(mocker):
+    mocker.patch("balsam.site.status_updater.MAX_ITEMS_PER_BULK_OP", 2)
+    client = mocker.MagicMock()
+    updater = BulkStatusUpdater(client)
+    updater._perform_updates([{"id": n, "state": "RUN_DONE", "state_timestamp": None} for n in range(5)])
+    assert [len(call[0][1]) for call in client.bulk_patch.call_args_list] == [2, 2, 1]